@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Cold start benchmark for the chat hosts and the MCP server.
+
+Measures, over several fresh launches:
+
+- server: spawn of server/mcp_server.py (in-memory Gmail backend) until it
+  answers `initialize`, which every pooled process pays;
+- host: launch of the chosen host until it serves its first page, which is
+  what an autoscaled instance makes users wait for.
+
+Each launch runs with STARTUP_PROFILE=True, and the processes' own
+import/init breakdown from the last launch is printed as well.
+
+    python bench/cold_start.py --host flask --repeat 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from host_load import HOST_SCRIPTS, REPO_ROOT, free_port
+
+SERVER_SCRIPT = os.path.join(REPO_ROOT, 'server', 'mcp_server.py')
+
+
+def profile_lines(output):
+    return [line.split('Startup profile ', 1)[1] for line in output.splitlines() if 'Startup profile (' in line]
+
+
+def server_start(env):
+    """Seconds from spawn to the initialize response, and the server's profile line"""
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, SERVER_SCRIPT], env=env, cwd=REPO_ROOT,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    )
+    process.stdin.write(json.dumps({"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}}) + "\n")
+    process.stdin.flush()
+    process.stdout.readline()
+    elapsed = time.perf_counter() - started
+    process.stdin.close()
+    process.wait(timeout=10)
+    return elapsed, profile_lines(process.stderr.read())
+
+
+def host_start(script, env, timeout=60):
+    """Seconds from launch to the first served page, and the host's profile lines"""
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, script], env={**env, 'FLASK_PORT': str(port)}, cwd=REPO_ROOT,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    try:
+        while True:
+            try:
+                if httpx.get(f'http://127.0.0.1:{port}/', timeout=1).status_code < 500:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError(f"host did not come up within {timeout}s")
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - started
+    finally:
+        process.terminate()
+    _, stderr = process.communicate(timeout=10)
+    return elapsed, profile_lines(stderr)
+
+
+def summarize(name, samples):
+    ms = [seconds * 1000 for seconds in samples]
+    print(f"{name}: median {statistics.median(ms):.0f} ms, min {min(ms):.0f} ms, max {max(ms):.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', choices=sorted(HOST_SCRIPTS), default='flask')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--mcp-pool-size', type=int, default=2)
+    args = parser.parse_args()
+
+    env = {
+        **os.environ,
+        'STARTUP_PROFILE': 'True',
+        'OPENAI_API_KEY': os.getenv('OPENAI_API_KEY', 'sk-bench'),
+        'FLASK_DEBUG': 'False',
+        'GMAIL_BACKEND': 'fake',
+        'MCP_POOL_SIZE': str(args.mcp_pool_size),
+        'PYTHONPATH': os.pathsep.join(filter(None, [REPO_ROOT, os.getenv('PYTHONPATH')])),
+    }
+
+    server_samples, host_samples = [], []
+    for _ in range(args.repeat):
+        elapsed, server_profile = server_start(env)
+        server_samples.append(elapsed)
+    for _ in range(args.repeat):
+        elapsed, host_profile = host_start(HOST_SCRIPTS[args.host], env)
+        host_samples.append(elapsed)
+
+    summarize('mcp server spawn -> initialized', server_samples)
+    summarize(f'{args.host} host launch -> first page', host_samples)
+    # The host's stderr also carries its pooled servers' lines
+    for line in server_profile + host_profile:
+        print(f"  {line}")
+
+
+if __name__ == '__main__':
+    main()
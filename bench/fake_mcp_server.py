@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Stand-in MCP server for benchmarks: same tools and JSON-RPC framing as
+server/mcp_server.py, but send_email just sleeps for --latency seconds
+instead of calling Gmail. Use it via MCP_SERVER_COMMAND.
+"""
+
+import argparse
+import json
+import sys
+import time
+
+SEND_EMAIL_SCHEMA = {
+    "name": "send_email",
+    "description": "Send an email via Gmail to specified recipients",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "to": {"type": "string", "description": "Recipient email address"},
+            "subject": {"type": "string", "description": "Email subject line"},
+            "body": {"type": "string", "description": "Email body content (plain text or HTML)"},
+            "cc": {"type": "array", "items": {"type": "string"}, "description": "CC recipients (optional)"}
+        },
+        "required": ["to", "subject", "body"]
+    }
+}
+
+
+def handle(request, latency):
+    method = request.get("method")
+    if method == "initialize":
+        return {
+            "protocolVersion": "2025-06-18",
+            "serverInfo": {"name": "fake-mcp-server", "version": "0.1.0"},
+            "capabilities": {"tools": {}}
+        }
+    if method == "tools/list":
+        return {"tools": [{**SEND_EMAIL_SCHEMA, "inputSchema": SEND_EMAIL_SCHEMA["parameters"]}]}
+    if method == "tools/call":
+        time.sleep(latency)
+        return {
+            "content": [{"type": "text", "text": "{'id': 'fake-message-id', 'labelIds': ['SENT']}"}],
+            "_meta": {"toolDurationMs": latency * 1000}
+        }
+    if method == "ping":
+        return {}
+    raise ValueError(f"Unknown method: {method}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds per tools/call')
+    args = parser.parse_args()
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        request = json.loads(line)
+        if request.get("id") is None:
+            continue
+        try:
+            response = {"jsonrpc": "2.0", "id": request["id"], "result": handle(request, args.latency)}
+        except Exception as e:
+            response = {"jsonrpc": "2.0", "id": request["id"], "error": {"code": -32603, "message": str(e)}}
+        print(json.dumps(response), flush=True)
+
+
+if __name__ == '__main__':
+    main()
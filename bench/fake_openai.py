@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Local OpenAI-compatible stand-in for benchmarks.
+
+Implements POST /v1/chat/completions (plain and stream=True) with injected
+latency, optionally with a slow tail (--slow-rate). When tools are offered
+and the latest user message mentions --tool-keyword, it answers with a
+scripted send_email tool call; otherwise it echoes a short reply. Requests using the host's summarization prompt get a
+short canned summary. Point a host at it with OPENAI_BASE_URL.
+
+    python bench/fake_openai.py --port 8765 --latency 0.3
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Set from the command line in main()
+    latency = 0.0
+    jitter = 0.0
+    token_latency = 0.0
+    tool_keyword = 'email'
+    tool_calls_per_turn = 1
+    slow_rate = 0.0
+    slow_latency = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _sleep(self):
+        delay = self.latency + random.uniform(0, self.jitter)
+        if self.slow_rate and random.random() < self.slow_rate:
+            delay += self.slow_latency
+        if delay > 0:
+            time.sleep(delay)
+
+    def _reply(self, body):
+        """Decide what the model 'says': a tool call or a text reply"""
+        messages = body.get('messages', [])
+        last = messages[-1] if messages else {}
+        text = last.get('content') or ''
+        first = messages[0].get('content') or '' if messages else ''
+        if first.startswith('Summarize the conversation'):
+            lines = [line for line in text.splitlines() if line.startswith(('user:', 'assistant:'))]
+            return f"Summary of {len(lines)} earlier messages. Last: {lines[-1][:80] if lines else ''}", None
+        if body.get('tools') and last.get('role') == 'user' and self.tool_keyword in text.lower():
+            calls = []
+            for index in range(self.tool_calls_per_turn):
+                arguments = {"to": f"bench{index}@example.com", "subject": "Benchmark", "body": text[:200]}
+                calls.append({
+                    "id": f"call_{uuid.uuid4().hex[:12]}",
+                    "type": "function",
+                    "function": {"name": "send_email", "arguments": json.dumps(arguments)}
+                })
+            return None, calls
+        if last.get('role') == 'tool':
+            return "Done! Your email was sent.", None
+        return f"You said: {text[:80]}", None
+
+    def do_GET(self):
+        # Only used as a readiness probe
+        self.send_error(404)
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_error(404)
+            return
+
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        content, tool_calls = self._reply(body)
+        self._sleep()
+
+        if body.get('stream'):
+            self._stream(body, content, tool_calls)
+            return
+
+        message = {"role": "assistant", "content": content}
+        if tool_calls:
+            message["tool_calls"] = tool_calls
+        payload = json.dumps({
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get('model', 'fake'),
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if tool_calls else "stop"
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _stream(self, body, content, tool_calls):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        base = {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get('model', 'fake')
+        }
+
+        def send(data):
+            event = f"data: {data}\n\n".encode()
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(event), event))
+            self.wfile.flush()
+
+        def delta(d, finish_reason=None):
+            send(json.dumps({**base, "choices": [{"index": 0, "delta": d, "finish_reason": finish_reason}]}))
+
+        if tool_calls:
+            for index, call in enumerate(tool_calls):
+                delta({"role": "assistant", "tool_calls": [{
+                    "index": index, "id": call["id"], "type": "function",
+                    "function": {"name": call["function"]["name"], "arguments": ""}
+                }]})
+                arguments = call["function"]["arguments"]
+                for start in range(0, len(arguments), 16):
+                    delta({"tool_calls": [{"index": index, "function": {"arguments": arguments[start:start + 16]}}]})
+            delta({}, "tool_calls")
+        else:
+            for word in content.split(' '):
+                if self.token_latency:
+                    time.sleep(self.token_latency)
+                delta({"content": word + ' '})
+            delta({}, "stop")
+
+        send('[DONE]')
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    # Default listen backlog (5) drops connection bursts and skews latency
+    request_queue_size = 1024
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that hang up early (cancelled hedges) are expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.3, help='seconds before each response starts')
+    parser.add_argument('--jitter', type=float, default=0.0, help='extra random latency, uniform in [0, jitter]')
+    parser.add_argument('--slow-rate', type=float, default=0.0, help='fraction of responses delayed by --slow-latency')
+    parser.add_argument('--slow-latency', type=float, default=2.0, help='extra latency of a slow response')
+    parser.add_argument('--token-latency', type=float, default=0.0, help='delay between streamed tokens')
+    parser.add_argument('--tool-keyword', default='email', help='user text that triggers a send_email call')
+    parser.add_argument('--tool-calls', type=int, default=1, help='parallel send_email calls per triggered turn')
+    parser.add_argument('--seed', type=int, help='seed the injected latency for reproducible runs')
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    FakeOpenAIHandler.latency = args.latency
+    FakeOpenAIHandler.jitter = args.jitter
+    FakeOpenAIHandler.token_latency = args.token_latency
+    FakeOpenAIHandler.slow_rate = args.slow_rate
+    FakeOpenAIHandler.slow_latency = args.slow_latency
+    FakeOpenAIHandler.tool_keyword = args.tool_keyword.lower()
+    FakeOpenAIHandler.tool_calls_per_turn = args.tool_calls
+
+    server = FakeOpenAIServer((args.host, args.port), FakeOpenAIHandler)
+    print(f"Fake OpenAI listening on http://{args.host}:{args.port}/v1", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Sessions-per-core load benchmark for the chat hosts.
+
+Starts a fake OpenAI endpoint and the chosen host (Flask `app.py` or the
+ASGI `asgi_app.py`) wired to the real server/mcp_server.py running on the
+in-memory Gmail backend (or, with --mcp fake, the minimal stand-in MCP
+server), then drives N concurrent chat sessions, each sending several
+/api/chat turns. Reports throughput, latency percentiles and host CPU
+time, from which it derives how many concurrent sessions one fully busy
+core sustains. Nothing touches the network.
+
+    python bench/host_load.py --host flask --sessions 50
+    python bench/host_load.py --host asgi  --sessions 50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shlex
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(REPO_ROOT, 'bench')
+HOST_SCRIPTS = {
+    'flask': os.path.join(REPO_ROOT, 'host', 'app.py'),
+    'asgi': os.path.join(REPO_ROOT, 'host', 'asgi_app.py'),
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def cpu_seconds(pid):
+    """User+system CPU seconds consumed by a process (Linux /proc)"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+    except OSError:
+        return None
+    # utime and stime are fields 14 and 15 of /proc/<pid>/stat
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def wait_for(url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def start_processes(args):
+    """Launch the fake OpenAI endpoint (unless given) and the host"""
+    processes = []
+    openai_url = args.openai_url
+    if not openai_url:
+        port = free_port()
+        processes.append(subprocess.Popen(
+            [sys.executable, os.path.join(BENCH_DIR, 'fake_openai.py'),
+             '--port', str(port), '--latency', str(args.llm_latency), '--jitter', str(args.llm_jitter),
+             '--tool-calls', str(args.tool_calls), '--seed', str(args.seed)],
+            stdout=subprocess.DEVNULL
+        ))
+        openai_url = f'http://127.0.0.1:{port}/v1'
+
+    host_port = free_port()
+    env = {
+        **os.environ,
+        'OPENAI_BASE_URL': openai_url,
+        'OPENAI_API_KEY': os.getenv('OPENAI_API_KEY', 'sk-bench'),
+        'FLASK_PORT': str(host_port),
+        'FLASK_DEBUG': 'False',
+        'MCP_POOL_SIZE': str(args.mcp_pool_size),
+    }
+    if not args.admission:
+        # Measure raw capacity rather than the host's 429 shedding
+        env.update({'ADMISSION_MAX_CONCURRENT': '0', 'ADMISSION_SESSION_RATE': '0'})
+    if args.mcp == 'fake':
+        env['MCP_SERVER_COMMAND'] = shlex.join([
+            sys.executable, os.path.join(BENCH_DIR, 'fake_mcp_server.py'), '--latency', str(args.tool_latency)
+        ])
+    else:
+        # The real MCP server with Gmail replaced by the in-memory backend
+        env.update({
+            'MCP_SERVER_COMMAND': shlex.join([sys.executable, os.path.join(REPO_ROOT, 'server', 'mcp_server.py')]),
+            'GMAIL_BACKEND': 'fake',
+            'FAKE_GMAIL_LATENCY': str(args.tool_latency),
+            'PYTHONPATH': os.pathsep.join(filter(None, [REPO_ROOT, os.getenv('PYTHONPATH')])),
+        })
+    host = subprocess.Popen(
+        [sys.executable, HOST_SCRIPTS[args.host]],
+        env=env,
+        cwd=REPO_ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=None if args.verbose else subprocess.DEVNULL
+    )
+    processes.append(host)
+    return host, f'http://127.0.0.1:{host_port}', processes
+
+
+async def run_session(base_url, turns, tool_every, latencies, errors):
+    """One browser session: load the page for a cookie, then chat"""
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        await client.get('/')
+        for turn in range(turns):
+            if tool_every and turn % tool_every == tool_every - 1:
+                message = f'Send an email about item {turn}'
+            else:
+                message = f'Tell me about item {turn}'
+            started = time.perf_counter()
+            try:
+                response = await client.post('/api/chat', json={'message': message})
+                ok = response.status_code == 200 and response.json().get('success')
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors.append(turn)
+
+
+async def drive(base_url, args):
+    latencies, errors = [], []
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        run_session(base_url, args.turns, args.tool_every, latencies, errors)
+        for _ in range(args.sessions)
+    ))
+    return time.perf_counter() - started, latencies, errors
+
+
+def run_benchmark(args):
+    """Start the processes, drive the load and return the result dict"""
+    host, base_url, processes = start_processes(args)
+    try:
+        wait_for(base_url + '/')
+        cpu_before = cpu_seconds(host.pid)
+        wall, latencies, errors = asyncio.run(drive(base_url, args))
+        cpu_after = cpu_seconds(host.pid)
+    finally:
+        for proc in reversed(processes):
+            proc.terminate()
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    requests = len(latencies)
+    result = {
+        'host': args.host,
+        'mcp': args.mcp,
+        'sessions': args.sessions,
+        'requests': requests,
+        'errors': len(errors),
+        'wall_seconds': round(wall, 3),
+        'throughput_rps': round(requests / wall, 2) if wall else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 1) if latencies else 0.0,
+    }
+    if cpu_before is not None and cpu_after is not None:
+        host_cpu = cpu_after - cpu_before
+        cores_used = host_cpu / wall if wall else 0.0
+        result['host_cpu_seconds'] = round(host_cpu, 3)
+        result['cores_used'] = round(cores_used, 3)
+        # Concurrent sessions one fully busy core would sustain at this latency
+        result['sessions_per_core'] = round(args.sessions / cores_used, 1) if cores_used else None
+    return result
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', choices=sorted(HOST_SCRIPTS), default='asgi')
+    parser.add_argument('--mcp', choices=['server', 'fake'], default='server',
+                        help='real mcp_server.py on the fake Gmail backend, or the minimal stand-in')
+    parser.add_argument('--sessions', type=int, default=50, help='concurrent chat sessions')
+    parser.add_argument('--turns', type=int, default=5, help='messages per session')
+    parser.add_argument('--tool-every', type=int, default=3, help='every Nth turn triggers send_email (0 = never)')
+    parser.add_argument('--tool-calls', type=int, default=1, help='send_email calls per tool turn')
+    parser.add_argument('--llm-latency', type=float, default=0.3, help='fake OpenAI latency per completion')
+    parser.add_argument('--llm-jitter', type=float, default=0.0, help='extra fake OpenAI latency, uniform in [0, jitter]')
+    parser.add_argument('--tool-latency', type=float, default=0.2, help='fake Gmail latency per send')
+    parser.add_argument('--mcp-pool-size', type=int, default=4)
+    parser.add_argument('--admission', action='store_true',
+                        help="keep the host's admission limits (shed turns count as errors)")
+    parser.add_argument('--seed', type=int, default=0, help='seed for the fake OpenAI jitter')
+    parser.add_argument('--openai-url', help='use an already running OpenAI-compatible endpoint')
+    parser.add_argument('--json', action='store_true', help='print the result as JSON')
+    parser.add_argument('--verbose', action='store_true', help='show host logs')
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    result = run_benchmark(args)
+
+    if args.json:
+        print(json.dumps(result))
+    else:
+        for key, value in result.items():
+            print(f"{key:>18}: {value}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Per-message cost of the MCP stdio JSON codecs (mcp/shared/json_codec.py).
+
+For a typical tools/call response and for MB-sized tool results, times
+each available codec on both sides of the transport:
+
+- raw: loads/dumps of the plain dict, as in MCPServer.run() and
+  host/mcp_pool.py;
+- sdk: decode_message/encode_message of a JSONRPCMessage, as in
+  mcp/client/stdio.py.
+
+    python bench/json_codec.py
+    python bench/json_codec.py --sizes 0.001 1 8 --seconds 0.5
+"""
+
+import argparse
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import mcp.types as types
+from mcp.shared.json_codec import OrjsonCodec, StdlibCodec
+
+
+def tool_response(size_mb):
+    """A send_email-style tools/call response whose text is about size_mb MB"""
+    size = max(int(size_mb * 1024 * 1024), 1)
+    sentence = "Dear team, please find the quarterly numbers below. "
+    text = (sentence * (size // len(sentence) + 1))[:size]
+    return {
+        "jsonrpc": "2.0",
+        "id": 42,
+        "result": {
+            "content": [{"type": "text", "text": text}],
+            "structuredContent": {"id": "18c2f9a", "threadId": "18c2f9a", "labelIds": ["SENT"]},
+            "_meta": {"toolDurationMs": 212.4, "traceId": "4bf92f3577b34da6a3ce929d0e0e4736"},
+        },
+    }
+
+
+def per_call(fn, seconds):
+    """Mean microseconds per call of fn, run for about `seconds`"""
+    fn()
+    calls = 0
+    started = time.perf_counter()
+    while True:
+        fn()
+        calls += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= seconds:
+            return elapsed / calls * 1e6
+
+
+def codecs():
+    available = [StdlibCodec()]
+    try:
+        available.append(OrjsonCodec())
+    except ImportError:
+        print("orjson is not installed; timing the standard library only\n")
+    return available
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=float, nargs='+', default=[0.0002, 1, 4], help='tool result sizes in MB')
+    parser.add_argument('--seconds', type=float, default=0.3, help='time spent per measurement')
+    args = parser.parse_args()
+
+    print(f"{'payload':>10}  {'codec':<7}{'raw decode':>12}{'raw encode':>12}{'sdk decode':>12}{'sdk encode':>12}  (us/message)")
+    for size_mb in args.sizes:
+        message = tool_response(size_mb)
+        reference = StdlibCodec().dumps(message)
+        model = types.JSONRPCMessage.model_validate(message)
+        label = f"{len(reference) / 1024:.1f} KB" if len(reference) < 1024 * 1024 else f"{len(reference) / 1024 / 1024:.1f} MB"
+        for codec in codecs():
+            data = codec.dumps(message)
+            timings = [
+                per_call(lambda: codec.loads(data), args.seconds),
+                per_call(lambda: codec.dumps(message), args.seconds),
+                per_call(lambda: codec.decode_message(types.JSONRPCMessage, data), args.seconds),
+                per_call(lambda: codec.encode_message(model), args.seconds),
+            ]
+            print(f"{label:>10}  {codec.name:<7}" + "".join(f"{t:>12.1f}" for t in timings))
+
+
+if __name__ == '__main__':
+    main()
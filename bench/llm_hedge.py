@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Tail-latency benchmark for the shared LLM gateway.
+
+Starts the fake OpenAI endpoint with a slow tail (a fraction of responses
+delayed by --slow-latency), then sends the same workload through
+LLMGateway with hedging off and on, reporting latency percentiles and how
+many requests were hedged. Runs the sync (thread) and async paths.
+
+    python bench/llm_hedge.py --requests 400 --concurrency 8 --slow-rate 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(REPO_ROOT, 'bench')
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from host_load import free_port, percentile, wait_for  # noqa: E402
+from mcp.client.llm_gateway import LLMGateway  # noqa: E402
+
+MESSAGES = [{"role": "user", "content": "Tell me about item 1"}]
+
+
+def summarize(label, latencies, errors, wall, gateway):
+    stats = gateway.stats()
+    return {
+        'mode': label,
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / wall, 2) if wall else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'max_ms': round(max(latencies) * 1000, 1) if latencies else 0.0,
+        'hedged': stats['hedged'],
+        'hedge_wins': stats['hedge_wins'],
+    }
+
+
+def run_sync(gateway, args):
+    latencies, errors = [], 0
+
+    def one(_):
+        started = time.perf_counter()
+        try:
+            gateway.complete(model='fake', messages=MESSAGES, deadline=args.deadline)
+            return time.perf_counter() - started
+        except Exception:
+            return None
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for latency in pool.map(one, range(args.requests)):
+            if latency is None:
+                errors += 1
+            else:
+                latencies.append(latency)
+    return latencies, errors, time.perf_counter() - started
+
+
+async def run_async(gateway, args):
+    latencies, errors = [], 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await gateway.acomplete(model='fake', messages=MESSAGES, deadline=args.deadline)
+                latencies.append(time.perf_counter() - started)
+            except Exception:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(args.requests)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.05, help='fake OpenAI base latency')
+    parser.add_argument('--jitter', type=float, default=0.02, help='extra uniform latency')
+    parser.add_argument('--slow-rate', type=float, default=0.05, help='fraction of slow responses')
+    parser.add_argument('--slow-latency', type=float, default=1.0, help='extra latency of a slow response')
+    parser.add_argument('--deadline', type=float, default=10.0, help='per-call deadline')
+    parser.add_argument('--mode', choices=['sync', 'async', 'both'], default='both')
+    parser.add_argument('--json', action='store_true', help='print results as JSON lines')
+    args = parser.parse_args()
+
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH_DIR, 'fake_openai.py'), '--port', str(port),
+         '--latency', str(args.latency), '--jitter', str(args.jitter),
+         '--slow-rate', str(args.slow_rate), '--slow-latency', str(args.slow_latency)],
+        stdout=subprocess.DEVNULL
+    )
+    base_url = f'http://127.0.0.1:{port}/v1'
+    results = []
+    try:
+        wait_for(f'http://127.0.0.1:{port}/')
+        for hedge in (False, True):
+            if args.mode in ('sync', 'both'):
+                gateway = LLMGateway(api_key='sk-bench', base_url=base_url, hedge=hedge, max_retries=0)
+                latencies, errors, wall = run_sync(gateway, args)
+                results.append(summarize(f"sync{' +hedge' if hedge else ''}", latencies, errors, wall, gateway))
+            if args.mode in ('async', 'both'):
+                gateway = LLMGateway(api_key='sk-bench', base_url=base_url, hedge=hedge, max_retries=0)
+                latencies, errors, wall = asyncio.run(run_async(gateway, args))
+                results.append(summarize(f"async{' +hedge' if hedge else ''}", latencies, errors, wall, gateway))
+    finally:
+        server.terminate()
+        server.wait(timeout=5)
+
+    for result in results:
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print('  '.join(f"{key}={value}" for key, value in result.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite with baseline comparison.
+
+Runs a fixed set of /api/chat load scenarios (see SCENARIOS) through
+host_load.py, with the fake OpenAI endpoint and the real MCP server on the
+in-memory Gmail backend, so no network is needed. Save a run as the
+baseline, then re-run after a change to compare:
+
+    python bench/suite.py --save bench/baseline.json
+    # ...change host/app.py, server/mcp_server.py or mcp/...
+    python bench/suite.py --baseline bench/baseline.json --max-regression 10
+
+With --max-regression, the exit status is 1 if any scenario's p95 latency
+grew, or its throughput dropped, by more than that many percent.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from host_load import build_parser, run_benchmark  # noqa: E402
+
+# name -> host_load.py arguments; the fake latencies keep results comparable
+SCENARIOS = {
+    'flask-chat': ['--host', 'flask', '--sessions', '20', '--tool-every', '0'],
+    'flask-tools': ['--host', 'flask', '--sessions', '20', '--tool-every', '2'],
+    'asgi-chat': ['--host', 'asgi', '--sessions', '20', '--tool-every', '0'],
+    'asgi-tools': ['--host', 'asgi', '--sessions', '20', '--tool-every', '2'],
+    'asgi-tools-wide': ['--host', 'asgi', '--sessions', '100', '--tool-every', '2', '--tool-calls', '3'],
+}
+
+COMMON = ['--turns', '5', '--llm-latency', '0.2', '--tool-latency', '0.1', '--seed', '1']
+
+# metric -> True if higher is better
+COMPARED = {
+    'p50_ms': False,
+    'p95_ms': False,
+    'p99_ms': False,
+    'throughput_rps': True,
+    'cores_used': False,
+}
+
+
+def run_scenario(name, repeat, extra):
+    """Run a scenario `repeat` times and keep the median of each metric"""
+    runs = []
+    for _ in range(repeat):
+        args = build_parser().parse_args(COMMON + SCENARIOS[name] + extra)
+        runs.append(run_benchmark(args))
+    result = dict(runs[-1])
+    for key in COMPARED:
+        values = [run[key] for run in runs if run.get(key) is not None]
+        if values:
+            result[key] = round(statistics.median(values), 3)
+    result['errors'] = sum(run['errors'] for run in runs)
+    return result
+
+
+def change(old, new):
+    if not old:
+        return None
+    return (new - old) / old * 100
+
+
+def compare(baseline, results, max_regression):
+    """Print deltas against the baseline; return the names of regressed scenarios"""
+    regressed = []
+    for name, result in results.items():
+        before = baseline.get('scenarios', {}).get(name)
+        if before is None:
+            print(f"{name}: not in baseline")
+            continue
+        cells = []
+        bad = False
+        for key, higher_is_better in COMPARED.items():
+            if before.get(key) is None or result.get(key) is None:
+                continue
+            delta = change(before[key], result[key])
+            if delta is None:
+                continue
+            cells.append(f"{key} {before[key]} -> {result[key]} ({delta:+.1f}%)")
+            worse = -delta if higher_is_better else delta
+            if max_regression is not None and key in ('p95_ms', 'throughput_rps') and worse > max_regression:
+                bad = True
+        print(f"{name}{'  REGRESSED' if bad else ''}")
+        for cell in cells:
+            print(f"    {cell}")
+        if bad:
+            regressed.append(name)
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', nargs='+', choices=sorted(SCENARIOS), help='run a subset of scenarios')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per scenario (median is reported)')
+    parser.add_argument('--save', help='write results to this JSON file')
+    parser.add_argument('--baseline', help='compare against a saved JSON file')
+    parser.add_argument('--max-regression', type=float,
+                        help='fail if p95 or throughput is worse than the baseline by more than this percent')
+    parser.add_argument('--mcp', choices=['server', 'fake'], default='server')
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.only or SCENARIOS:
+        print(f"Running {name}...", file=sys.stderr, flush=True)
+        results[name] = run_scenario(name, args.repeat, ['--mcp', args.mcp])
+        summary = ', '.join(f"{key}={results[name].get(key)}" for key in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps', 'errors'))
+        print(f"{name}: {summary}", flush=True)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'machine': {'python': platform.python_version(), 'cpus': os.cpu_count(), 'platform': platform.platform()},
+                'common': COMMON,
+                'scenarios': results,
+            }, f, indent=2)
+        print(f"Saved results to {args.save}")
+
+    failed = any(result['errors'] for result in results.values())
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {args.baseline} ({baseline.get('created', 'unknown date')}):")
+        failed = bool(compare(baseline, results, args.max_regression)) or failed
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+"""
+Admission control in front of chat turns.
+
+Two checks run before a turn may start its OpenAI and MCP calls:
+
+- a token bucket per session (ADMISSION_SESSION_RATE turns per second,
+  bursts of ADMISSION_SESSION_BURST), so one client can't monopolize the host;
+- a global cap of ADMISSION_MAX_CONCURRENT turns in progress. Turns beyond the
+  cap wait in a queue of at most ADMISSION_QUEUE_SIZE for up to
+  ADMISSION_QUEUE_TIMEOUT seconds.
+
+A turn that fails either check is shed with AdmissionRejected, which the
+hosts turn into 429 with a Retry-After header. Limits are per process.
+"""
+
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import ADMISSION_ACTIVE, ADMISSION_QUEUE_DEPTH, ADMISSION_SHED
+
+RATE, QUEUE_FULL, TIMEOUT = 'rate', 'queue_full', 'timeout'
+
+
+class AdmissionRejected(Exception):
+    """A chat turn that was shed; retry_after is a whole number of seconds"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__({
+            RATE: "Too many messages, please slow down",
+            QUEUE_FULL: "Server is busy, please try again shortly",
+            TIMEOUT: "Server is busy, please try again shortly",
+        }[reason])
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class SessionBuckets:
+    """Token bucket per session, refilled lazily; idle buckets are evicted LRU"""
+
+    def __init__(self, rate, burst, max_sessions=10000):
+        """
+        Args:
+            rate: Tokens added per second (0 disables the limit)
+            burst: Bucket capacity
+            max_sessions: Buckets kept before the least recently used is dropped
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_sessions = max_sessions
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, session_id):
+        """Spend a token; returns 0 if one was available, else seconds until one is"""
+        if self.rate <= 0:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(session_id, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[session_id] = (tokens, now)
+            # A dropped bucket just starts full again, so eviction is harmless
+            while len(self._buckets) > self.max_sessions:
+                self._buckets.popitem(last=False)
+            return wait
+
+
+class _Ticket:
+    """A granted slot; release() is idempotent so callers may release on several paths"""
+
+    __slots__ = ('_admission', '_started', '_released')
+
+    def __init__(self, admission):
+        self._admission = admission
+        self._started = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._admission._release(time.monotonic() - self._started)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class Admission:
+    """Admission control for the Flask host (threads block in the wait queue)"""
+
+    def __init__(self, max_concurrent=None, queue_size=None, timeout=None, rate=None, burst=None):
+        """
+        Args:
+            max_concurrent: Turns in progress at once (ADMISSION_MAX_CONCURRENT, default 32; 0 = unlimited)
+            queue_size: Turns allowed to wait for a slot (ADMISSION_QUEUE_SIZE, default 64)
+            timeout: Seconds a turn may wait for a slot (ADMISSION_QUEUE_TIMEOUT, default 10)
+            rate: Turns per second per session (ADMISSION_SESSION_RATE, default 1; 0 = unlimited)
+            burst: Turns a session may send back to back (ADMISSION_SESSION_BURST, default 10)
+        """
+        self.max_concurrent = max_concurrent if max_concurrent is not None else int(os.getenv('ADMISSION_MAX_CONCURRENT', '32'))
+        self.queue_size = queue_size if queue_size is not None else int(os.getenv('ADMISSION_QUEUE_SIZE', '64'))
+        self.timeout = timeout if timeout is not None else float(os.getenv('ADMISSION_QUEUE_TIMEOUT', '10'))
+        self.buckets = SessionBuckets(
+            rate if rate is not None else float(os.getenv('ADMISSION_SESSION_RATE', '1')),
+            burst if burst is not None else float(os.getenv('ADMISSION_SESSION_BURST', '10'))
+        )
+        self._active = 0
+        self._waiting = 0
+        # Moving average of how long a turn holds its slot, for Retry-After
+        self._hold = None
+        self._admitted = 0
+        self._shed = {RATE: 0, QUEUE_FULL: 0, TIMEOUT: 0}
+        self._changed = threading.Condition()
+
+    def _reject(self, reason, retry_after):
+        self._shed[reason] += 1
+        ADMISSION_SHED.inc(reason=reason)
+        return AdmissionRejected(reason, retry_after)
+
+    def _busy_retry_after(self):
+        """Rough time for the queue ahead of a new arrival to drain"""
+        hold = self._hold or 1.0
+        return hold * (self._waiting + 1) / max(self.max_concurrent, 1)
+
+    def _check_rate(self, session_id):
+        wait = self.buckets.take(session_id)
+        if wait:
+            with self._changed:
+                raise self._reject(RATE, wait)
+
+    def _grant(self):
+        self._active += 1
+        self._admitted += 1
+        ADMISSION_ACTIVE.inc()
+        return _Ticket(self)
+
+    def acquire(self, session_id):
+        """Wait for a slot for this session's turn; raises AdmissionRejected if shed"""
+        self._check_rate(session_id)
+        deadline = time.monotonic() + self.timeout
+        with self._changed:
+            if self.max_concurrent and self._active >= self.max_concurrent:
+                if self._waiting >= self.queue_size:
+                    raise self._reject(QUEUE_FULL, self._busy_retry_after())
+                self._waiting += 1
+                ADMISSION_QUEUE_DEPTH.inc()
+                try:
+                    while self._active >= self.max_concurrent:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise self._reject(TIMEOUT, self._busy_retry_after())
+                        self._changed.wait(remaining)
+                finally:
+                    self._waiting -= 1
+                    ADMISSION_QUEUE_DEPTH.dec()
+            return self._grant()
+
+    def _release(self, held):
+        with self._changed:
+            self._active -= 1
+            ADMISSION_ACTIVE.dec()
+            self._hold = held if self._hold is None else 0.9 * self._hold + 0.1 * held
+            self._changed.notify()
+
+    def stats(self):
+        with self._changed:
+            return {
+                'active': self._active,
+                'waiting': self._waiting,
+                'admitted': self._admitted,
+                'shed': dict(self._shed),
+                'max_concurrent': self.max_concurrent,
+                'queue_size': self.queue_size,
+            }
+
+
+class AsyncAdmission(Admission):
+    """Admission control for the ASGI host (single event loop, no locking needed)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._slots = asyncio.Semaphore(self.max_concurrent) if self.max_concurrent else None
+
+    async def acquire(self, session_id):
+        self._check_rate(session_id)
+        if self._slots is not None and self._slots.locked():
+            if self._waiting >= self.queue_size:
+                raise self._reject(QUEUE_FULL, self._busy_retry_after())
+            self._waiting += 1
+            ADMISSION_QUEUE_DEPTH.inc()
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                raise self._reject(TIMEOUT, self._busy_retry_after()) from None
+            finally:
+                self._waiting -= 1
+                ADMISSION_QUEUE_DEPTH.dec()
+        elif self._slots is not None:
+            await self._slots.acquire()
+        return self._grant()
+
+    def _release(self, held):
+        self._active -= 1
+        ADMISSION_ACTIVE.dec()
+        self._hold = held if self._hold is None else 0.9 * self._hold + 0.1 * held
+        if self._slots is not None:
+            self._slots.release()
@@ -1,10 +1,32 @@
-from flask import Flask, render_template, request, jsonify, session
+import os
+import sys
+
+# Use the repo's own mcp package rather than any installed copy
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# With STARTUP_PROFILE=True, the imports below and the init steps are timed
+from server import startup_profile
+startup_profile.install()
+
+from flask import Flask, Response, render_template, request, jsonify, session, stream_with_context
 import logging
-import subprocess
 import json
-import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
-from openai import OpenAI
+
+from mcp.client.llm_gateway import get_gateway
+from mcp_pool import LazyPool
+from tool_cache import ToolCache
+from single_flight import SingleFlight, request_key
+from admission import Admission, AdmissionRejected
+from batch import parse_items, batch_concurrency, run_batch, retry_shed
+from tool_jobs import JobStore, PendingReply, should_defer, start_job, poll_args
+from metrics import registry as metrics_registry, track, timed, observe_tool_backend, TOOL_CALLS, CONTENT_TYPE
+from server import tracing
+from chat_core import (
+    conversations, summarizer, build_messages, remember_turn, mcp_tools_to_openai, tool_result_text,
+    terminal_reply, parse_tool_calls, append_tool_results, format_sse, TOOL_CALL_CONCURRENCY
+)
 
 # Load environment variables
 load_dotenv()
@@ -16,12 +38,68 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 app.secret_key = os.getenv('FLASK_SECRET_KEY', 'your-secret-key-for-sessions')  # Add to .env
 
-# Initialize OpenAI client
-openai_client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+# Shared OpenAI gateway: pooled connections, deadlines, optional hedging
+llm = get_gateway()
+
+# OpenAI-format tool list, refreshed on tools/list_changed or TTL expiry
+tool_cache = ToolCache(lambda: load_mcp_tools())
+
+# Long-lived, pre-initialized MCP server processes (size via MCP_POOL_SIZE),
+# started by start_background() in each serving process, never at import
+mcp_pool = LazyPool(on_notification=tool_cache.handle_notification)
+
+# Conversation summaries are produced here, after the reply has been sent
+summary_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='summarize')
+
+def complete_summary(messages):
+    """Ask the model for a conversation summary"""
+    response = llm.complete(
+        model=summarizer.model,
+        messages=messages
+    )
+    return response.choices[0].message.content
+
+summarizer.runner = lambda session_id: summary_executor.submit(summarizer.compact, session_id, complete_summary)
+
+# Identical (session, message) requests in flight share one execution
+chat_flights = SingleFlight()
+
+# Per-session rate limits and a global cap (with a bounded wait queue) on chat turns
+admission = Admission()
+
+# Deferred tool turns (TOOL_JOBS_ENABLED) and the workers that finish them
+tool_jobs = JobStore()
+job_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('TOOL_JOBS_WORKERS', '4')),
+    thread_name_prefix='tool-job'
+)
+
+_started_pid = None
 
-# Store conversations in memory (simple approach for demo)
-# For production, use database or Redis
-conversations = {}
+def start_background():
+    """
+    Start this process's background work: the MCP pool, the OpenAI SDK
+    preload and the metrics flusher.
+
+    Runs once per process: from __main__ in the process that serves (not the
+    reloader parent), or on the first request of a WSGI worker, so forked
+    workers each get their own.
+    """
+    global _started_pid
+    if _started_pid == os.getpid():
+        return
+    _started_pid = os.getpid()
+    # The OpenAI SDK is slow to import; load it off the startup path
+    llm.preload()
+    # Snapshot metrics for cross-worker aggregation when METRICS_DIR is set
+    metrics_registry.start()
+    with startup_profile.phase('mcp pool'):
+        mcp_pool.get()
+    startup_profile.report()
+
+@app.before_request
+def ensure_started():
+    start_background()
 
 @app.route('/')
 def index():
@@ -44,17 +122,32 @@ def chat():
         
         logger.info(f"[{session_id}] Received message: {user_message}")
         
-        # Get conversation history for this session
-        if session_id not in conversations:
-            conversations[session_id] = []
+        # One trace per request, continuing the caller's if it sent a traceparent
+        with tracing.span('POST /api/chat', traceparent=request.headers.get('traceparent'),
+                          session=session_id) as root:
+            # Call OpenAI with history; a double-submit of the same message
+            # waits for and shares the first execution
+            key, keep = request_key(session_id, user_message, data.get('request_id'))
+            response, shared = chat_flights.do(key, lambda: admitted_chat(user_message, session_id), keep=keep)
+            if shared:
+                logger.info(f"[{session_id}] Coalesced duplicate message")
+            root.set(shared=shared)
         
-        # Call OpenAI with history
-        response = chat_with_mcp_tools(user_message, session_id)
-        
-        return jsonify({
+        payload = {
             'success': True,
             'response': response
-        })
+        }
+        # A slow tool is still running; the client follows /api/jobs/<job_id>
+        if isinstance(response, PendingReply):
+            payload['job_id'] = response.job_id
+        return jsonify(payload), {'X-Trace-Id': root.trace_id}
+    
+    except AdmissionRejected as e:
+        logger.warning(f"[{session_id}] Shed chat turn ({e.reason}), retry after {e.retry_after}s")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 429, {'Retry-After': str(e.retry_after)}
     
     except Exception as e:
         logger.error(f"Error: {e}", exc_info=True)
@@ -63,133 +156,303 @@ def chat():
             'error': str(e)
         }), 500
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Handle chat messages, streaming tokens and tool progress over SSE"""
+    data = request.json
+    user_message = data.get('message', '')
+    
+    # Get session ID
+    session_id = session.get('session_id', 'default')
+    
+    logger.info(f"[{session_id}] Received streaming message: {user_message}")
+    
+    # Shares in-flight executions with /api/chat as well
+    key, keep = request_key(session_id, user_message, data.get('request_id'))
+    call, leader = chat_flights.begin(key)
+    
+    # Only the leader runs a turn, so only it needs a slot; a shed turn
+    # is answered with 429 before the stream starts
+    ticket = None
+    if leader:
+        try:
+            ticket = admission.acquire(session_id)
+        except AdmissionRejected as e:
+            chat_flights.finish(key, call, error=e)
+            logger.warning(f"[{session_id}] Shed chat turn ({e.reason}), retry after {e.retry_after}s")
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 429, {'Retry-After': str(e.retry_after)}
+    
+    # The trace covers the whole stream, so its root span opens inside
+    # generate(); pick the ID now so it can go out in the response headers
+    traceparent = request.headers.get('traceparent')
+    trace_id = tracing.parse_traceparent(traceparent)[0] or tracing.new_trace_id()
+    
+    def generate():
+        with tracing.span('POST /api/chat/stream', traceparent=traceparent, trace_id=trace_id,
+                          session=session_id) as root:
+            if not leader:
+                # Duplicate of a message already being answered: wait and reuse
+                logger.info(f"[{session_id}] Coalesced duplicate message")
+                root.set(shared=True)
+                try:
+                    yield format_sse('done', {'response': chat_flights.wait(call)})
+                except Exception as e:
+                    yield format_sse('error', {'error': str(e)})
+                return
+            
+            reply = None
+            error = None
+            try:
+                for event, payload in stream_chat_with_mcp_tools(user_message, session_id):
+                    if event == 'done':
+                        reply = payload['response']
+                    yield format_sse(event, payload)
+            except Exception as e:
+                logger.error(f"Error: {e}", exc_info=True)
+                error = e
+                yield format_sse('error', {'error': str(e)})
+            finally:
+                ticket.release()
+                if reply is None and error is None:
+                    error = RuntimeError("Request was interrupted")
+                chat_flights.finish(key, call, result=reply, error=error, keep=keep)
+    
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            # Stop reverse proxies from buffering the stream
+            'X-Accel-Buffering': 'no',
+            'X-Trace-Id': trace_id
+        }
+    )
+    if leader:
+        # Also frees the slot and releases duplicates if the client leaves
+        # before the stream starts (generate() then never runs); both are
+        # no-ops once generate() has finished
+        response.call_on_close(ticket.release)
+        response.call_on_close(
+            lambda: chat_flights.finish(key, call, error=RuntimeError("Request was interrupted"))
+        )
+    return response
+
+@app.route('/api/batch', methods=['POST'])
+def batch():
+    """Run a JSONL batch of chat turns; results stream back as JSONL as they finish"""
+    try:
+        items = parse_items(request.get_data(as_text=True))
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    concurrency = batch_concurrency(request.args.get('concurrency'))
+    traceparent = request.headers.get('traceparent')
+    
+    logger.info(f"Running batch of {len(items)} items, {concurrency} sessions at a time")
+    
+    def generate():
+        with tracing.span('POST /api/batch', traceparent=traceparent, items=len(items)):
+            for result in run_batch(items, tracing.propagate(run_batch_item), concurrency):
+                yield json.dumps(result) + '\n'
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/stats', methods=['GET'])
+def stats():
+    """Conversation store, MCP pool and LLM gateway counters for capacity planning"""
+    return jsonify({
+        'conversations': conversations.stats(),
+        'mcp_pool': mcp_pool.stats(),
+        'llm': llm.stats(),
+        'admission': admission.stats()
+    })
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Poll a background tool job; ?wait=<seconds>&version=<n> long-polls for a change"""
+    session_id = session.get('session_id', 'default')
+    try:
+        wait, version = poll_args(request.args.get('wait'), request.args.get('version'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    job = tool_jobs.poll(job_id, session_id, wait, version)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    return jsonify({'success': True, 'job': job})
+
+@app.route('/api/jobs/<job_id>/stream', methods=['GET'])
+def job_stream(job_id):
+    """Stream a background tool job's status changes over SSE until it finishes"""
+    session_id = session.get('session_id', 'default')
+    if tool_jobs.get(job_id, session_id) is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    
+    return Response(
+        stream_with_context(tool_jobs.events(job_id, session_id)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Per-stage latency histograms, counters and in-flight gauges (Prometheus text)"""
+    return Response(metrics_registry.render(), mimetype=CONTENT_TYPE)
+
+def load_mcp_tools():
+    """Fetch tools from the MCP server and convert them to OpenAI format"""
+    # Ask a pooled MCP server for its tools
+    result = mcp_pool.request('tools/list')
+    
+    return mcp_tools_to_openai(result.get('tools', []))
+
 def get_mcp_tools():
-    """Get available tools from MCP server"""
+    """Get available tools, served from the host-side cache"""
     try:
-        # Start MCP server
-        proc = subprocess.Popen(
-            ['python', 'server/mcp_server.py'],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        
-        # Send tools/list request
-        request = {
-            "jsonrpc": "2.0",
-            "id": 1,
-            "method": "tools/list",
-            "params": {}
-        }
-        
-        proc.stdin.write((json.dumps(request) + '\n').encode())
-        proc.stdin.flush()
-        
-        # Read response
-        response_line = proc.stdout.readline().decode()
-        response = json.loads(response_line)
-        
-        proc.terminate()
-        
-        # Convert MCP tools to OpenAI format
-        tools = []
-        if 'result' in response and 'tools' in response['result']:
-            for tool in response['result']['tools']:
-                tools.append({
-                    "type": "function",
-                    "function": {
-                        "name": tool['name'],
-                        "description": tool.get('description', ''),
-                        "parameters": tool.get('parameters', {})
-                    }
-                })
-        
-        return tools
+        return tool_cache.get()
         
     except Exception as e:
         logger.error(f"Error getting MCP tools: {e}")
         return []
 
+def get_mcp_tools_json():
+    """Serialized tool list (for prompt token budgeting), or None if unavailable"""
+    try:
+        return tool_cache.get_json()
+    except Exception as e:
+        logger.error(f"Error getting MCP tools: {e}")
+        return None
+
+def tool_call_params(tool_name, arguments):
+    """tools/call params for one call"""
+    return {
+        "name": tool_name,
+        "arguments": arguments,
+        # Lets the server's spans join this request's trace
+        "_meta": tracing.trace_meta()
+    }
+
+def tool_outcome(tool_name, result):
+    """What the model sees for a tools/call result, or for the exception the call failed with"""
+    if isinstance(result, Exception):
+        logger.error(f"Error calling MCP tool: {result}")
+        TOOL_CALLS.inc(tool=tool_name, outcome='error')
+        return f"Error: {str(result)}"
+    observe_tool_backend(tool_name, result)
+    TOOL_CALLS.inc(tool=tool_name, outcome='ok')
+    return tool_result_text(result)
+
 def call_mcp_tool(tool_name, arguments):
     """Call a tool via MCP server"""
     try:
-        # Start MCP server
-        proc = subprocess.Popen(
-            ['python', 'server/mcp_server.py'],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        
-        # Send tool call request
-        request = {
-            "jsonrpc": "2.0",
-            "id": 2,
-            "method": "tools/call",
-            "params": {
-                "name": tool_name,
-                "arguments": arguments
-            }
-        }
-        
-        proc.stdin.write((json.dumps(request) + '\n').encode())
-        proc.stdin.flush()
-        
-        # Read response
-        response_line = proc.stdout.readline().decode()
-        response = json.loads(response_line)
-        
-        proc.terminate()
-        
-        if 'result' in response:
-            # Extract text from content
-            if 'content' in response['result']:
-                content = response['result']['content']
-                if isinstance(content, list) and len(content) > 0:
-                    return content[0].get('text', str(content))
-            return str(response['result'])
-        
-        return "Tool executed successfully"
-        
+        # Call the tool on a pooled MCP server
+        with track('mcp_tool_call'):
+            result = mcp_pool.request('tools/call', tool_call_params(tool_name, arguments))
     except Exception as e:
-        logger.error(f"Error calling MCP tool: {e}")
-        return f"Error: {str(e)}"
+        result = e
+    return tool_outcome(tool_name, result)
+
+def call_mcp_tools(calls):
+    """Send several (tool_call_id, name, arguments) calls to one pooled MCP server as a JSON-RPC batch"""
+    try:
+        with track('mcp_tool_call'):
+            results = mcp_pool.request_batch([
+                ('tools/call', tool_call_params(tool_name, arguments)) for _, tool_name, arguments in calls
+            ])
+    except Exception as e:
+        # The process failed as a whole (e.g. it died): every call fails with it
+        results = [e] * len(calls)
+    return [tool_outcome(tool_name, result) for (_, tool_name, _), result in zip(calls, results)]
+
+def admitted_chat(user_message, session_id):
+    """Run a chat turn once admission control lets it in"""
+    with admission.acquire(session_id):
+        return chat_with_mcp_tools(user_message, session_id)
+
+def run_batch_item(item):
+    """One batch turn, admitted like any other; a deferred tool job is waited for so the result is final"""
+    reply = retry_shed(lambda: admitted_chat(item.message, item.session_id))
+    return tool_jobs.final_reply(reply, item.session_id)
+
+def iter_tool_calls(calls):
+    """
+    Run (tool_call_id, name, arguments) calls concurrently, yielding
+    (index, result) as each finishes; the streaming path uses this to report
+    each result as soon as it is in. The pool belongs to this turn, so
+    TOOL_CALL_CONCURRENCY bounds one turn and turns don't queue behind each
+    other.
+    """
+    workers = min(TOOL_CALL_CONCURRENCY, len(calls)) or 1
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tool-call') as executor:
+        futures = {}
+        for index, (_, tool_name, arguments) in enumerate(calls):
+            logger.info(f"Calling tool: {tool_name} with args: {arguments}")
+            futures[executor.submit(tracing.propagate(call_mcp_tool), tool_name, arguments)] = index
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+def run_tool_calls(calls, on_result=None):
+    """
+    Run a turn's (tool_call_id, name, arguments) calls; results keep call order.
+
+    Several calls go out as one JSON-RPC batch: a single write to one pooled
+    MCP server, which runs them concurrently (up to its
+    MCP_SERVER_MAX_IN_FLIGHT) and answers with one line, instead of holding
+    a pooled process per call.
+    """
+    for _, tool_name, arguments in calls:
+        logger.info(f"Calling tool: {tool_name} with args: {arguments}")
+    if len(calls) == 1:
+        results = [call_mcp_tool(calls[0][1], calls[0][2])]
+    else:
+        results = call_mcp_tools(calls)
+    if on_result is not None:
+        for index, result in enumerate(results):
+            on_result(index, result)
+    return results
+
+def reply_after_tools(messages, calls, results):
+    """The turn's reply once its tool calls are done: templated for terminal tools, else a second completion"""
+    append_tool_results(messages, calls, results)
+    
+    # Terminal tools (e.g. a sent email) need no second completion
+    assistant_reply = terminal_reply(calls, results)
+    if assistant_reply is None:
+        with track('llm_final'):
+            final_response = llm.complete(
+                model=os.getenv('OPENAI_MODEL', 'gpt-4o-mini'),
+                messages=messages
+            )
+        assistant_reply = final_response.choices[0].message.content
+    return assistant_reply
 
+@timed('chat')
 def chat_with_mcp_tools(user_message, session_id):
     """Chat with OpenAI using MCP tools and conversation history"""
     try:
         # Get available tools
-        tools = get_mcp_tools()
+        with track('mcp_tools_list'):
+            tools = get_mcp_tools()
+            tools_json = get_mcp_tools_json() if tools else None
         logger.info(f"Got {len(tools)} tools from MCP server")
         
-        # Get conversation history
-        history = conversations.get(session_id, [])
-        
-        # Build messages with history
-        messages = [
-            {
-                "role": "system",
-                "content": "You are a helpful AI assistant that can send emails via Gmail. "
-                          "Remember the conversation context. If the user provides information across "
-                          "multiple messages (like recipient, then subject, then body), remember all "
-                          "parts before sending the email. Ask for any missing information."
-            }
-        ]
-        
-        # Add conversation history
-        messages.extend(history)
-        
-        # Add current user message
-        messages.append({
-            "role": "user",
-            "content": user_message
-        })
-        
-        response = openai_client.chat.completions.create(
-            model=os.getenv('OPENAI_MODEL', 'gpt-4o-mini'),
-            messages=messages,
-            tools=tools if tools else None
-        )
+        messages = build_messages(user_message, session_id, tools_json)
+        
+        with track('llm_first'):
+            response = llm.complete(
+                model=os.getenv('OPENAI_MODEL', 'gpt-4o-mini'),
+                messages=messages,
+                tools=tools if tools else None
+            )
         
         message = response.choices[0].message
         
@@ -199,42 +462,19 @@ def chat_with_mcp_tools(user_message, session_id):
             
             # Add assistant message to conversation
             messages.append(message)
+            calls = parse_tool_calls(message.tool_calls)
             
-            # Execute each tool call
-            for tool_call in message.tool_calls:
-                tool_name = tool_call.function.name
-                arguments = json.loads(tool_call.function.arguments)
-                
-                logger.info(f"Calling tool: {tool_name} with args: {arguments}")
-                
-                # Call the tool via MCP
-                result = call_mcp_tool(tool_name, arguments)
-                
-                # Add tool result to conversation
-                messages.append({
-                    "role": "tool",
-                    "tool_call_id": tool_call.id,
-                    "content": str(result)
-                })
+            # Slow tools: reply now, finish the turn in the background
+            if should_defer([tool_name for _, tool_name, _ in calls]):
+                return start_tool_job(session_id, user_message, messages, calls)
             
-            # Get final response
-            final_response = openai_client.chat.completions.create(
-                model=os.getenv('OPENAI_MODEL', 'gpt-4o-mini'),
-                messages=messages
-            )
-            
-            assistant_reply = final_response.choices[0].message.content
+            assistant_reply = reply_after_tools(messages, calls, run_tool_calls(calls))
         else:
             # No tool calls, use direct response
             assistant_reply = message.content
         
         # Update conversation history
-        conversations[session_id].append({"role": "user", "content": user_message})
-        conversations[session_id].append({"role": "assistant", "content": assistant_reply})
-        
-        # Keep only last 20 messages to avoid token limits
-        if len(conversations[session_id]) > 20:
-            conversations[session_id] = conversations[session_id][-20:]
+        remember_turn(session_id, user_message, assistant_reply)
         
         return assistant_reply
         
@@ -242,5 +482,131 @@ def chat_with_mcp_tools(user_message, session_id):
         logger.error(f"Error in chat_with_mcp_tools: {e}", exc_info=True)
         raise
 
+def start_tool_job(session_id, user_message, messages, calls):
+    """Hand the rest of a turn to a background job and return the interim reply"""
+    return start_job(
+        tool_jobs, session_id, user_message, calls,
+        lambda job_id: job_executor.submit(tracing.propagate(run_tool_job), job_id, session_id, messages, calls)
+    )
+
+def run_tool_job(job_id, session_id, messages, calls):
+    """Finish a deferred turn: run the tool calls, then the follow-up completion"""
+    with tool_jobs.run(job_id, session_id) as job:
+        results = run_tool_calls(calls, on_result=job.tool_done)
+        job.finish(reply_after_tools(messages, calls, results))
+
+def stream_completion(messages, tools=None):
+    """
+    Stream one OpenAI completion.
+
+    Yields ('token', text) for each content delta and finally
+    ('message', assistant_message_dict) with any tool calls reassembled.
+    """
+    stream = llm.complete(
+        model=os.getenv('OPENAI_MODEL', 'gpt-4o-mini'),
+        messages=messages,
+        tools=tools if tools else None,
+        stream=True
+    )
+    
+    content = []
+    tool_calls = {}
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+        
+        if delta.content:
+            content.append(delta.content)
+            yield 'token', delta.content
+        
+        # Tool call names/arguments arrive in fragments keyed by index
+        for fragment in delta.tool_calls or []:
+            call = tool_calls.setdefault(fragment.index, {
+                "id": None,
+                "type": "function",
+                "function": {"name": "", "arguments": ""}
+            })
+            if fragment.id:
+                call["id"] = fragment.id
+            if fragment.function and fragment.function.name:
+                call["function"]["name"] += fragment.function.name
+            if fragment.function and fragment.function.arguments:
+                call["function"]["arguments"] += fragment.function.arguments
+    
+    message = {"role": "assistant", "content": ''.join(content) or None}
+    if tool_calls:
+        message["tool_calls"] = [tool_calls[index] for index in sorted(tool_calls)]
+    yield 'message', message
+
+def stream_chat_with_mcp_tools(user_message, session_id):
+    """
+    Streaming variant of chat_with_mcp_tools().
+
+    Yields (event, data) pairs: 'token' deltas, 'tool_call' / 'tool_result'
+    progress, then a single 'done' with the full reply.
+    """
+    with track('chat'):
+        with track('mcp_tools_list'):
+            tools = get_mcp_tools()
+            tools_json = get_mcp_tools_json() if tools else None
+        messages = build_messages(user_message, session_id, tools_json)
+        
+        message = None
+        with track('llm_first'):
+            for event, data in stream_completion(messages, tools):
+                if event == 'token':
+                    yield 'token', {"content": data}
+                else:
+                    message = data
+        
+        if message.get("tool_calls"):
+            logger.info(f"GPT wants to call {len(message['tool_calls'])} tools")
+            messages.append(message)
+            calls = parse_tool_calls(message["tool_calls"])
+            
+            # Slow tools: reply now, finish the turn in the background
+            if should_defer([tool_name for _, tool_name, _ in calls]):
+                reply = start_tool_job(session_id, user_message, messages, calls)
+                yield 'done', {"response": str(reply), "job_id": reply.job_id}
+                return
+            
+            # Announce every call, then report results in completion order
+            for tool_call_id, tool_name, arguments in calls:
+                yield 'tool_call', {"id": tool_call_id, "name": tool_name, "arguments": arguments}
+            
+            results = [None] * len(calls)
+            for index, result in iter_tool_calls(calls):
+                results[index] = result
+                tool_call_id, tool_name, _ = calls[index]
+                yield 'tool_result', {"id": tool_call_id, "name": tool_name, "result": str(result)}
+            append_tool_results(messages, calls, results)
+            
+            # Terminal tools need no second completion; 'done' carries the reply
+            templated = terminal_reply(calls, results)
+            if templated is not None:
+                remember_turn(session_id, user_message, templated)
+                yield 'done', {"response": templated}
+                return
+            
+            # Stream the final response
+            with track('llm_final'):
+                for event, data in stream_completion(messages):
+                    if event == 'token':
+                        yield 'token', {"content": data}
+                    else:
+                        message = data
+        
+        assistant_reply = message["content"] or ''
+        remember_turn(session_id, user_message, assistant_reply)
+        yield 'done', {"response": assistant_reply}
+
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    debug = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
+    # With the reloader, this process only watches files; its child serves
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background()
+    app.run(
+        debug=debug,
+        port=int(os.getenv('FLASK_PORT', '5000'))
+    )
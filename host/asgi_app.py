@@ -0,0 +1,461 @@
+"""
+Asyncio-native host for MailMind.
+
+Serves the same page and /api/chat contract as app.py, but every chat turn
+is a coroutine: OpenAI calls go through the shared LLM gateway and MCP calls through
+long-lived ClientSessions, so one process handles many sessions at once
+instead of parking a thread per request.
+
+Run with:  python host/asgi_app.py   (or: uvicorn asgi_app:app --app-dir host)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import uuid
+from contextlib import AsyncExitStack, asynccontextmanager
+
+# Use the repo's own mcp package rather than any installed copy
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# With STARTUP_PROFILE=True, the imports below and the init steps are timed
+from server import startup_profile
+startup_profile.install()
+
+import anyio
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.sessions import SessionMiddleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route, WebSocketRoute
+from starlette.staticfiles import StaticFiles
+from starlette.templating import Jinja2Templates
+from starlette.websockets import WebSocketDisconnect
+
+from chat_core import (
+    conversations, summarizer, build_messages, remember_turn, terminal_reply, parse_tool_calls, append_tool_results,
+    TOOL_CALL_CONCURRENCY
+)
+from mcp_async import AsyncMCPClient, background_context
+from mcp.client.llm_gateway import get_gateway
+from single_flight import AsyncSingleFlight, request_key
+from admission import AsyncAdmission, AdmissionRejected
+from batch import parse_items, batch_concurrency, arun_batch, aretry_shed
+from tool_jobs import AsyncJobStore, PendingReply, should_defer, start_job, poll_args
+from metrics import registry as metrics_registry, track, timed, TOOL_CALLS, CONTENT_TYPE
+from server import tracing
+
+# Load environment variables
+load_dotenv()
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+HOST_DIR = os.path.dirname(os.path.abspath(__file__))
+templates = Jinja2Templates(directory=os.path.join(HOST_DIR, 'templates'))
+
+# Shared OpenAI gateway: pooled connections, deadlines, optional hedging
+llm = get_gateway()
+# The OpenAI SDK is slow to import; load it off the startup path
+llm.preload()
+
+# Long-lived MCP sessions (count via MCP_POOL_SIZE), started in lifespan()
+mcp_client = AsyncMCPClient()
+
+# Background summarization tasks (held so they aren't garbage collected)
+summary_tasks = set()
+
+
+async def complete_summary(messages):
+    """Ask the model for a conversation summary"""
+    response = await llm.acomplete(
+        model=summarizer.model,
+        messages=messages
+    )
+    return response.choices[0].message.content
+
+
+def schedule_summary(session_id):
+    """Run compaction as a task so the reply isn't held up by it"""
+    task = asyncio.get_running_loop().create_task(summarizer.acompact(session_id, complete_summary))
+    summary_tasks.add(task)
+    task.add_done_callback(summary_tasks.discard)
+
+
+summarizer.runner = schedule_summary
+
+# Identical (session, message) requests in flight share one execution
+chat_flights = AsyncSingleFlight()
+
+# Per-session rate limits and a global cap (with a bounded wait queue) on chat turns
+admission = AsyncAdmission()
+
+# Deferred tool turns (TOOL_JOBS_ENABLED) and the tasks finishing them
+tool_jobs = AsyncJobStore()
+job_tasks = set()
+
+
+async def index(request):
+    """Serve the main page"""
+    # Generate session ID if not exists
+    if 'session_id' not in request.session:
+        request.session['session_id'] = str(uuid.uuid4())
+    return templates.TemplateResponse(request, 'index.html')
+
+
+async def chat(request):
+    """Handle chat messages from frontend"""
+    try:
+        data = await request.json()
+        user_message = data.get('message', '')
+
+        # Get session ID
+        session_id = request.session.get('session_id', 'default')
+
+        logger.info(f"[{session_id}] Received message: {user_message}")
+
+        # One trace per request, continuing the caller's if it sent a traceparent
+        with tracing.span('POST /api/chat', traceparent=request.headers.get('traceparent'),
+                          session=session_id) as root:
+            # Call OpenAI with history; a double-submit of the same message
+            # waits for and shares the first execution
+            key, keep = request_key(session_id, user_message, data.get('request_id'))
+            response, shared = await chat_flights.do(
+                key, lambda: admitted_chat(user_message, session_id), keep=keep
+            )
+            if shared:
+                logger.info(f"[{session_id}] Coalesced duplicate message")
+            root.set(shared=shared)
+
+        payload = {
+            'success': True,
+            'response': response
+        }
+        # A slow tool is still running; the client follows /api/jobs/<job_id>
+        if isinstance(response, PendingReply):
+            payload['job_id'] = response.job_id
+        return JSONResponse(payload, headers={'X-Trace-Id': root.trace_id})
+
+    except AdmissionRejected as e:
+        logger.warning(f"[{session_id}] Shed chat turn ({e.reason}), retry after {e.retry_after}s")
+        return JSONResponse({
+            'success': False,
+            'error': str(e)
+        }, status_code=429, headers={'Retry-After': str(e.retry_after)})
+
+    except Exception as e:
+        logger.error(f"Error: {e}", exc_info=True)
+        return JSONResponse({
+            'success': False,
+            'error': str(e)
+        }, status_code=500)
+
+
+async def chat_socket(websocket):
+    """
+    Chat over one WebSocket: the conversation and an initialized MCP session
+    stay open for the life of the connection, so turns skip the per-request
+    HTTP, cookie and MCP setup.
+
+    Client frames are {"id": ..., "message": ...}. Each gets one reply,
+    {"id", "event": "done", "response", "job_id"?} or
+    {"id", "event": "error", "error", "retry_after"?}, and a deferred tool
+    job is pushed as {"event": "job", "job": ...} when it finishes.
+    """
+    await websocket.accept()
+    session_id = websocket.session.get('session_id') or str(uuid.uuid4())
+    logger.info(f"[{session_id}] WebSocket connected")
+
+    send_lock = anyio.Lock()
+
+    async def send(payload):
+        async with send_lock:
+            await websocket.send_json(payload)
+
+    async def follow_job(job_id):
+        job = await tool_jobs.wait_finished(job_id, session_id)
+        if job is not None:
+            try:
+                await send({'event': 'job', 'job': job})
+            except Exception as e:
+                # The client left; it can still poll /api/jobs/<id>
+                logger.info(f"[{session_id}] Could not push job {job_id}: {e}")
+
+    try:
+        async with mcp_client.connection_session(), anyio.create_task_group() as tg:
+            try:
+                while True:
+                    try:
+                        data = json.loads(await websocket.receive_text())
+                        turn_id = data.get('id')
+                        user_message = data.get('message', '')
+                    except (ValueError, AttributeError):
+                        await send({'event': 'error', 'error': "Frames must be JSON objects"})
+                        continue
+
+                    logger.info(f"[{session_id}] Received WebSocket message: {user_message}")
+                    try:
+                        with tracing.span('WS chat', session=session_id) as root:
+                            response = await admitted_chat(user_message, session_id)
+                    except AdmissionRejected as e:
+                        logger.warning(f"[{session_id}] Shed chat turn ({e.reason}), retry after {e.retry_after}s")
+                        await send({'id': turn_id, 'event': 'error', 'error': str(e), 'retry_after': e.retry_after})
+                        continue
+                    except Exception as e:
+                        logger.error(f"Error: {e}", exc_info=True)
+                        await send({'id': turn_id, 'event': 'error', 'error': str(e)})
+                        continue
+
+                    payload = {'id': turn_id, 'event': 'done', 'response': response, 'trace_id': root.trace_id}
+                    if isinstance(response, PendingReply):
+                        payload['job_id'] = response.job_id
+                    await send(payload)
+                    # Started after the reply so the job frame can't overtake it
+                    if isinstance(response, PendingReply):
+                        tg.start_soon(follow_job, response.job_id)
+            except WebSocketDisconnect:
+                tg.cancel_scope.cancel()
+    finally:
+        logger.info(f"[{session_id}] WebSocket closed")
+
+
+async def job_status(request):
+    """Poll a background tool job; ?wait=<seconds>&version=<n> long-polls for a change"""
+    job_id = request.path_params['job_id']
+    session_id = request.session.get('session_id', 'default')
+    try:
+        wait, version = poll_args(request.query_params.get('wait'), request.query_params.get('version'))
+    except ValueError as e:
+        return JSONResponse({'success': False, 'error': str(e)}, status_code=400)
+
+    job = await tool_jobs.poll(job_id, session_id, wait, version)
+    if job is None:
+        return JSONResponse({'success': False, 'error': 'Unknown job'}, status_code=404)
+    return JSONResponse({'success': True, 'job': job})
+
+
+async def job_stream(request):
+    """Stream a background tool job's status changes over SSE until it finishes"""
+    job_id = request.path_params['job_id']
+    session_id = request.session.get('session_id', 'default')
+    if tool_jobs.get(job_id, session_id) is None:
+        return JSONResponse({'success': False, 'error': 'Unknown job'}, status_code=404)
+
+    return StreamingResponse(
+        tool_jobs.events(job_id, session_id),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+async def batch(request):
+    """Run a JSONL batch of chat turns; results stream back as JSONL as they finish"""
+    try:
+        items = parse_items((await request.body()).decode('utf-8'))
+    except ValueError as e:
+        return JSONResponse({
+            'success': False,
+            'error': str(e)
+        }, status_code=400)
+    concurrency = batch_concurrency(request.query_params.get('concurrency'))
+    traceparent = request.headers.get('traceparent')
+
+    logger.info(f"Running batch of {len(items)} items, {concurrency} sessions at a time")
+
+    async def generate():
+        with tracing.span('POST /api/batch', traceparent=traceparent, items=len(items)):
+            async for result in arun_batch(items, run_batch_item, concurrency):
+                yield json.dumps(result) + '\n'
+
+    return StreamingResponse(
+        generate(),
+        media_type='application/x-ndjson',
+        headers={'X-Accel-Buffering': 'no'}
+    )
+
+
+async def stats(request):
+    """Conversation store, LLM gateway and admission counters for capacity planning"""
+    return JSONResponse({
+        'conversations': conversations.stats(),
+        'llm': llm.stats(),
+        'admission': admission.stats()
+    })
+
+
+async def metrics(request):
+    """Per-stage latency histograms, counters and in-flight gauges (Prometheus text)"""
+    return Response(metrics_registry.render(), media_type=CONTENT_TYPE)
+
+
+async def get_mcp_tools():
+    """Get available tools, served from the client's cache"""
+    try:
+        return await mcp_client.get_tools()
+    except Exception as e:
+        logger.error(f"Error getting MCP tools: {e}")
+        return []
+
+
+async def call_mcp_tool(tool_name, arguments):
+    """Call a tool via MCP server"""
+    try:
+        with track('mcp_tool_call'):
+            result = await mcp_client.call_tool(tool_name, arguments)
+        TOOL_CALLS.inc(tool=tool_name, outcome='ok')
+        return result
+    except Exception as e:
+        logger.error(f"Error calling MCP tool: {e}")
+        TOOL_CALLS.inc(tool=tool_name, outcome='error')
+        return f"Error: {str(e)}"
+
+
+async def run_tool_calls(calls, on_result=None):
+    """Run (tool_call_id, name, arguments) calls concurrently; results keep call order"""
+    results = [None] * len(calls)
+    # Per turn, like LLMClient.call_tools: one busy turn doesn't hold back the others
+    tool_call_limiter = anyio.CapacityLimiter(TOOL_CALL_CONCURRENCY)
+
+    async def run(index, tool_name, arguments):
+        async with tool_call_limiter:
+            logger.info(f"Calling tool: {tool_name} with args: {arguments}")
+            results[index] = await call_mcp_tool(tool_name, arguments)
+        if on_result is not None:
+            on_result(index, results[index])
+
+    async with anyio.create_task_group() as tg:
+        for index, (_, tool_name, arguments) in enumerate(calls):
+            tg.start_soon(run, index, tool_name, arguments)
+
+    return results
+
+
+async def reply_after_tools(messages, calls, results):
+    """The turn's reply once its tool calls are done: templated for terminal tools, else a second completion"""
+    append_tool_results(messages, calls, results)
+
+    # Terminal tools (e.g. a sent email) need no second completion
+    assistant_reply = terminal_reply(calls, results)
+    if assistant_reply is None:
+        with track('llm_final'):
+            final_response = await llm.acomplete(
+                model=os.getenv('OPENAI_MODEL', 'gpt-4o-mini'),
+                messages=messages
+            )
+        assistant_reply = final_response.choices[0].message.content
+    return assistant_reply
+
+
+async def admitted_chat(user_message, session_id):
+    """Run a chat turn once admission control lets it in"""
+    with await admission.acquire(session_id):
+        return await chat_with_mcp_tools(user_message, session_id)
+
+
+async def run_batch_item(item):
+    """One batch turn, admitted like any other; a deferred tool job is waited for so the result is final"""
+    reply = await aretry_shed(lambda: admitted_chat(item.message, item.session_id))
+    return await tool_jobs.final_reply(reply, item.session_id)
+
+
+@timed('chat')
+async def chat_with_mcp_tools(user_message, session_id):
+    """Chat with OpenAI using MCP tools and conversation history"""
+    # Get available tools
+    with track('mcp_tools_list'):
+        tools = await get_mcp_tools()
+        tools_json = await mcp_client.get_tools_json() if tools else None
+
+    messages = build_messages(user_message, session_id, tools_json)
+
+    with track('llm_first'):
+        response = await llm.acomplete(
+            model=os.getenv('OPENAI_MODEL', 'gpt-4o-mini'),
+            messages=messages,
+            tools=tools if tools else None
+        )
+
+    message = response.choices[0].message
+
+    # Check if GPT wants to call tools
+    if message.tool_calls:
+        logger.info(f"GPT wants to call {len(message.tool_calls)} tools")
+
+        # Add assistant message to conversation
+        messages.append(message)
+        calls = parse_tool_calls(message.tool_calls)
+
+        # Slow tools: reply now, finish the turn in the background
+        if should_defer([tool_name for _, tool_name, _ in calls]):
+            return start_tool_job(session_id, user_message, messages, calls)
+
+        # Concurrent, bounded by TOOL_CALL_CONCURRENCY
+        assistant_reply = await reply_after_tools(messages, calls, await run_tool_calls(calls))
+    else:
+        # No tool calls, use direct response
+        assistant_reply = message.content
+
+    # Update conversation history
+    remember_turn(session_id, user_message, assistant_reply)
+
+    return assistant_reply
+
+
+def start_tool_job(session_id, user_message, messages, calls):
+    """Hand the rest of a turn to a background task and return the interim reply"""
+    def launch(job_id):
+        # Jobs outlive WebSocket connections, so they use the shared sessions
+        task = asyncio.get_running_loop().create_task(
+            run_tool_job(job_id, session_id, messages, calls), context=background_context()
+        )
+        job_tasks.add(task)
+        task.add_done_callback(job_tasks.discard)
+
+    return start_job(tool_jobs, session_id, user_message, calls, launch)
+
+
+async def run_tool_job(job_id, session_id, messages, calls):
+    """Finish a deferred turn: run the tool calls, then the follow-up completion"""
+    with tool_jobs.run(job_id, session_id) as job:
+        results = await run_tool_calls(calls, on_result=job.tool_done)
+        job.finish(await reply_after_tools(messages, calls, results))
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """Keep the MCP sessions open for the life of the server"""
+    async with AsyncExitStack() as stack:
+        with startup_profile.phase('mcp sessions'):
+            await mcp_client.start(stack)
+        # Snapshot metrics for cross-worker aggregation when METRICS_DIR is set
+        metrics_registry.start()
+        startup_profile.report()
+        yield
+
+
+app = Starlette(
+    routes=[
+        Route('/', index),
+        Route('/api/chat', chat, methods=['POST']),
+        Route('/api/batch', batch, methods=['POST']),
+        WebSocketRoute('/ws/chat', chat_socket),
+        Route('/api/jobs/{job_id}', job_status, methods=['GET']),
+        Route('/api/jobs/{job_id}/stream', job_stream, methods=['GET']),
+        Route('/api/stats', stats, methods=['GET']),
+        Route('/metrics', metrics, methods=['GET']),
+        Mount('/static', StaticFiles(directory=os.path.join(HOST_DIR, 'static')), name='static'),
+    ],
+    middleware=[
+        Middleware(SessionMiddleware, secret_key=os.getenv('FLASK_SECRET_KEY', 'your-secret-key-for-sessions')),
+    ],
+    lifespan=lifespan,
+)
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(app, port=int(os.getenv('FLASK_PORT', '5000')))
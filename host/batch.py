@@ -0,0 +1,215 @@
+"""
+Batch chat for offline bulk processing.
+
+POST /api/batch takes JSONL, one chat turn per line:
+
+    {"id": "c-017", "session": "contact-17", "message": "Draft a follow-up to ..."}
+
+`id` is echoed back, `session` names a conversation (turns sharing it run in
+file order so they can build on each other; omit it for a fresh one) and
+`message` is required. Different sessions run in parallel, at most
+BATCH_CONCURRENCY at a time (or ?concurrency=N, capped by it), over the
+host's shared MCP and OpenAI connections. Results stream back as JSONL in
+completion order, one per input line. A bad line or a failed turn gives
+that item an error result and the rest of the batch carries on.
+
+Each turn passes admission control like an interactive one. A turn that is
+shed waits out its Retry-After and tries again, for up to BATCH_SHED_WAIT
+seconds in total, so a bulk run slows down under load instead of failing.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from admission import AdmissionRejected
+from metrics import BATCH_ITEMS
+
+logger = logging.getLogger(__name__)
+
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '8'))
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '1000'))
+BATCH_SHED_WAIT = float(os.getenv('BATCH_SHED_WAIT', '60'))
+
+# Keeps batch conversations apart from browser sessions
+SESSION_PREFIX = 'batch:'
+
+
+class BatchItem:
+    __slots__ = ('index', 'id', 'session', 'session_id', 'message', 'error')
+
+    def __init__(self, index, id=None, session=None, message=None, error=None):
+        self.index = index
+        self.id = id
+        self.session = session
+        self.session_id = SESSION_PREFIX + (session if session is not None else uuid.uuid4().hex)
+        self.message = message
+        self.error = error
+
+    def result(self, started, response=None, error=None):
+        line = {'index': self.index, 'id': self.id, 'session': self.session, 'success': error is None}
+        if error is None:
+            line['response'] = response
+        else:
+            line['error'] = error
+        line['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        BATCH_ITEMS.inc(outcome='ok' if error is None else 'error')
+        return line
+
+
+def parse_items(text, max_items=None):
+    """
+    Parse a JSONL batch; malformed lines become items carrying an error.
+
+    Raises:
+        ValueError: If the batch is empty or has more than max_items lines
+    """
+    max_items = max_items or BATCH_MAX_ITEMS
+    lines = [line for line in text.splitlines() if line.strip()]
+    if not lines:
+        raise ValueError("Batch is empty")
+    if len(lines) > max_items:
+        raise ValueError(f"Batch has {len(lines)} items, the limit is {max_items}")
+
+    items = []
+    for index, line in enumerate(lines):
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError as e:
+            items.append(BatchItem(index, error=f"Invalid JSON: {e}"))
+            continue
+        if not isinstance(data, dict):
+            items.append(BatchItem(index, error="Item must be a JSON object"))
+            continue
+        session = data.get('session')
+        message = data.get('message')
+        if session is not None and not isinstance(session, str):
+            session = str(session)
+        if not isinstance(message, str) or not message.strip():
+            items.append(BatchItem(index, id=data.get('id'), session=session, error="Item needs a non-empty 'message'"))
+            continue
+        items.append(BatchItem(index, id=data.get('id'), session=session, message=message))
+    return items
+
+
+def batch_concurrency(requested):
+    """The ?concurrency= a client asked for, capped by BATCH_CONCURRENCY"""
+    try:
+        return max(1, min(int(requested), BATCH_CONCURRENCY))
+    except (TypeError, ValueError):
+        return BATCH_CONCURRENCY
+
+
+def retry_shed(turn, max_wait=None):
+    """
+    Run turn() (an admitted chat turn), retrying after each Retry-After while it is shed.
+
+    Raises:
+        AdmissionRejected: If it is still shed after max_wait seconds (default BATCH_SHED_WAIT)
+    """
+    deadline = time.monotonic() + (max_wait if max_wait is not None else BATCH_SHED_WAIT)
+    while True:
+        try:
+            return turn()
+        except AdmissionRejected as e:
+            if time.monotonic() + e.retry_after > deadline:
+                raise
+            time.sleep(e.retry_after)
+
+
+async def aretry_shed(turn, max_wait=None):
+    """asyncio variant of retry_shed(); turn is a coroutine function"""
+    deadline = time.monotonic() + (max_wait if max_wait is not None else BATCH_SHED_WAIT)
+    while True:
+        try:
+            return await turn()
+        except AdmissionRejected as e:
+            if time.monotonic() + e.retry_after > deadline:
+                raise
+            await asyncio.sleep(e.retry_after)
+
+
+def _groups(items):
+    """Valid items grouped by session, each group in input order"""
+    groups = OrderedDict()
+    for item in items:
+        if item.error is None:
+            groups.setdefault(item.session_id, []).append(item)
+    return list(groups.values())
+
+
+def run_batch(items, handle, concurrency):
+    """
+    Run a batch on threads, yielding one result per item as each finishes.
+
+    Args:
+        items: Output of parse_items()
+        handle: Function running one BatchItem, returning the reply text
+        concurrency: Sessions processed at once
+
+    Closing the generator (client gone) stops unstarted turns.
+    """
+    results = queue.Queue()
+    stopped = threading.Event()
+
+    def run_group(group):
+        for item in group:
+            if stopped.is_set():
+                return
+            started = time.perf_counter()
+            try:
+                results.put(item.result(started, response=str(handle(item))))
+            except Exception as e:
+                logger.error(f"Batch item {item.index} failed: {e}")
+                results.put(item.result(started, error=str(e)))
+
+    for item in items:
+        if item.error is not None:
+            yield item.result(time.perf_counter(), error=item.error)
+
+    groups = _groups(items)
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='batch')
+    try:
+        for group in groups:
+            executor.submit(run_group, group)
+        for _ in range(sum(len(group) for group in groups)):
+            yield results.get()
+    finally:
+        stopped.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def arun_batch(items, handle, concurrency):
+    """asyncio variant of run_batch(); handle is a coroutine function"""
+    results = asyncio.Queue()
+    limiter = asyncio.Semaphore(concurrency)
+
+    async def run_group(group):
+        async with limiter:
+            for item in group:
+                started = time.perf_counter()
+                try:
+                    results.put_nowait(item.result(started, response=str(await handle(item))))
+                except Exception as e:
+                    logger.error(f"Batch item {item.index} failed: {e}")
+                    results.put_nowait(item.result(started, error=str(e)))
+
+    for item in items:
+        if item.error is not None:
+            yield item.result(time.perf_counter(), error=item.error)
+
+    groups = _groups(items)
+    tasks = [asyncio.create_task(run_group(group)) for group in groups]
+    try:
+        for _ in range(sum(len(group) for group in groups)):
+            yield await results.get()
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Send a JSONL batch of chat turns to a running host's /api/batch.
+
+Each input line is {"id": ..., "session": ..., "message": ...}; results are
+written as JSONL, one line per item in completion order (sort by "index"
+to restore input order):
+
+    python host/batch_cli.py followups.jsonl -o results.jsonl
+    cat followups.jsonl | python host/batch_cli.py --url http://localhost:5000 --concurrency 4
+
+A summary goes to stderr. The exit status is 1 if any item failed.
+"""
+
+import argparse
+import json
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', nargs='?', help='JSONL file of items (default: stdin)')
+    parser.add_argument('-o', '--output', help='write results here (default: stdout)')
+    parser.add_argument('--url', default='http://localhost:5000', help='host base URL')
+    parser.add_argument('--concurrency', type=int, help="sessions run at once (capped by the host's BATCH_CONCURRENCY)")
+    parser.add_argument('--timeout', type=float, default=600, help='seconds to wait for the next result')
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input, 'rb') as f:
+            body = f.read()
+    else:
+        body = sys.stdin.buffer.read()
+
+    url = args.url.rstrip('/') + '/api/batch'
+    if args.concurrency:
+        url += '?' + urllib.parse.urlencode({'concurrency': args.concurrency})
+    request = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/x-ndjson'}, method='POST')
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    ok = failed = 0
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=args.timeout) as response:
+            # The host streams a line per item as it finishes
+            for line in response:
+                if not line.strip():
+                    continue
+                result = json.loads(line)
+                if result.get('success'):
+                    ok += 1
+                else:
+                    failed += 1
+                out.write(json.dumps(result) + '\n')
+                out.flush()
+    except urllib.error.HTTPError as e:
+        print(f"Batch rejected (HTTP {e.code}): {e.read().decode(errors='replace')}", file=sys.stderr)
+        sys.exit(2)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"{ok + failed} items in {elapsed:.1f}s: {ok} ok, {failed} failed", file=sys.stderr)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
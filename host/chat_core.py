@@ -0,0 +1,199 @@
+"""
+Conversation handling shared by the Flask and ASGI hosts.
+
+Everything here is framework-independent: the system prompt, per-session
+history, conversions between MCP and OpenAI message shapes, and the steps of
+a tool turn that don't depend on how the host runs I/O. Each host keeps only
+the glue: running the calls on threads or tasks and the OpenAI round-trips.
+"""
+
+import json
+import os
+from functools import lru_cache
+
+from conversation_store import create_store
+from summarizer import ConversationSummarizer
+from tokens import count_tokens, message_tokens, tools_tokens
+
+# Max tool calls from one model turn executed at the same time
+TOOL_CALL_CONCURRENCY = int(os.getenv('TOOL_CALL_CONCURRENCY', '4'))
+
+# Prompt budget shared by system prompt, tool schemas, history and the new
+# message; OPENAI_MAX_TOKENS is held back for the reply
+PROMPT_TOKEN_BUDGET = int(os.getenv('PROMPT_TOKEN_BUDGET', '8000'))
+REPLY_TOKEN_RESERVE = int(os.getenv('OPENAI_MAX_TOKENS', '1000'))
+
+# Terminal tools: once they succeed there is nothing left for the model to
+# say, so with TERMINAL_REPLIES_ENABLED the reply is rendered from a template
+# instead of a second completion. Only tools with a template qualify.
+TERMINAL_REPLIES_ENABLED = os.getenv('TERMINAL_REPLIES_ENABLED', 'False').lower() == 'true'
+TERMINAL_TOOLS = frozenset(
+    name.strip() for name in os.getenv('TERMINAL_TOOLS', 'send_email').split(',') if name.strip()
+)
+
+# Per-session history, bounded by session count, idle TTL and total bytes;
+# CONVERSATION_BACKEND=sqlite shares it across worker processes
+conversations = create_store()
+
+# Optional background compaction of long sessions (SUMMARY_ENABLED); each
+# host sets summarizer.runner to run it off the request path
+summarizer = ConversationSummarizer(conversations)
+
+SYSTEM_PROMPT = (
+    "You are a helpful AI assistant that can send emails via Gmail. "
+    "Remember the conversation context. If the user provides information across "
+    "multiple messages (like recipient, then subject, then body), remember all "
+    "parts before sending the email. Ask for any missing information."
+)
+
+@lru_cache(maxsize=None)
+def system_prompt_tokens():
+    """SYSTEM_PROMPT's token count, on first use so importing doesn't load the tokenizer"""
+    return count_tokens(SYSTEM_PROMPT)
+
+def history_token_budget(user_message, tools_json=None):
+    """Tokens left for history once everything else in the prompt is counted"""
+    fixed = (
+        system_prompt_tokens()
+        + message_tokens({"role": "system", "content": ""})
+        + message_tokens({"role": "user", "content": user_message})
+        + (tools_tokens(tools_json) if tools_json else 0)
+    )
+    return max(PROMPT_TOKEN_BUDGET - REPLY_TOKEN_RESERVE - fixed, 0)
+
+def build_messages(user_message, session_id, tools_json=None):
+    """
+    Build the OpenAI message list: system prompt, history, new user message.
+
+    History is the most recent stretch that fits the token budget after the
+    system prompt, the tool schemas (tools_json) and the new message.
+    """
+    # Get conversation history
+    history = conversations.get(session_id, max_tokens=history_token_budget(user_message, tools_json))
+    
+    # Build messages with history
+    messages = [
+        {
+            "role": "system",
+            "content": SYSTEM_PROMPT
+        }
+    ]
+    
+    # Add conversation history
+    messages.extend(history)
+    
+    # Add current user message
+    messages.append({
+        "role": "user",
+        "content": user_message
+    })
+    
+    return messages
+
+def remember_turn(session_id, user_message, assistant_reply):
+    """Append a completed turn to the session's conversation history"""
+    # Token counts are memoized by the store as the messages are added
+    conversations.append(
+        session_id,
+        {"role": "user", "content": user_message},
+        {"role": "assistant", "content": assistant_reply}
+    )
+    summarizer.maybe_schedule(session_id)
+
+def parse_tool_calls(tool_calls):
+    """(tool_call_id, name, arguments) for each of a completion's tool calls (SDK objects or dicts)"""
+    calls = []
+    for tool_call in tool_calls:
+        if isinstance(tool_call, dict):
+            function = tool_call["function"]
+            calls.append((tool_call["id"], function["name"], json.loads(function["arguments"] or '{}')))
+        else:
+            calls.append((tool_call.id, tool_call.function.name, json.loads(tool_call.function.arguments or '{}')))
+    return calls
+
+def append_tool_results(messages, calls, results):
+    """Add one tool message per call; results must be in call order, as the model expects"""
+    for (tool_call_id, _, _), result in zip(calls, results):
+        messages.append({
+            "role": "tool",
+            "tool_call_id": tool_call_id,
+            "content": str(result)
+        })
+
+def format_sse(event, data):
+    """Encode one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def mcp_tools_to_openai(mcp_tools):
+    """Convert MCP tool schemas to the OpenAI function-calling format"""
+    tools = []
+    for tool in mcp_tools:
+        tools.append({
+            "type": "function",
+            "function": {
+                "name": tool['name'],
+                "description": tool.get('description') or '',
+                "parameters": tool.get('parameters') or tool.get('inputSchema') or {}
+            }
+        })
+    return tools
+
+class ToolResult(str):
+    """The text the model sees for a tool call, carrying the result's structuredContent"""
+
+    def __new__(cls, text, structured=None):
+        result = super().__new__(cls, text)
+        result.structured = structured
+        return result
+
+def tool_result_text(result):
+    """Extract the text the model should see from an MCP tools/call result"""
+    content = result.get('content')
+    if isinstance(content, list) and len(content) > 0:
+        text = content[0].get('text', str(content))
+    else:
+        text = str(result) if result else "Tool executed successfully"
+    return ToolResult(text, result.get('structuredContent') if result else None)
+
+def _sent_email_reply(arguments, structured):
+    # Gmail's send response: a message id, labelled SENT once accepted
+    if not structured.get('id') and 'SENT' not in (structured.get('labelIds') or []):
+        return None
+    cc = arguments.get('cc')
+    copied = f" (cc {', '.join(cc)})" if cc else ''
+    return f"Done! Your email \"{arguments.get('subject', '')}\" was sent to {arguments.get('to')}{copied}."
+
+# name -> function(arguments, structuredContent) returning the reply text,
+# or None when the result doesn't confirm the action took place
+REPLY_TEMPLATES = {
+    'send_email': _sent_email_reply,
+}
+
+def terminal_reply(calls, results):
+    """
+    The templated reply for a turn whose tool calls all finished it, or None.
+
+    Applies only when every call is to a terminal tool and every result came
+    back with structuredContent confirming it succeeded (for send_email, a
+    message id or the SENT label); anything else (errors, unconfirmed
+    results, tools whose output the model has to read) still gets the
+    follow-up completion.
+
+    Args:
+        calls: (tool_call_id, name, arguments) tuples
+        results: The matching call_mcp_tool() results, in call order
+    """
+    if not TERMINAL_REPLIES_ENABLED:
+        return None
+    for (_, tool_name, _), result in zip(calls, results):
+        if tool_name not in TERMINAL_TOOLS or tool_name not in REPLY_TEMPLATES:
+            return None
+        if not isinstance(getattr(result, 'structured', None), dict):
+            return None
+    replies = [
+        REPLY_TEMPLATES[tool_name](arguments, result.structured)
+        for (_, tool_name, arguments), result in zip(calls, results)
+    ]
+    if any(reply is None for reply in replies):
+        return None
+    return '\n'.join(replies)
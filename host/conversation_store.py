@@ -0,0 +1,262 @@
+"""
+Bounded in-memory conversation store.
+
+Replaces the unbounded module-level dict: sessions are kept in LRU order,
+dropped after an idle TTL, and evicted least-recently-used first when the
+session count or the total byte budget is exceeded.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from tokens import message_tokens
+
+
+def message_size(message):
+    """Approximate memory cost of a stored message (its JSON size in bytes)"""
+    return len(json.dumps(message, ensure_ascii=False).encode())
+
+
+class _Session:
+    __slots__ = ('messages', 'sizes', 'tokens', 'token_total', 'summary', 'bytes', 'last_access')
+
+    def __init__(self, now):
+        self.messages = []
+        self.sizes = []
+        # Token count of each message, computed once when it is stored
+        self.tokens = []
+        self.token_total = 0
+        # Running summary of folded-away turns: (message, size, tokens) or None
+        self.summary = None
+        self.bytes = 0
+        self.last_access = now
+
+    def drop_front(self, count):
+        """Forget the oldest `count` messages; returns the bytes released"""
+        released = sum(self.sizes[:count])
+        self.token_total -= sum(self.tokens[:count])
+        del self.messages[:count]
+        del self.sizes[:count]
+        del self.tokens[:count]
+        self.bytes -= released
+        return released
+
+
+class ConversationStore:
+    """Per-session message history with LRU/TTL eviction and byte accounting"""
+
+    def __init__(self, max_sessions=None, idle_ttl=None, max_bytes=None, max_messages=None):
+        """
+        Args:
+            max_sessions: Max live sessions (CONVERSATION_MAX_SESSIONS, default 10000)
+            idle_ttl: Seconds a session may sit unused (CONVERSATION_IDLE_TTL, default 3600)
+            max_bytes: Total history budget across sessions (CONVERSATION_MAX_BYTES, default 64 MiB)
+            max_messages: Hard cap on messages kept per session (CONVERSATION_MAX_MESSAGES,
+                default 200); what is actually sent is chosen by token budget
+        """
+        self.max_sessions = max_sessions or int(os.getenv('CONVERSATION_MAX_SESSIONS', '10000'))
+        self.idle_ttl = idle_ttl or float(os.getenv('CONVERSATION_IDLE_TTL', '3600'))
+        self.max_bytes = max_bytes or int(os.getenv('CONVERSATION_MAX_BYTES', str(64 * 1024 * 1024)))
+        self.max_messages = max_messages or int(os.getenv('CONVERSATION_MAX_MESSAGES', '200'))
+
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._evictions = {'lru': 0, 'ttl': 0, 'bytes': 0}
+
+    def _expired(self, entry, now):
+        return now - entry.last_access > self.idle_ttl
+
+    def _drop(self, session_id, reason):
+        entry = self._sessions.pop(session_id)
+        self._bytes -= entry.bytes
+        self._evictions[reason] += 1
+
+    def _sweep(self, now):
+        """Evict expired sessions, then enforce the count and byte limits"""
+        # Sessions are in access order, so expired ones are all at the front
+        while self._sessions:
+            session_id, entry = next(iter(self._sessions.items()))
+            if not self._expired(entry, now):
+                break
+            self._drop(session_id, 'ttl')
+
+        while len(self._sessions) > self.max_sessions:
+            self._drop(next(iter(self._sessions)), 'lru')
+
+        # Never evict the most recent session just to satisfy the byte budget
+        while self._bytes > self.max_bytes and len(self._sessions) > 1:
+            self._drop(next(iter(self._sessions)), 'bytes')
+
+    def _touch(self, session_id, now):
+        entry = self._sessions.get(session_id)
+        if entry is not None and self._expired(entry, now):
+            self._drop(session_id, 'ttl')
+            entry = None
+        if entry is not None:
+            entry.last_access = now
+            self._sessions.move_to_end(session_id)
+        return entry
+
+    def get(self, session_id, max_tokens=None):
+        """
+        Return a copy of the session's messages (empty if unknown or expired).
+
+        With max_tokens, only the most recent messages whose memoized token
+        counts fit the budget are returned, starting at a user message. A
+        running summary, if any, comes first as a system message.
+        """
+        with self._lock:
+            entry = self._touch(session_id, time.monotonic())
+            if entry is None:
+                return []
+
+            prefix = []
+            if entry.summary is not None:
+                summary_message, _, summary_tokens = entry.summary
+                prefix = [summary_message]
+                if max_tokens is not None:
+                    max_tokens -= summary_tokens
+
+            if max_tokens is None:
+                return prefix + entry.messages
+
+            start = len(entry.messages)
+            used = 0
+            while start > 0 and used + entry.tokens[start - 1] <= max_tokens:
+                start -= 1
+                used += entry.tokens[start]
+
+            # Don't open the history with a reply whose question was cut
+            while start < len(entry.messages) and entry.messages[start].get('role') != 'user':
+                start += 1
+            return prefix + entry.messages[start:]
+
+    def append(self, session_id, *messages):
+        """Append messages to a session, trimming it to max_messages"""
+        # Size and tokenize outside the lock; this is the only time it happens
+        prepared = [(message, message_size(message), message_tokens(message)) for message in messages]
+
+        with self._lock:
+            now = time.monotonic()
+            entry = self._touch(session_id, now)
+            if entry is None:
+                entry = self._sessions[session_id] = _Session(now)
+
+            for message, size, tokens in prepared:
+                entry.messages.append(message)
+                entry.sizes.append(size)
+                entry.tokens.append(tokens)
+                entry.token_total += tokens
+                entry.bytes += size
+                self._bytes += size
+
+            # Hard cap on stored history; prompts are trimmed by token budget
+            excess = len(entry.messages) - self.max_messages
+            if excess > 0:
+                self._bytes -= entry.drop_front(excess)
+
+            self._sweep(now)
+
+    def history_tokens(self, session_id):
+        """Memoized token total of the session's stored messages"""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            return entry.token_total if entry else 0
+
+    def fold_candidate(self, session_id, keep_tokens):
+        """
+        Pick the older messages a summary should replace.
+
+        Returns (previous_summary_text, messages): everything before the
+        most recent `keep_tokens` worth of history, cut at a user message so
+        a question and its answer are never split.
+        """
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None, []
+
+            start = len(entry.messages)
+            kept = 0
+            while start > 0 and kept + entry.tokens[start - 1] <= keep_tokens:
+                start -= 1
+                kept += entry.tokens[start]
+            while start < len(entry.messages) and entry.messages[start].get('role') != 'user':
+                start += 1
+
+            previous = entry.summary[0]['content'] if entry.summary else None
+            return previous, entry.messages[:start]
+
+    def apply_summary(self, session_id, summary, folded):
+        """
+        Replace `folded` (from fold_candidate) with a summary message.
+
+        Returns False, changing nothing, if those messages are no longer the
+        head of the session (e.g. trimmed or evicted meanwhile).
+        """
+        message = {"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"}
+        size, tokens = message_size(message), message_tokens(message)
+
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None or len(entry.messages) < len(folded):
+                return False
+            if any(current is not old for current, old in zip(entry.messages, folded)):
+                return False
+
+            self._bytes -= entry.drop_front(len(folded))
+            if entry.summary is not None:
+                entry.bytes -= entry.summary[1]
+                self._bytes -= entry.summary[1]
+            entry.summary = (message, size, tokens)
+            entry.bytes += size
+            self._bytes += size
+            return True
+
+    def delete(self, session_id):
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            if entry is not None:
+                self._bytes -= entry.bytes
+
+    def session_bytes(self, session_id):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            return entry.bytes if entry else 0
+
+    def __contains__(self, session_id):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            return entry is not None and not self._expired(entry, time.monotonic())
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def stats(self):
+        """Counters for sizing hosts: live sessions, bytes held, evictions by cause"""
+        with self._lock:
+            self._sweep(time.monotonic())
+            return {
+                'sessions': len(self._sessions),
+                'bytes': self._bytes,
+                'evictions': dict(self._evictions),
+                'max_sessions': self.max_sessions,
+                'max_bytes': self.max_bytes,
+                'idle_ttl': self.idle_ttl,
+            }
+
+
+def create_store():
+    """The conversation store selected by CONVERSATION_BACKEND (memory or sqlite)"""
+    backend = os.getenv('CONVERSATION_BACKEND', 'memory').lower()
+    if backend == 'sqlite':
+        # Shared by every worker process; see sqlite_store.py
+        from sqlite_store import SQLiteConversationStore
+        return SQLiteConversationStore()
+    if backend != 'memory':
+        raise ValueError(f"Unknown CONVERSATION_BACKEND: {backend}")
+    return ConversationStore()
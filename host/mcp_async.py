@@ -0,0 +1,163 @@
+"""
+Async MCP client for the ASGI host.
+
+Wraps the repo's anyio-based ClientSession over the stdio transport. A
+ClientSession multiplexes concurrent requests by JSON-RPC id, so a few
+long-lived sessions are enough to serve many chat sessions at once.
+
+A WebSocket connection can instead keep one session for its whole life
+(see connection_session()): with WS_MCP_SESSION=dedicated it gets its own
+freshly initialized server process, up to WS_DEDICATED_MCP_MAX at a time,
+otherwise one pooled session is pinned to it.
+"""
+
+import contextvars
+import itertools
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+
+# Use the repo's own mcp package rather than any installed copy
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import anyio
+from mcp import types
+from mcp.client.session import ClientSession
+from mcp.client.stdio import StdioServerParameters, stdio_client
+
+from chat_core import mcp_tools_to_openai, tool_result_text
+from mcp_pool import server_command
+from metrics import observe_tool_backend
+from server import tracing
+
+logger = logging.getLogger(__name__)
+
+# Session used by the current connection's calls, if one is pinned
+_connection_session = contextvars.ContextVar('connection_session', default=None)
+
+
+def background_context():
+    """The current context minus any pinned session, for tasks that may outlive the connection"""
+    context = contextvars.copy_context()
+    context.run(_connection_session.set, None)
+    return context
+
+
+class AsyncMCPClient:
+    """A small set of initialized ClientSessions shared by all requests"""
+
+    def __init__(self, size=None, command=None, tools_ttl=None):
+        self.size = size or int(os.getenv('MCP_POOL_SIZE', '2'))
+        self.command = command or server_command()
+        self.tools_ttl = tools_ttl if tools_ttl is not None else float(os.getenv('MCP_TOOLS_CACHE_TTL', '300'))
+        self._sessions = []
+        self._cycle = None
+        self._tools = None
+        self._tools_json = None
+        self._tools_expires_at = 0.0
+        self._tools_lock = anyio.Lock()
+        self.connection_mode = os.getenv('WS_MCP_SESSION', 'pooled').lower()
+        self._dedicated_slots = anyio.Semaphore(int(os.getenv('WS_DEDICATED_MCP_MAX', '16')))
+
+    async def _open_session(self, stack):
+        """Spawn one server process and initialize a session on it"""
+        params = StdioServerParameters(
+            command=self.command[0],
+            args=self.command[1:],
+            env=dict(os.environ),
+            cwd=os.getcwd()
+        )
+        read_stream, write_stream = await stack.enter_async_context(stdio_client(params))
+        session = await stack.enter_async_context(
+            ClientSession(read_stream, write_stream, message_handler=self._handle_message)
+        )
+        await session.initialize()
+        return session
+
+    async def start(self, stack):
+        """Spawn and initialize the sessions; their lifetime is tied to `stack`"""
+        for _ in range(self.size):
+            self._sessions.append(await self._open_session(stack))
+
+        self._cycle = itertools.cycle(self._sessions)
+        logger.info(f"Async MCP client ready with {len(self._sessions)} sessions")
+        return self
+
+    def session(self):
+        pinned = _connection_session.get()
+        if pinned is not None:
+            return pinned
+        if not self._sessions:
+            raise RuntimeError("MCP client not started")
+        return next(self._cycle)
+
+    @asynccontextmanager
+    async def connection_session(self):
+        """Route every MCP call made in this block (and tasks it starts) through one session"""
+        stack = AsyncExitStack()
+        session = None
+        if self.connection_mode == 'dedicated':
+            try:
+                self._dedicated_slots.acquire_nowait()
+            except anyio.WouldBlock:
+                logger.warning("No dedicated MCP session free, pinning a pooled one")
+            else:
+                stack.callback(self._dedicated_slots.release)
+                try:
+                    session = await self._open_session(stack)
+                except BaseException:
+                    await stack.aclose()
+                    raise
+        token = _connection_session.set(session or self.session())
+        try:
+            yield _connection_session.get()
+        finally:
+            _connection_session.reset(token)
+            try:
+                await stack.aclose()
+            except Exception as e:
+                # e.g. a response for a cancelled call arriving during shutdown
+                logger.warning(f"Error closing connection MCP session: {e!r}")
+
+    async def _handle_message(self, message):
+        if isinstance(message, Exception):
+            logger.error(f"MCP session error: {message}")
+        elif isinstance(message, types.ServerNotification) and isinstance(
+            message.root, types.ToolListChangedNotification
+        ):
+            logger.info("MCP server reported tools/list_changed, invalidating tool cache")
+            self._tools_expires_at = 0.0
+
+    async def get_tools(self):
+        """OpenAI-format tool list, cached until list_changed or TTL expiry"""
+        if self._tools is not None and time.monotonic() < self._tools_expires_at:
+            return self._tools
+
+        async with self._tools_lock:
+            if self._tools is None or time.monotonic() >= self._tools_expires_at:
+                result = await self.session().list_tools()
+                self._tools = mcp_tools_to_openai(
+                    [tool.model_dump(exclude_none=True) for tool in result.tools]
+                )
+                self._tools_json = json.dumps(self._tools, separators=(',', ':'))
+                self._tools_expires_at = time.monotonic() + self.tools_ttl
+        return self._tools
+
+    async def get_tools_json(self):
+        """The cached tool list serialized as compact JSON"""
+        await self.get_tools()
+        return self._tools_json
+
+    async def call_tool(self, name, arguments):
+        """Call a tool and return the text the model should see"""
+        # params._meta carries the trace context to the server's spans
+        result = await self.session().call_tool(name, arguments, meta=tracing.trace_meta() or None)
+        data = result.model_dump(exclude_none=True)
+        observe_tool_backend(name, data)
+        text = tool_result_text(data)
+        if result.isError:
+            return f"Error: {text}"
+        return text
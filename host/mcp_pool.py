@@ -0,0 +1,455 @@
+"""
+Pool of long-lived, pre-initialized MCP server processes.
+
+Each worker speaks the same newline-delimited JSON-RPC over stdin/stdout as
+the old one-shot subprocess calls, but the interpreter start, imports and
+Gmail authentication are paid once per process instead of once per request.
+"""
+
+import atexit
+import itertools
+import logging
+import os
+import queue
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from mcp.shared.json_codec import codec
+from mcp.shared.protocol import LATEST_PROTOCOL_VERSION as PROTOCOL_VERSION
+
+logger = logging.getLogger(__name__)
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server', 'mcp_server.py')
+
+def server_command():
+    """Command used to launch an MCP server (override with MCP_SERVER_COMMAND)"""
+    command = os.getenv('MCP_SERVER_COMMAND')
+    if command:
+        return shlex.split(command)
+    return [sys.executable, SERVER_SCRIPT]
+
+
+# Sentinel pushed by the reader thread when the child closes stdout
+_EOF = object()
+
+
+class MCPServerError(Exception):
+    """JSON-RPC error returned by the MCP server"""
+
+    def __init__(self, code, message, data=None):
+        super().__init__(message)
+        self.code = code
+        self.data = data
+
+
+class MCPServerProcess:
+    """A single long-lived mcp_server.py child process"""
+
+    def __init__(self, command, timeout, on_notification=None):
+        self.timeout = timeout
+        self.on_notification = on_notification
+        # stderr is inherited so server logs can never fill up an unread pipe
+        self.proc = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        self._ids = itertools.count(1)
+        self._responses = queue.Queue()
+        self.last_used = time.monotonic()
+
+        self._reader = threading.Thread(target=self._read_loop, name=f'mcp-reader-{self.proc.pid}', daemon=True)
+        self._reader.start()
+
+    @property
+    def pid(self):
+        return self.proc.pid
+
+    def is_alive(self):
+        return self.proc.poll() is None
+
+    def _read_loop(self):
+        """Route responses to the waiting request and notifications to the callback"""
+        try:
+            for line in self.proc.stdout:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    message = codec.loads(line)
+                except ValueError:
+                    logger.warning(f"[mcp:{self.pid}] Ignoring non-JSON output: {line[:200]!r}")
+                    continue
+
+                if isinstance(message, list):
+                    # Response to request_batch()
+                    self._responses.put(message)
+                elif 'id' in message and ('result' in message or 'error' in message):
+                    self._responses.put(message)
+                elif self.on_notification and 'method' in message:
+                    try:
+                        self.on_notification(message)
+                    except Exception as e:
+                        logger.error(f"[mcp:{self.pid}] Notification handler failed: {e}", exc_info=True)
+        finally:
+            self._responses.put(_EOF)
+
+    def _send(self, message):
+        self.proc.stdin.write(codec.dumps(message) + b'\n')
+        self.proc.stdin.flush()
+
+    def _wait_for(self, matches, what, timeout):
+        """Block until the reader delivers a response for which matches() is true"""
+        deadline = time.monotonic() + (timeout or self.timeout)
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"MCP server {self.pid} did not answer {what} in time")
+            try:
+                response = self._responses.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            if response is _EOF:
+                raise ConnectionError(f"MCP server {self.pid} exited")
+            if matches(response):
+                self.last_used = time.monotonic()
+                return response
+            stale = [r.get('id') for r in response] if isinstance(response, list) else response.get('id')
+            logger.warning(f"[mcp:{self.pid}] Dropping stale response id={stale}")
+
+    @staticmethod
+    def _result(response):
+        if 'error' in response:
+            error = response['error']
+            return MCPServerError(error.get('code'), error.get('message', ''), error.get('data'))
+        return response.get('result', {})
+
+    def request(self, method, params=None, timeout=None):
+        """Send a JSON-RPC request and block until its response arrives"""
+        request_id = next(self._ids)
+        self._send({
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "method": method,
+            "params": params or {}
+        })
+
+        response = self._wait_for(
+            lambda response: isinstance(response, dict) and response.get('id') == request_id, method, timeout
+        )
+        result = self._result(response)
+        if isinstance(result, MCPServerError):
+            raise result
+        return result
+
+    def request_batch(self, calls, timeout=None):
+        """
+        Send several requests as one JSON-RPC batch (one write, one response line).
+
+        The server runs the batch's tool calls concurrently.
+
+        Args:
+            calls: (method, params) pairs
+            timeout: Seconds to wait for the whole batch
+
+        Returns:
+            One entry per call, in call order: its result, or the
+            MCPServerError it failed with
+        """
+        ids = [next(self._ids) for _ in calls]
+        self._send([
+            {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params or {}}
+            for request_id, (method, params) in zip(ids, calls)
+        ])
+
+        response = self._wait_for(
+            lambda response: isinstance(response, list) and any(r.get('id') == ids[0] for r in response),
+            f"a batch of {len(calls)}", timeout
+        )
+        by_id = {r.get('id'): r for r in response}
+        return [
+            self._result(by_id[request_id]) if request_id in by_id
+            else MCPServerError(-32603, "Missing from the batch response")
+            for request_id in ids
+        ]
+
+    def notify(self, method, params=None):
+        """Send a JSON-RPC notification (no response expected)"""
+        message = {"jsonrpc": "2.0", "method": method}
+        if params is not None:
+            message["params"] = params
+        self._send(message)
+
+    def initialize(self):
+        """Run the MCP initialize handshake"""
+        result = self.request('initialize', {
+            "protocolVersion": PROTOCOL_VERSION,
+            "capabilities": {},
+            "clientInfo": {"name": "mailmind-host", "version": "0.1.0"}
+        })
+        self.notify('notifications/initialized')
+        return result
+
+    def ping(self, timeout=None):
+        try:
+            self.request('ping', timeout=timeout)
+            return True
+        except Exception as e:
+            logger.warning(f"[mcp:{self.pid}] Health check failed: {e}")
+            return False
+
+    def close(self):
+        try:
+            self.proc.stdin.close()
+        except Exception:
+            pass
+        try:
+            self.proc.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+
+class MCPProcessPool:
+    """
+    Fixed-size pool of initialized MCP server processes.
+
+    Callers check a process out, issue any number of requests on it and
+    return it. Dead or unresponsive processes are discarded and replaced
+    lazily on the next checkout.
+    """
+
+    def __init__(self, size=None, command=None, timeout=None, health_check_interval=None, on_notification=None):
+        self.size = size or int(os.getenv('MCP_POOL_SIZE', '2'))
+        self.command = command or server_command()
+        self.timeout = timeout or float(os.getenv('MCP_REQUEST_TIMEOUT', '30'))
+        # Idle processes older than this are pinged before being handed out
+        self.health_check_interval = (
+            health_check_interval if health_check_interval is not None
+            else float(os.getenv('MCP_HEALTH_CHECK_INTERVAL', '30'))
+        )
+        self.on_notification = on_notification
+
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._workers = set()
+        self._reserved = 0
+        self._closed = False
+
+    def start(self):
+        """Pre-warm the pool so the first requests don't pay the spawn cost"""
+        with self._lock:
+            missing = self.size - len(self._workers) - self._reserved
+            self._reserved += max(missing, 0)
+
+        # Spawn everything first so the children initialize in parallel
+        spawned = []
+        for _ in range(max(missing, 0)):
+            try:
+                spawned.append(self._spawn_process())
+            except Exception as e:
+                logger.error(f"Failed to spawn MCP server: {e}")
+                with self._lock:
+                    self._reserved -= 1
+
+        for worker in spawned:
+            try:
+                self._initialize(worker)
+            except Exception as e:
+                logger.error(f"Failed to pre-warm MCP server {worker.pid}: {e}")
+                worker.close()
+                with self._lock:
+                    self._reserved -= 1
+                continue
+            with self._lock:
+                self._reserved -= 1
+                self._workers.add(worker)
+            self._idle.put(worker)
+
+        logger.info(f"MCP pool ready with {len(self._workers)}/{self.size} processes")
+        return self
+
+    def _spawn_process(self):
+        return MCPServerProcess(self.command, self.timeout, self.on_notification)
+
+    def _initialize(self, worker):
+        worker.initialize()
+        logger.info(f"MCP server process {worker.pid} initialized")
+
+    def _spawn(self):
+        """Create and initialize a new worker; the caller must hold a reservation"""
+        try:
+            worker = self._spawn_process()
+            try:
+                self._initialize(worker)
+            except Exception:
+                worker.close()
+                raise
+        except Exception:
+            with self._lock:
+                self._reserved -= 1
+            raise
+        with self._lock:
+            self._reserved -= 1
+            self._workers.add(worker)
+        return worker
+
+    def _discard(self, worker):
+        with self._lock:
+            self._workers.discard(worker)
+        logger.warning(f"Discarding MCP server process {worker.pid}")
+        worker.close()
+
+    def _is_healthy(self, worker):
+        if not worker.is_alive():
+            return False
+        if time.monotonic() - worker.last_used > self.health_check_interval:
+            return worker.ping(timeout=min(self.timeout, 5))
+        return True
+
+    def _acquire(self, timeout):
+        deadline = time.monotonic() + (timeout or self.timeout)
+        while True:
+            if self._closed:
+                raise RuntimeError("MCP pool is closed")
+
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_spawn = len(self._workers) + self._reserved < self.size
+                    if can_spawn:
+                        self._reserved += 1
+                if can_spawn:
+                    return self._spawn()
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("No MCP server process available")
+                try:
+                    worker = self._idle.get(timeout=remaining)
+                except queue.Empty:
+                    raise TimeoutError("No MCP server process available")
+
+            if self._is_healthy(worker):
+                return worker
+            self._discard(worker)
+
+    def _release(self, worker):
+        if self._closed:
+            worker.close()
+        else:
+            self._idle.put(worker)
+
+    @contextmanager
+    def checkout(self, timeout=None):
+        """Borrow an initialized MCP server process for the duration of the block"""
+        worker = self._acquire(timeout)
+        try:
+            yield worker
+        except MCPServerError:
+            # Protocol-level error: the process itself is fine
+            self._release(worker)
+            raise
+        except BaseException:
+            # Timeouts, broken pipes, etc. leave the process in an unknown state
+            self._discard(worker)
+            raise
+        else:
+            self._release(worker)
+
+    def request(self, method, params=None, timeout=None):
+        """Convenience wrapper for a single request on a pooled process"""
+        with self.checkout() as worker:
+            return worker.request(method, params, timeout=timeout)
+
+    def request_batch(self, calls, timeout=None):
+        """Convenience wrapper for a JSON-RPC batch on a pooled process"""
+        with self.checkout() as worker:
+            return worker.request_batch(calls, timeout=timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "processes": len(self._workers),
+                "idle": self._idle.qsize(),
+                "starting": self._reserved,
+            }
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._workers.discard(worker)
+            worker.close()
+
+
+def create_pool(**kwargs):
+    """Create, pre-warm and register shutdown of a process pool"""
+    pool = MCPProcessPool(**kwargs)
+    # A forked child runs its parent's atexit hooks too; only the owner closes
+    owner = os.getpid()
+    atexit.register(lambda: pool.close() if os.getpid() == owner else None)
+    return pool.start()
+
+
+class LazyPool:
+    """
+    An MCPProcessPool created on first use, once per process.
+
+    Nothing is spawned at import, so a Werkzeug reloader parent or a
+    preloading master never starts MCP servers of its own, and a forked
+    worker builds a fresh pool instead of sharing its parent's pipes and
+    reader threads.
+    """
+
+    def __init__(self, **kwargs):
+        """
+        Args:
+            **kwargs: Passed to MCPProcessPool
+        """
+        self._kwargs = kwargs
+        self._pool = None
+        self._lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._forget)
+
+    def _forget(self):
+        # The inherited pool's processes belong to the parent: drop it, don't close it
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """This process's pool, started (and pre-warmed) on the first call"""
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = create_pool(**self._kwargs)
+        return self._pool
+
+    @property
+    def started(self):
+        return self._pool is not None
+
+    def request(self, method, params=None, timeout=None):
+        return self.get().request(method, params, timeout=timeout)
+
+    def request_batch(self, calls, timeout=None):
+        return self.get().request_batch(calls, timeout=timeout)
+
+    def stats(self):
+        if self._pool is None:
+            return {"size": int(self._kwargs.get('size') or os.getenv('MCP_POOL_SIZE', '2')),
+                    "processes": 0, "idle": 0, "starting": 0}
+        return self._pool.stats()
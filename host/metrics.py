@@ -0,0 +1,323 @@
+"""
+Prometheus-text metrics for the chat hosts.
+
+A small self-contained registry (counters, gauges, histograms) rendered in
+the Prometheus text exposition format on /metrics. Each chat turn is broken
+into stages (tool list, first completion, MCP tool calls, the tool's own
+backend time, final completion) so a scrape shows where time goes.
+
+With several worker processes (gunicorn, uvicorn --workers), set
+METRICS_DIR to a directory shared by the workers and emptied on deploy.
+Each process then snapshots its metrics there every METRICS_FLUSH_INTERVAL
+seconds and /metrics, served by any worker, sums all snapshots. Counters
+and histograms of exited workers are kept; their gauges are dropped.
+"""
+
+import atexit
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+
+from server import tracing
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, registry, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._registry = registry
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self._registry.lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+            self._registry.dirty = True
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self._registry.lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+            self._registry.dirty = True
+
+    def dec(self, amount=1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._registry.lock:
+            # Per-bucket counts (last slot is +Inf), then sum and count
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+            self._registry.dirty = True
+
+
+class Registry:
+    """Holds this process's metrics and renders the (aggregated) exposition"""
+
+    def __init__(self, directory=None, flush_interval=None):
+        """
+        Args:
+            directory: Shared snapshot directory for multi-process aggregation
+                (METRICS_DIR, default: none, single process)
+            flush_interval: Seconds between snapshots (METRICS_FLUSH_INTERVAL, default 1)
+        """
+        self.directory = directory or os.getenv('METRICS_DIR') or None
+        self.flush_interval = flush_interval or float(os.getenv('METRICS_FLUSH_INTERVAL', '1'))
+        self.lock = threading.Lock()
+        self.dirty = False
+        self._metrics = {}
+        self._flusher = None
+
+    def _add(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(Counter(self, name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=()):
+        return self._add(Gauge(self, name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(self, name, help, labelnames, buckets))
+
+    def snapshot(self):
+        """This process's values as plain data"""
+        with self.lock:
+            self.dirty = False
+            return {
+                name: [[list(key), list(value) if isinstance(value, list) else value]
+                       for key, value in metric._values.items()]
+                for name, metric in self._metrics.items()
+            }
+
+    # -- multi-process ------------------------------------------------------
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f'metrics-{pid}.json')
+
+    def flush(self):
+        """Write this process's snapshot for other workers to aggregate"""
+        if not self.directory:
+            return
+        path = self._path(os.getpid())
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'pid': os.getpid(), 'metrics': self.snapshot()}, f)
+        os.replace(tmp, path)
+
+    def start(self):
+        """Begin periodic snapshots when METRICS_DIR is set"""
+        if not self.directory or self._flusher is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+
+        def run():
+            while True:
+                time.sleep(self.flush_interval)
+                if self.dirty:
+                    try:
+                        self.flush()
+                    except OSError:
+                        pass
+
+        self._flusher = threading.Thread(target=run, name='metrics-flush', daemon=True)
+        self._flusher.start()
+        # Keep the final counts of a worker that exits between flushes
+        atexit.register(self.flush)
+
+    def _collect(self):
+        """Yield (pid, alive, snapshot) for this process and, if shared, all others"""
+        yield os.getpid(), True, self.snapshot()
+        if not self.directory or not os.path.isdir(self.directory):
+            return
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if data['pid'] == os.getpid():
+                continue
+            yield data['pid'], _alive(data['pid']), data['metrics']
+
+    def aggregate(self):
+        """Sum snapshots across processes: {name: {label_tuple: value}}"""
+        totals = {name: {} for name in self._metrics}
+        for _, alive, snapshot in self._collect():
+            for name, entries in snapshot.items():
+                metric = self._metrics.get(name)
+                if metric is None or (metric.kind == 'gauge' and not alive):
+                    continue
+                values = totals[name]
+                for key, value in entries:
+                    key = tuple(key)
+                    if isinstance(value, list):
+                        current = values.get(key)
+                        values[key] = value if current is None else [a + b for a, b in zip(current, value)]
+                    else:
+                        values[key] = values.get(key, 0.0) + value
+        return totals
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for name, values in self.aggregate().items():
+            metric = self._metrics[name]
+            lines.append(f'# HELP {name} {metric.help}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for key in sorted(values):
+                value = values[key]
+                pairs = list(zip(metric.labelnames, key))
+                if metric.kind != 'histogram':
+                    lines.append(f'{name}{_labels(pairs)} {_number(value)}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float('inf'),), value[:-2]):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else _number(bound)
+                    lines.append(f'{name}_bucket{_labels(pairs + [("le", le)])} {cumulative}')
+                lines.append(f'{name}_sum{_labels(pairs)} {_number(value[-2])}')
+                lines.append(f'{name}_count{_labels(pairs)} {value[-1]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram(
+    'mailmind_stage_seconds', 'Time spent in each stage of a chat turn', ['stage']
+)
+STAGE_ERRORS = registry.counter(
+    'mailmind_stage_errors_total', 'Chat stages that raised', ['stage']
+)
+IN_FLIGHT = registry.gauge(
+    'mailmind_in_flight', 'Chat turns (stage="chat") and stages currently running', ['stage']
+)
+TOOL_BACKEND_SECONDS = registry.histogram(
+    'mailmind_tool_backend_seconds', 'Time a tool spent in its backend (e.g. the Gmail API), as reported by the MCP server', ['tool']
+)
+TOOL_CALLS = registry.counter(
+    'mailmind_tool_calls_total', 'MCP tool calls by tool and outcome', ['tool', 'outcome']
+)
+BATCH_ITEMS = registry.counter(
+    'mailmind_batch_items_total', 'Batch chat items by outcome', ['outcome']
+)
+ADMISSION_ACTIVE = registry.gauge(
+    'mailmind_admission_active', 'Chat turns holding an admission slot'
+)
+ADMISSION_QUEUE_DEPTH = registry.gauge(
+    'mailmind_admission_queue_depth', 'Chat turns waiting for an admission slot'
+)
+ADMISSION_SHED = registry.counter(
+    'mailmind_admission_shed_total', 'Chat turns rejected with 429, by reason (rate, queue_full, timeout)', ['reason']
+)
+
+
+@contextmanager
+def track(stage):
+    """Time a stage into mailmind_stage_seconds and count it as in flight"""
+    # Inside a traced request the stage is also recorded as a span
+    span = tracing.span(stage) if tracing.current_span() else nullcontext()
+    IN_FLIGHT.inc(stage=stage)
+    started = time.perf_counter()
+    try:
+        with span:
+            yield
+    except GeneratorExit:
+        # A streaming client went away; not a failure of the stage
+        raise
+    except BaseException:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage)
+        IN_FLIGHT.dec(stage=stage)
+
+
+def timed(stage):
+    """Decorator form of track() for plain and async functions"""
+    def decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with track(stage):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with track(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def observe_tool_backend(tool_name, result):
+    """Record the backend time an MCP tools/call result reports in _meta, if any"""
+    meta = result.get('_meta') or result.get('meta') or {}
+    duration_ms = meta.get('toolDurationMs')
+    if duration_ms is not None:
+        TOOL_BACKEND_SECONDS.observe(duration_ms / 1000, tool=tool_name)
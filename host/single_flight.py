@@ -0,0 +1,170 @@
+"""
+Single-flight coalescing of identical chat requests.
+
+Double-clicks and client retries can deliver the same message for the same
+session twice while the first is still running, which doubles LLM spend
+and can send an email twice. Requests with the same key share one
+execution: the first caller runs it, later callers wait for its result
+(for at most SINGLE_FLIGHT_WAIT_TIMEOUT seconds).
+
+Clients that tag each message with a request_id get retries keyed on it,
+and a successful result stays attached to that ID for a short window so a
+retry arriving just after completion is answered from it too. Without an
+ID the key is the message text, and the flight ends with the request: a
+deliberate repeat ("yes", "send it again") sent later runs as a new turn.
+"""
+
+import asyncio
+import hashlib
+import os
+import threading
+import time
+
+
+def request_key(session_id, message, request_id=None):
+    """
+    Coalescing key for a request: its client-supplied ID if it has one, else
+    the (session, message) pair. Returns (key, keep), where keep says whether
+    the result may answer retries after the request has finished.
+    """
+    if isinstance(request_id, str) and 0 < len(request_id) <= 128:
+        return f"{session_id}:id:{request_id}", True
+    digest = hashlib.sha256(message.encode('utf-8')).hexdigest()
+    return f"{session_id}:{digest}", False
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error', 'done_at')
+
+    def __init__(self, event):
+        self.event = event
+        self.result = None
+        self.error = None
+        self.done_at = None
+
+
+class SingleFlight:
+    """Thread-based coalescing for the Flask host"""
+
+    def __init__(self, window=None, wait_timeout=None):
+        """
+        Args:
+            window: Seconds a finished result keeps answering retries of the
+                same request_id (SINGLE_FLIGHT_WINDOW, default 10)
+            wait_timeout: Seconds a duplicate waits for the first execution
+                (SINGLE_FLIGHT_WAIT_TIMEOUT, default 120)
+        """
+        self.window = window if window is not None else float(os.getenv('SINGLE_FLIGHT_WINDOW', '10'))
+        self.wait_timeout = (
+            wait_timeout if wait_timeout is not None
+            else float(os.getenv('SINGLE_FLIGHT_WAIT_TIMEOUT', '120'))
+        )
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def _purge(self, now):
+        expired = [key for key, call in self._calls.items()
+                   if call.done_at is not None and now - call.done_at > self.window]
+        for key in expired:
+            del self._calls[key]
+
+    def begin(self, key):
+        """Return (call, is_leader); the leader must later call finish()"""
+        with self._lock:
+            self._purge(time.monotonic())
+            call = self._calls.get(key)
+            if call is not None:
+                return call, False
+            call = self._calls[key] = _Call(threading.Event())
+            return call, True
+
+    def _settle(self, key, call, result, error, keep):
+        """Record the outcome; False if the call had already finished"""
+        if call.done_at is not None:
+            return False
+        call.result = result
+        call.error = error
+        call.done_at = time.monotonic()
+        # Failures, and results not keyed by a request ID, end with the request
+        if (error is not None or not keep) and self._calls.get(key) is call:
+            del self._calls[key]
+        return True
+
+    def finish(self, key, call, result=None, error=None, keep=False):
+        """
+        Publish the leader's outcome. Only the first finish() of a call
+        counts, so a cleanup hook may also call it to release waiters.
+
+        Args:
+            keep: Let a successful result answer retries for `window` seconds
+        """
+        with self._lock:
+            settled = self._settle(key, call, result, error, keep)
+        if settled:
+            call.event.set()
+
+    def wait(self, call, timeout=None):
+        """Block for the leader's outcome and return or raise it"""
+        if not call.event.wait(timeout if timeout is not None else self.wait_timeout):
+            raise TimeoutError("Timed out waiting for duplicate request")
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def do(self, key, fn, keep=False):
+        """Run fn() once per key; returns (result, shared)"""
+        call, leader = self.begin(key)
+        if not leader:
+            return self.wait(call), True
+        try:
+            result = fn()
+        except Exception as e:
+            self.finish(key, call, error=e)
+            raise
+        except BaseException:
+            self.finish(key, call, error=RuntimeError("Original request was interrupted"))
+            raise
+        self.finish(key, call, result=result, keep=keep)
+        return result, False
+
+
+class AsyncSingleFlight(SingleFlight):
+    """asyncio coalescing for the ASGI host (single event loop, no locking needed)"""
+
+    def begin(self, key):
+        self._purge(time.monotonic())
+        call = self._calls.get(key)
+        if call is not None:
+            return call, False
+        call = self._calls[key] = _Call(asyncio.Event())
+        return call, True
+
+    def finish(self, key, call, result=None, error=None, keep=False):
+        if self._settle(key, call, result, error, keep):
+            call.event.set()
+
+    async def wait(self, call, timeout=None):
+        try:
+            await asyncio.wait_for(call.event.wait(), timeout if timeout is not None else self.wait_timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError("Timed out waiting for duplicate request")
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    async def do(self, key, fn, keep=False):
+        """Await fn() once per key; returns (result, shared)"""
+        call, leader = self.begin(key)
+        if not leader:
+            return await self.wait(call), True
+        try:
+            result = await fn()
+        except Exception as e:
+            self.finish(key, call, error=e)
+            raise
+        except BaseException:
+            # Cancelled: waiters get an ordinary error rather than a cancellation
+            self.finish(key, call, error=RuntimeError("Original request was cancelled"))
+            raise
+        self.finish(key, call, result=result, keep=keep)
+        return result, False
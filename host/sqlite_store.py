@@ -0,0 +1,356 @@
+"""
+SQLite-backed conversation store for multi-worker deployments.
+
+Drop-in replacement for ConversationStore (same methods and limits) that
+keeps history in one SQLite database shared by every worker process, so a
+session's history survives whichever worker serves the next request. Put
+the database on a local disk, or on tmpfs (/dev/shm) for a shared-memory
+speed store that doesn't survive a reboot.
+
+Each message is its own row carrying its memoized size and token count, so
+an append is a few inserts inside one short IMMEDIATE transaction and a
+read walks back from the newest message only as far as the token budget
+allows. Reads take no write lock: they run in a DEFERRED transaction and
+refresh the session's last_access afterwards, and only once it is more than
+CONVERSATION_TOUCH_INTERVAL old. WAL mode lets readers proceed while a
+writer commits.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from conversation_store import message_size
+from tokens import message_tokens
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    last_access REAL NOT NULL,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    token_total INTEGER NOT NULL DEFAULT 0,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    next_seq INTEGER NOT NULL DEFAULT 0,
+    summary TEXT,
+    summary_size INTEGER NOT NULL DEFAULT 0,
+    summary_tokens INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access);
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    body TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    tokens INTEGER NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class SQLiteConversationStore:
+    """Per-session message history shared across processes through SQLite"""
+
+    def __init__(self, path=None, max_sessions=None, idle_ttl=None, max_bytes=None, max_messages=None,
+                 sweep_interval=None, touch_interval=None):
+        """
+        Args:
+            path: Database file (CONVERSATION_DB, default conversations.db)
+            max_sessions, idle_ttl, max_bytes, max_messages: As for ConversationStore
+            sweep_interval: Min seconds between eviction sweeps per process
+                (CONVERSATION_SWEEP_INTERVAL, default 1)
+            touch_interval: Granularity of last_access updates on reads
+                (CONVERSATION_TOUCH_INTERVAL, default 10); TTL and LRU
+                eviction see a session as at most this much older
+        """
+        self.path = path or os.getenv('CONVERSATION_DB', 'conversations.db')
+        self.max_sessions = max_sessions or int(os.getenv('CONVERSATION_MAX_SESSIONS', '10000'))
+        self.idle_ttl = idle_ttl or float(os.getenv('CONVERSATION_IDLE_TTL', '3600'))
+        self.max_bytes = max_bytes or int(os.getenv('CONVERSATION_MAX_BYTES', str(64 * 1024 * 1024)))
+        self.max_messages = max_messages or int(os.getenv('CONVERSATION_MAX_MESSAGES', '200'))
+        self.sweep_interval = sweep_interval or float(os.getenv('CONVERSATION_SWEEP_INTERVAL', '1'))
+        self.touch_interval = (
+            touch_interval if touch_interval is not None else float(os.getenv('CONVERSATION_TOUCH_INTERVAL', '10'))
+        )
+
+        self._local = threading.local()
+        self._last_sweep = 0.0
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        # One connection per thread, reopened after a fork (pre-fork servers)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _transaction(self, mode='IMMEDIATE'):
+        conn = self._connection()
+        # IMMEDIATE takes the write lock up front, so read/modify/write is atomic
+        conn.execute(f'BEGIN {mode}')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def _expired(self, last_access, now):
+        return now - last_access > self.idle_ttl
+
+    def _drop(self, db, session_id, reason):
+        db.execute('DELETE FROM messages WHERE session_id = ?', (session_id,))
+        db.execute('DELETE FROM sessions WHERE id = ?', (session_id,))
+        if reason:
+            db.execute(
+                'INSERT INTO counters (name, value) VALUES (?, 1) '
+                'ON CONFLICT (name) DO UPDATE SET value = value + 1',
+                (f'evictions_{reason}',)
+            )
+
+    def _sweep(self, db, now, keep):
+        """Evict expired sessions, then enforce the count and byte limits"""
+        for (session_id,) in db.execute(
+            'SELECT id FROM sessions WHERE last_access < ?', (now - self.idle_ttl,)
+        ).fetchall():
+            self._drop(db, session_id, 'ttl')
+
+        count, total = db.execute('SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM sessions').fetchone()
+        if count <= self.max_sessions and total <= self.max_bytes:
+            return
+        for session_id, size in db.execute(
+            'SELECT id, bytes FROM sessions WHERE id != ? ORDER BY last_access', (keep or '',)
+        ).fetchall():
+            if count > self.max_sessions:
+                reason = 'lru'
+            elif total > self.max_bytes:
+                reason = 'bytes'
+            else:
+                break
+            self._drop(db, session_id, reason)
+            count -= 1
+            total -= size
+
+    def _session(self, db, session_id, now, drop_expired=True):
+        """The live session row (dropping it if expired, unless drop_expired is off) as a dict, or None"""
+        row = db.execute(
+            'SELECT last_access, bytes, token_total, message_count, next_seq, summary, summary_tokens '
+            'FROM sessions WHERE id = ?', (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        if self._expired(row[0], now):
+            if drop_expired:
+                self._drop(db, session_id, 'ttl')
+            return None
+        return dict(zip(
+            ('last_access', 'bytes', 'token_total', 'message_count', 'next_seq', 'summary', 'summary_tokens'), row
+        ))
+
+    def get(self, session_id, max_tokens=None):
+        """
+        Return the session's messages (empty if unknown or expired).
+
+        With max_tokens, only the most recent messages whose memoized token
+        counts fit the budget are returned, starting at a user message. A
+        running summary, if any, comes first as a system message.
+        """
+        now = time.time()
+        # Read-only: an expired session is left for the next sweep or append
+        with self._transaction('DEFERRED') as db:
+            entry = self._session(db, session_id, now, drop_expired=False)
+            if entry is None:
+                return []
+
+            prefix = []
+            if entry['summary'] is not None:
+                prefix = [json.loads(entry['summary'])]
+                if max_tokens is not None:
+                    max_tokens -= entry['summary_tokens']
+
+            rows = db.execute(
+                'SELECT body, tokens FROM messages WHERE session_id = ? ORDER BY seq DESC', (session_id,)
+            )
+            picked = []
+            used = 0
+            for body, tokens in rows:
+                if max_tokens is not None and used + tokens > max_tokens:
+                    break
+                used += tokens
+                picked.append(json.loads(body))
+            rows.close()
+
+        if now - entry['last_access'] > self.touch_interval:
+            self._touch(session_id, now)
+
+        picked.reverse()
+        # Don't open the history with a reply whose question was cut
+        start = 0
+        if max_tokens is not None:
+            while start < len(picked) and picked[start].get('role') != 'user':
+                start += 1
+        return prefix + picked[start:]
+
+    def _touch(self, session_id, now):
+        """Move a session's last_access forward; never backwards past a concurrent append"""
+        with self._transaction() as db:
+            db.execute('UPDATE sessions SET last_access = ? WHERE id = ? AND last_access < ?', (now, session_id, now))
+
+    def append(self, session_id, *messages):
+        """Append messages to a session, trimming it to max_messages"""
+        # Serialize, size and tokenize outside the transaction
+        prepared = [
+            (json.dumps(message, ensure_ascii=False), message_size(message), message_tokens(message))
+            for message in messages
+        ]
+        now = time.time()
+
+        with self._transaction() as db:
+            entry = self._session(db, session_id, now)
+            if entry is None:
+                db.execute('INSERT INTO sessions (id, last_access) VALUES (?, ?)', (session_id, now))
+                entry = {'next_seq': 0, 'message_count': 0}
+
+            seq = entry['next_seq']
+            db.executemany(
+                'INSERT INTO messages (session_id, seq, body, size, tokens) VALUES (?, ?, ?, ?, ?)',
+                [(session_id, seq + offset, body, size, tokens) for offset, (body, size, tokens) in enumerate(prepared)]
+            )
+            db.execute(
+                'UPDATE sessions SET last_access = ?, next_seq = ?, message_count = message_count + ?, '
+                'bytes = bytes + ?, token_total = token_total + ? WHERE id = ?',
+                (now, seq + len(prepared), len(prepared),
+                 sum(size for _, size, _ in prepared), sum(tokens for _, _, tokens in prepared), session_id)
+            )
+
+            # Hard cap on stored history; prompts are trimmed by token budget
+            excess = entry['message_count'] + len(prepared) - self.max_messages
+            if excess > 0:
+                self._drop_front(db, session_id, excess)
+
+            if now - self._last_sweep >= self.sweep_interval:
+                self._last_sweep = now
+                self._sweep(db, now, keep=session_id)
+
+    def _drop_front(self, db, session_id, count):
+        rows = db.execute(
+            'SELECT seq, size, tokens FROM messages WHERE session_id = ? ORDER BY seq LIMIT ?',
+            (session_id, count)
+        ).fetchall()
+        if not rows:
+            return
+        db.execute('DELETE FROM messages WHERE session_id = ? AND seq <= ?', (session_id, rows[-1][0]))
+        db.execute(
+            'UPDATE sessions SET message_count = message_count - ?, bytes = bytes - ?, '
+            'token_total = token_total - ? WHERE id = ?',
+            (len(rows), sum(row[1] for row in rows), sum(row[2] for row in rows), session_id)
+        )
+
+    def history_tokens(self, session_id):
+        """Memoized token total of the session's stored messages"""
+        row = self._connection().execute(
+            'SELECT token_total FROM sessions WHERE id = ?', (session_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def fold_candidate(self, session_id, keep_tokens):
+        """
+        Pick the older messages a summary should replace.
+
+        Returns (previous_summary_text, messages): everything before the
+        most recent `keep_tokens` worth of history, cut at a user message so
+        a question and its answer are never split.
+        """
+        with self._transaction('DEFERRED') as db:
+            summary = db.execute('SELECT summary FROM sessions WHERE id = ?', (session_id,)).fetchone()
+            if summary is None:
+                return None, []
+            rows = db.execute(
+                'SELECT body, tokens FROM messages WHERE session_id = ? ORDER BY seq', (session_id,)
+            ).fetchall()
+
+        messages = [json.loads(body) for body, _ in rows]
+        start = len(rows)
+        kept = 0
+        while start > 0 and kept + rows[start - 1][1] <= keep_tokens:
+            start -= 1
+            kept += rows[start][1]
+        while start < len(messages) and messages[start].get('role') != 'user':
+            start += 1
+
+        previous = json.loads(summary[0])['content'] if summary[0] else None
+        return previous, messages[:start]
+
+    def apply_summary(self, session_id, summary, folded):
+        """
+        Replace `folded` (from fold_candidate) with a summary message.
+
+        Returns False, changing nothing, if those messages are no longer the
+        head of the session (e.g. trimmed or evicted meanwhile).
+        """
+        message = {"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"}
+        size, tokens = message_size(message), message_tokens(message)
+
+        with self._transaction() as db:
+            entry = db.execute('SELECT summary_size FROM sessions WHERE id = ?', (session_id,)).fetchone()
+            if entry is None:
+                return False
+            rows = db.execute(
+                'SELECT seq, body FROM messages WHERE session_id = ? ORDER BY seq LIMIT ?',
+                (session_id, len(folded))
+            ).fetchall()
+            if len(rows) < len(folded) or any(json.loads(body) != old for (_, body), old in zip(rows, folded)):
+                return False
+
+            self._drop_front(db, session_id, len(folded))
+            db.execute(
+                'UPDATE sessions SET summary = ?, bytes = bytes - summary_size + ?, '
+                'summary_size = ?, summary_tokens = ? WHERE id = ?',
+                (json.dumps(message, ensure_ascii=False), size, size, tokens, session_id)
+            )
+            return True
+
+    def delete(self, session_id):
+        with self._transaction() as db:
+            self._drop(db, session_id, None)
+
+    def session_bytes(self, session_id):
+        row = self._connection().execute('SELECT bytes FROM sessions WHERE id = ?', (session_id,)).fetchone()
+        return row[0] if row else 0
+
+    def __contains__(self, session_id):
+        row = self._connection().execute(
+            'SELECT last_access FROM sessions WHERE id = ?', (session_id,)
+        ).fetchone()
+        return row is not None and not self._expired(row[0], time.time())
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+
+    def stats(self):
+        """Counters for sizing hosts: live sessions, bytes held, evictions by cause"""
+        now = time.time()
+        with self._transaction() as db:
+            self._sweep(db, now, keep=None)
+            count, total = db.execute('SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM sessions').fetchone()
+            counters = dict(db.execute('SELECT name, value FROM counters').fetchall())
+        return {
+            'backend': 'sqlite',
+            'sessions': count,
+            'bytes': total,
+            'evictions': {reason: counters.get(f'evictions_{reason}', 0) for reason in ('lru', 'ttl', 'bytes')},
+            'max_sessions': self.max_sessions,
+            'max_bytes': self.max_bytes,
+            'idle_ttl': self.idle_ttl,
+        }
@@ -22,6 +22,239 @@ function handleKeyPress(event) {
     }
 }
 
+function parseSSE(chunk) {
+    // Parse one "event: ...\ndata: ..." block into { event, data }
+    let event = 'message';
+    const dataLines = [];
+    for (const line of chunk.split('\n')) {
+        if (line.startsWith('event:')) {
+            event = line.slice(6).trim();
+        } else if (line.startsWith('data:')) {
+            dataLines.push(line.slice(5).trim());
+        }
+    }
+    return { event, data: dataLines.length ? JSON.parse(dataLines.join('\n')) : null };
+}
+
+function showJobResult(job, bubble) {
+    // Replace the interim "Sending…" reply once the background job ends
+    if (job.status === 'done') {
+        bubble.textContent = job.reply;
+    } else {
+        bubble.textContent = 'Error: ' + job.error;
+        bubble.className = 'message system';
+    }
+    chatContainer.scrollTop = chatContainer.scrollHeight;
+}
+
+async function pollJob(jobId, bubble) {
+    // Long-poll fallback for when the job stream is unavailable
+    let version = -1;
+    while (true) {
+        const response = await fetch(`/api/jobs/${jobId}?wait=25&version=${version}`);
+        const data = await response.json();
+        if (!data.success) {
+            bubble.textContent = 'Error: ' + data.error;
+            return;
+        }
+        if (data.job.status === 'done' || data.job.status === 'error') {
+            showJobResult(data.job, bubble);
+            return;
+        }
+        version = data.job.version;
+    }
+}
+
+function followJob(jobId, bubble) {
+    const source = new EventSource(`/api/jobs/${jobId}/stream`);
+    let finished = false;
+
+    source.addEventListener('status', (e) => {
+        const job = JSON.parse(e.data);
+        if (job.status === 'done' || job.status === 'error') {
+            finished = true;
+            source.close();
+            showJobResult(job, bubble);
+        }
+    });
+    // Fires for server-sent 'error' events and for connection failures alike
+    source.addEventListener('error', () => {
+        source.close();
+        if (!finished) {
+            finished = true;
+            pollJob(jobId, bubble).catch((error) => {
+                bubble.textContent = 'Error: ' + error.message;
+            });
+        }
+    });
+}
+
+// One WebSocket per page, opened on first use; only the async host serves it
+let socket = null;
+let socketUnavailable = false;
+let nextTurnId = 1;
+const pendingTurns = new Map();
+const jobBubbles = new Map();
+
+function openSocket() {
+    if (socketUnavailable || !('WebSocket' in window)) {
+        return Promise.resolve(null);
+    }
+    if (socket) {
+        return socket.ready;
+    }
+    const protocol = location.protocol === 'https:' ? 'wss:' : 'ws:';
+    const ws = new WebSocket(`${protocol}//${location.host}/ws/chat`);
+    let opened = false;
+    socket = ws;
+    ws.ready = new Promise((resolve) => {
+        ws.addEventListener('open', () => {
+            opened = true;
+            resolve(ws);
+        });
+        ws.addEventListener('close', () => {
+            if (socket === ws) socket = null;
+            if (!opened) {
+                // No WebSocket endpoint here (e.g. the Flask host): use HTTP from now on
+                socketUnavailable = true;
+                resolve(null);
+            }
+            // Turns in flight fail rather than being resent
+            for (const turn of pendingTurns.values()) {
+                turn.reject(new Error('WebSocket closed'));
+            }
+            pendingTurns.clear();
+            // Background jobs are followed over HTTP instead
+            for (const [jobId, bubble] of jobBubbles) {
+                followJob(jobId, bubble);
+            }
+            jobBubbles.clear();
+        });
+    });
+    ws.addEventListener('message', (e) => handleSocketFrame(JSON.parse(e.data)));
+    return ws.ready;
+}
+
+function handleSocketFrame(frame) {
+    if (frame.event === 'job') {
+        const bubble = jobBubbles.get(frame.job.id);
+        if (bubble) {
+            jobBubbles.delete(frame.job.id);
+            showJobResult(frame.job, bubble);
+        }
+        return;
+    }
+    const turn = pendingTurns.get(frame.id);
+    if (turn) {
+        pendingTurns.delete(frame.id);
+        turn.resolve(frame);
+    }
+}
+
+async function socketMessage(message, onSent) {
+    // Returns false if there is no WebSocket, so the caller falls back to HTTP
+    const ws = await openSocket();
+    if (!ws) return false;
+
+    const id = nextTurnId++;
+    const frame = await new Promise((resolve, reject) => {
+        pendingTurns.set(id, { resolve, reject });
+        ws.send(JSON.stringify({ id: id, message: message }));
+        onSent();
+    });
+
+    if (frame.event === 'done') {
+        addMessage(frame.response, 'assistant');
+        if (frame.job_id) {
+            // Updated when the server pushes the finished job
+            jobBubbles.set(frame.job_id, chatContainer.lastElementChild);
+        }
+    } else {
+        const retry = frame.retry_after ? ` (try again in ${frame.retry_after}s)` : '';
+        addMessage('Error: ' + frame.error + retry, 'system');
+    }
+    return true;
+}
+
+function newRequestId() {
+    // Retries of one send share its ID, so the server answers them once
+    if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+    return Date.now().toString(36) + Math.random().toString(36).slice(2);
+}
+
+async function streamMessage(message, requestId, onFirstEvent) {
+    const response = await fetch('/api/chat/stream', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ message: message, request_id: requestId })
+    });
+
+    if (response.status === 429) {
+        // Shed by admission control; falling back to /api/chat would just resend
+        const data = await response.json();
+        const retryAfter = response.headers.get('Retry-After');
+        addMessage(`Error: ${data.error}` + (retryAfter ? ` (try again in ${retryAfter}s)` : ''), 'system');
+        return;
+    }
+
+    if (!response.ok || !response.body) {
+        throw new Error(`Streaming unavailable (HTTP ${response.status})`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let assistantDiv = null;
+    let started = false;
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+
+        for (const raw of events) {
+            if (!raw.trim()) continue;
+            const { event, data } = parseSSE(raw);
+
+            if (!started) {
+                started = true;
+                onFirstEvent();
+            }
+
+            if (event === 'token') {
+                if (!assistantDiv) {
+                    addMessage('', 'assistant');
+                    assistantDiv = chatContainer.lastElementChild;
+                }
+                assistantDiv.textContent += data.content;
+                chatContainer.scrollTop = chatContainer.scrollHeight;
+            } else if (event === 'tool_call') {
+                addMessage(`Calling ${data.name}...`, 'system');
+                // Tokens after a tool call belong to a new assistant bubble
+                assistantDiv = null;
+            } else if (event === 'tool_result') {
+                addMessage(`✓ ${data.name} finished`, 'system');
+            } else if (event === 'done') {
+                if (data.job_id) {
+                    // The tool runs in the background; this bubble is updated when it ends
+                    addMessage(data.response, 'assistant');
+                    followJob(data.job_id, chatContainer.lastElementChild);
+                } else if (!assistantDiv && data.response) {
+                    addMessage(data.response, 'assistant');
+                }
+            } else if (event === 'error') {
+                addMessage('Error: ' + data.error, 'system');
+            }
+        }
+    }
+
+}
+
 async function sendMessage() {
     const message = userInput.value.trim();
     if (!message) return;
@@ -34,25 +267,47 @@ async function sendMessage() {
     sendBtn.disabled = true;
     loading.classList.add('active');
 
+    const requestId = newRequestId();
+    let streamed = false;
     try {
-        // Send to backend
-        const response = await fetch('/api/chat', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({ message: message })
+        // Prefer the persistent WebSocket, which skips per-turn HTTP setup
+        if (await socketMessage(message, () => { streamed = true; })) {
+            return;
+        }
+        // Stream the reply; the spinner goes away as soon as anything arrives
+        await streamMessage(message, requestId, () => {
+            streamed = true;
+            loading.classList.remove('active');
         });
+    } catch (streamError) {
+        if (streamed) {
+            // Never resend a message the server already started on
+            addMessage('Error: connection lost mid-response: ' + streamError.message, 'system');
+            return;
+        }
+        // Fall back to the single-response endpoint
+        try {
+            const response = await fetch('/api/chat', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({ message: message, request_id: requestId })
+            });
 
-        const data = await response.json();
+            const data = await response.json();
 
-        if (data.success) {
-            addMessage(data.response, 'assistant');
-        } else {
-            addMessage('Error: ' + data.error, 'system');
+            if (data.success) {
+                addMessage(data.response, 'assistant');
+                if (data.job_id) {
+                    followJob(data.job_id, chatContainer.lastElementChild);
+                }
+            } else {
+                addMessage('Error: ' + data.error, 'system');
+            }
+        } catch (error) {
+            addMessage('Error connecting to server: ' + error.message, 'system');
         }
-    } catch (error) {
-        addMessage('Error connecting to server: ' + error.message, 'system');
     } finally {
         sendBtn.disabled = false;
         loading.classList.remove('active');
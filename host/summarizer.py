@@ -0,0 +1,112 @@
+"""
+Rolling conversation summarization.
+
+Once a session's stored history passes SUMMARY_TRIGGER_TOKENS, everything
+but the most recent SUMMARY_KEEP_TOKENS is folded into a running summary,
+which the store then serves as a system message ahead of the remaining
+turns. Summaries are produced in the background after the reply has been
+returned, so compaction never adds latency to a chat turn.
+"""
+
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = (
+    "Summarize the conversation below for your own future reference. Keep every "
+    "detail needed to finish pending tasks: names, email addresses, subjects, "
+    "message bodies, decisions and open questions. Be concise."
+)
+
+
+class ConversationSummarizer:
+    """Decides when a session needs compaction and applies the result"""
+
+    def __init__(self, store, enabled=None, trigger_tokens=None, keep_tokens=None):
+        """
+        Args:
+            store: ConversationStore holding the sessions
+            enabled: Turn compaction on (SUMMARY_ENABLED, default off)
+            trigger_tokens: Stored history size that triggers a fold (SUMMARY_TRIGGER_TOKENS, default 4000)
+            keep_tokens: Recent history always kept verbatim (SUMMARY_KEEP_TOKENS, default 1500)
+        """
+        self.store = store
+        self.enabled = enabled if enabled is not None else os.getenv('SUMMARY_ENABLED', 'False').lower() == 'true'
+        self.trigger_tokens = trigger_tokens or int(os.getenv('SUMMARY_TRIGGER_TOKENS', '4000'))
+        self.keep_tokens = keep_tokens or int(os.getenv('SUMMARY_KEEP_TOKENS', '1500'))
+        self.model = os.getenv('SUMMARY_MODEL') or os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
+
+        # Set by the host: callable(session_id) that runs compact()/acompact() off the request path
+        self.runner = None
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def maybe_schedule(self, session_id):
+        """Hand the session to the runner if it has grown past the trigger"""
+        if not self.enabled or self.runner is None:
+            return
+        if self.store.history_tokens(session_id) <= self.trigger_tokens:
+            return
+
+        with self._lock:
+            if session_id in self._pending:
+                return
+            self._pending.add(session_id)
+
+        try:
+            self.runner(session_id)
+        except Exception as e:
+            logger.error(f"[{session_id}] Could not schedule summarization: {e}")
+            self._done(session_id)
+
+    def _done(self, session_id):
+        with self._lock:
+            self._pending.discard(session_id)
+
+    def prepare(self, session_id):
+        """Return (summary_request_messages, folded_messages), or None if nothing to fold"""
+        previous, folded = self.store.fold_candidate(session_id, self.keep_tokens)
+        if not folded:
+            return None
+
+        transcript = "\n".join(f"{m['role']}: {m.get('content') or ''}" for m in folded)
+        if previous:
+            transcript = f"Earlier summary:\n{previous}\n\nConversation since then:\n{transcript}"
+        return [
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": transcript}
+        ], folded
+
+    def compact(self, session_id, complete):
+        """Fold one session synchronously; complete(messages) returns the summary text"""
+        try:
+            prepared = self.prepare(session_id)
+            if prepared:
+                messages, folded = prepared
+                self._apply(session_id, complete(messages), folded)
+        except Exception as e:
+            logger.error(f"[{session_id}] Summarization failed: {e}", exc_info=True)
+        finally:
+            self._done(session_id)
+
+    async def acompact(self, session_id, complete):
+        """Async variant of compact(); complete(messages) is awaited"""
+        try:
+            prepared = self.prepare(session_id)
+            if prepared:
+                messages, folded = prepared
+                self._apply(session_id, await complete(messages), folded)
+        except Exception as e:
+            logger.error(f"[{session_id}] Summarization failed: {e}", exc_info=True)
+        finally:
+            self._done(session_id)
+
+    def _apply(self, session_id, summary, folded):
+        if not summary:
+            return
+        if self.store.apply_summary(session_id, summary, folded):
+            logger.info(f"[{session_id}] Folded {len(folded)} messages into the running summary")
+        else:
+            logger.info(f"[{session_id}] History changed during summarization, keeping it as is")
@@ -0,0 +1,52 @@
+"""
+Token counting for prompt budgeting.
+
+Uses tiktoken when it is installed (imported on first use, to keep it off
+the startup path); otherwise falls back to the usual ~4 characters per
+token estimate, which is close enough for budgeting.
+"""
+
+import json
+import math
+import os
+from functools import lru_cache
+
+# Fixed per-message overhead OpenAI adds for role/framing tokens
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@lru_cache(maxsize=None)
+def _encoding():
+    try:
+        import tiktoken
+    except ImportError:  # optional dependency
+        return None
+    model = os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding('o200k_base')
+
+
+def count_tokens(text):
+    """Number of tokens in a string"""
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is None:
+        return math.ceil(len(text) / 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def message_tokens(message):
+    """Tokens a chat message contributes to the prompt, including framing"""
+    tokens = MESSAGE_OVERHEAD_TOKENS + count_tokens(message.get('content') or '')
+    if message.get('tool_calls'):
+        tokens += count_tokens(json.dumps(message['tool_calls']))
+    return tokens
+
+
+@lru_cache(maxsize=8)
+def tools_tokens(tools_json):
+    """Tokens taken by the serialized tool schemas (cached per distinct list)"""
+    return count_tokens(tools_json)
@@ -0,0 +1,82 @@
+"""
+Host-side cache of the MCP server's tool list.
+
+The server's tool registry is fixed at startup, so the OpenAI-format tool
+array only needs rebuilding when the server sends
+notifications/tools/list_changed or the TTL runs out.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+LIST_CHANGED = 'notifications/tools/list_changed'
+
+
+class ToolCache:
+    """Cached OpenAI-format tool list plus its serialized JSON"""
+
+    def __init__(self, loader, ttl=None):
+        """
+        Args:
+            loader: Callable returning the OpenAI-format tool list; may raise
+            ttl: Seconds before a refresh is forced (MCP_TOOLS_CACHE_TTL, default 300)
+        """
+        self._loader = loader
+        self.ttl = ttl if ttl is not None else float(os.getenv('MCP_TOOLS_CACHE_TTL', '300'))
+        # Held while loading; invalidate() must not take it because the
+        # list_changed notification can arrive on the thread serving the load
+        self._load_lock = threading.Lock()
+        self._version_lock = threading.Lock()
+        self._tools = None
+        self._json = None
+        self._expires_at = 0.0
+        # Bumped on invalidation so a load racing a list_changed is not stored
+        self._version = 0
+
+    def _fresh(self):
+        return self._tools is not None and time.monotonic() < self._expires_at
+
+    def _refresh(self):
+        with self._load_lock:
+            if self._fresh():
+                return
+            version = self._version
+            tools = self._loader()
+            serialized = json.dumps(tools, separators=(',', ':'))
+            if version == self._version:
+                self._tools = tools
+                self._json = serialized
+                self._expires_at = time.monotonic() + self.ttl
+                logger.info(f"Cached {len(tools)} MCP tools for {self.ttl:.0f}s")
+            else:
+                # Invalidated mid-load; serve this result once but don't keep it
+                self._tools, self._json = tools, serialized
+                self._expires_at = 0.0
+
+    def get(self):
+        """Return the cached tool list (shared; callers must not mutate it)"""
+        if not self._fresh():
+            self._refresh()
+        return self._tools
+
+    def get_json(self):
+        """Return the tool list serialized as compact JSON"""
+        if not self._fresh():
+            self._refresh()
+        return self._json
+
+    def invalidate(self):
+        with self._version_lock:
+            self._version += 1
+            self._expires_at = 0.0
+
+    def handle_notification(self, message):
+        """MCP notification hook: drop the cache when the server's tools change"""
+        if message.get('method') == LIST_CHANGED:
+            logger.info("MCP server reported tools/list_changed, invalidating tool cache")
+            self.invalidate()
@@ -0,0 +1,346 @@
+"""
+Background tool jobs.
+
+With TOOL_JOBS_ENABLED, a model turn that calls a slow tool (TOOL_JOBS_TOOLS,
+default send_email) doesn't hold the HTTP request open for the tool and the
+follow-up completion. The host answers right away with a short "Sending…"
+reply and a job ID, runs the rest of the turn in the background, and
+clients poll or stream /api/jobs/<id> until it is done.
+
+Both hosts share everything here but the I/O: JobStore (threads) and
+AsyncJobStore (asyncio) have the same methods, sync and async respectively,
+for long-polling, the SSE stream and waiting out a job for a final reply.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+
+from chat_core import conversations, format_sse, remember_turn
+
+logger = logging.getLogger(__name__)
+
+TOOL_JOBS_ENABLED = os.getenv('TOOL_JOBS_ENABLED', 'False').lower() == 'true'
+SLOW_TOOLS = frozenset(
+    name.strip() for name in os.getenv('TOOL_JOBS_TOOLS', 'send_email').split(',') if name.strip()
+)
+
+PENDING, RUNNING, DONE, FAILED = 'pending', 'running', 'done', 'error'
+
+# Longest ?wait= a poll may ask for, and the idle gap before an SSE keep-alive
+MAX_POLL_WAIT = 60
+KEEPALIVE_INTERVAL = 15
+
+
+class PendingReply(str):
+    """An interim reply whose turn finishes in a background job"""
+
+    def __new__(cls, text, job_id):
+        reply = super().__new__(cls, text)
+        reply.job_id = job_id
+        return reply
+
+
+def should_defer(tool_names):
+    """Whether a turn calling these tools should become a background job"""
+    return TOOL_JOBS_ENABLED and any(name in SLOW_TOOLS for name in tool_names)
+
+
+def pending_text(tool_names):
+    """What the user sees while the job runs"""
+    return "Sending…" if 'send_email' in tool_names else "Working on it…"
+
+
+def start_job(store, session_id, user_message, calls, launch):
+    """
+    Turn the rest of a tool turn into a job and return the interim reply.
+
+    Args:
+        store: The host's JobStore or AsyncJobStore
+        session_id: Session the turn belongs to
+        user_message: The turn's message, stored with the interim reply
+        calls: (tool_call_id, name, arguments) tuples
+        launch: Function starting the host's run_tool_job(job_id) in the background
+    """
+    tool_names = [tool_name for _, tool_name, _ in calls]
+    job_id = store.create(session_id, tool_names)
+    reply = pending_text(tool_names)
+
+    # If the user writes again before the job ends, the model sees it's underway
+    remember_turn(session_id, user_message, reply)
+    launch(job_id)
+    logger.info(f"[{session_id}] Deferred {', '.join(tool_names)} to job {job_id}")
+    return PendingReply(reply, job_id)
+
+
+def poll_args(wait, version):
+    """
+    A poll's ?wait= and ?version= as (seconds, version); wait is capped at MAX_POLL_WAIT
+
+    Raises:
+        ValueError: If either is not a number
+    """
+    try:
+        wait = float(wait or 0)
+        version = int(version) if version not in (None, '') else -1
+    except (TypeError, ValueError):
+        raise ValueError("'wait' and 'version' must be numbers")
+    if not math.isfinite(wait):
+        raise ValueError("'wait' must be a finite number of seconds")
+    return min(max(wait, 0), MAX_POLL_WAIT), version
+
+
+class JobRun:
+    """
+    A job being finished: marks it running on entry, records each tool's
+    outcome and the final reply, and marks it failed if the block raises.
+    """
+
+    def __init__(self, store, job_id, session_id):
+        self.store = store
+        self.job_id = job_id
+        self.session_id = session_id
+
+    def __enter__(self):
+        self.store.update(self.job_id, status=RUNNING)
+        return self
+
+    def tool_done(self, index, result):
+        """Record call `index`'s result (a call_mcp_tool() return value)"""
+        failed = str(result).startswith('Error:')
+        self.store.update(self.job_id, tool_index=index, tool_status=FAILED if failed else DONE)
+
+    def finish(self, reply):
+        # Follows the interim reply already stored for this turn
+        conversations.append(self.session_id, {"role": "assistant", "content": reply})
+        self.store.update(self.job_id, status=DONE, reply=reply)
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None or not issubclass(exc_type, Exception):
+            return False
+        logger.error(f"Tool job {self.job_id} failed: {exc}", exc_info=(exc_type, exc, tb))
+        self.store.update(self.job_id, status=FAILED, error=str(exc))
+        return True
+
+
+class _Job:
+    __slots__ = ('id', 'session_id', 'status', 'tools', 'reply', 'error', 'version', 'created', 'finished')
+
+    def __init__(self, session_id, tool_names):
+        self.id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.status = PENDING
+        self.tools = [{'name': name, 'status': PENDING} for name in tool_names]
+        self.reply = None
+        self.error = None
+        # Bumped on every change so waiters can tell what they've already seen
+        self.version = 0
+        self.created = time.time()
+        self.finished = None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'tools': [dict(tool) for tool in self.tools],
+            'reply': self.reply,
+            'error': self.error,
+            'version': self.version,
+            'created': self.created,
+            'finished': self.finished,
+        }
+
+
+class JobStore:
+    """Thread-safe job registry for the Flask host; finished jobs expire after a TTL"""
+
+    def __init__(self, ttl=None):
+        """
+        Args:
+            ttl: Seconds a finished job stays queryable (TOOL_JOBS_TTL, default 600)
+        """
+        self.ttl = ttl or float(os.getenv('TOOL_JOBS_TTL', '600'))
+        self._jobs = {}
+        self._changed = threading.Condition()
+
+    def _purge(self, now):
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished is not None and now - job.finished > self.ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def create(self, session_id, tool_names):
+        with self._changed:
+            self._purge(time.time())
+            job = _Job(session_id, tool_names)
+            self._jobs[job.id] = job
+            return job.id
+
+    def _apply(self, job_id, status=None, tool_index=None, tool_status=None, reply=None, error=None):
+        job = self._jobs[job_id]
+        if status is not None:
+            job.status = status
+            if status in (DONE, FAILED):
+                job.finished = time.time()
+        if tool_index is not None:
+            job.tools[tool_index]['status'] = tool_status
+        if reply is not None:
+            job.reply = reply
+        if error is not None:
+            job.error = error
+        job.version += 1
+
+    def update(self, job_id, **changes):
+        """Record progress (status, tool_index/tool_status, reply, error) and wake waiters"""
+        with self._changed:
+            self._apply(job_id, **changes)
+            self._changed.notify_all()
+
+    def get(self, job_id, session_id):
+        """Snapshot of a job, or None if unknown, expired or owned by another session"""
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None or job.session_id != session_id:
+                return None
+            return job.to_dict()
+
+    def wait(self, job_id, session_id, after_version=-1, timeout=30.0):
+        """Long-poll: return the job once its version passes after_version (or on timeout)"""
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while True:
+                job = self._jobs.get(job_id)
+                if job is None or job.session_id != session_id:
+                    return None
+                remaining = deadline - time.monotonic()
+                if job.version > after_version or job.finished is not None or remaining <= 0:
+                    return job.to_dict()
+                self._changed.wait(remaining)
+
+    def wait_finished(self, job_id, session_id):
+        """Block until the job is done or failed; None if it's unknown or expired"""
+        version = -1
+        while True:
+            job = self.wait(job_id, session_id, version)
+            if job is None or job['finished'] is not None:
+                return job
+            version = job['version']
+
+    def run(self, job_id, session_id):
+        """JobRun context for the host's run_tool_job()"""
+        return JobRun(self, job_id, session_id)
+
+    def poll(self, job_id, session_id, wait=0, version=-1):
+        """GET /api/jobs/<id>: the job now, or once it passes `version` when wait > 0"""
+        if wait > 0:
+            return self.wait(job_id, session_id, version, wait)
+        return self.get(job_id, session_id)
+
+    def events(self, job_id, session_id):
+        """GET /api/jobs/<id>/stream: SSE text for each change until the job finishes"""
+        version = -1
+        while True:
+            job = self.wait(job_id, session_id, version, timeout=KEEPALIVE_INTERVAL)
+            chunk, version, done = _event(job, version)
+            yield chunk
+            if done:
+                return
+
+    def final_reply(self, reply, session_id):
+        """
+        A turn's reply once any job it started has finished (for batch items)
+
+        Raises:
+            RuntimeError: If the job failed or expired
+        """
+        if not isinstance(reply, PendingReply):
+            return reply
+        return _job_reply(self.wait_finished(reply.job_id, session_id))
+
+
+class AsyncJobStore(JobStore):
+    """asyncio job registry for the ASGI host (single event loop, no locking needed)"""
+
+    def __init__(self, ttl=None):
+        super().__init__(ttl)
+        self._events = {}
+
+    def create(self, session_id, tool_names):
+        self._purge(time.time())
+        for job_id in list(self._events):
+            if job_id not in self._jobs:
+                del self._events[job_id]
+        job = _Job(session_id, tool_names)
+        self._jobs[job.id] = job
+        self._events[job.id] = asyncio.Event()
+        return job.id
+
+    def update(self, job_id, **changes):
+        self._apply(job_id, **changes)
+        # Wake current waiters, then arm a fresh event for the next change
+        self._events[job_id].set()
+        self._events[job_id] = asyncio.Event()
+
+    def get(self, job_id, session_id):
+        job = self._jobs.get(job_id)
+        if job is None or job.session_id != session_id:
+            return None
+        return job.to_dict()
+
+    async def wait(self, job_id, session_id, after_version=-1, timeout=30.0):
+        job = self._jobs.get(job_id)
+        if job is None or job.session_id != session_id:
+            return None
+        if job.version <= after_version and job.finished is None:
+            try:
+                await asyncio.wait_for(self._events[job_id].wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.get(job_id, session_id)
+
+    async def wait_finished(self, job_id, session_id):
+        version = -1
+        while True:
+            job = await self.wait(job_id, session_id, version)
+            if job is None or job['finished'] is not None:
+                return job
+            version = job['version']
+
+    async def poll(self, job_id, session_id, wait=0, version=-1):
+        if wait > 0:
+            return await self.wait(job_id, session_id, version, wait)
+        return self.get(job_id, session_id)
+
+    async def events(self, job_id, session_id):
+        version = -1
+        while True:
+            job = await self.wait(job_id, session_id, version, timeout=KEEPALIVE_INTERVAL)
+            chunk, version, done = _event(job, version)
+            yield chunk
+            if done:
+                return
+
+    async def final_reply(self, reply, session_id):
+        if not isinstance(reply, PendingReply):
+            return reply
+        return _job_reply(await self.wait_finished(reply.job_id, session_id))
+
+
+def _event(job, version):
+    """The SSE chunk for one wait() result, the version seen, and whether the stream ends"""
+    if job is None:
+        return format_sse('error', {'error': 'Unknown job'}), version, True
+    if job['version'] == version:
+        # Comment line keeps idle proxies from closing the stream
+        return ': keep-alive\n\n', version, False
+    return format_sse('status', job), job['version'], job['status'] in (DONE, FAILED)
+
+
+def _job_reply(job):
+    if job is None or job['status'] != DONE:
+        raise RuntimeError(job['error'] if job else "Tool job expired")
+    return job['reply']
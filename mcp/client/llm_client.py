@@ -12,6 +12,7 @@ import logging
 from typing import Optional, Dict, Any, List
 from dotenv import load_dotenv
 from openai import OpenAI
+from mcp.client.llm_gateway import LLMGateway, get_gateway
 
 # Load environment variables
 load_dotenv()
@@ -19,12 +20,17 @@ load_dotenv()
 logger = logging.getLogger(__name__)
 
 class LLMClient:
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, max_concurrency: Optional[int] = None):
         self.api_key = api_key or os.getenv('OPENAI_API_KEY')
         if not self.api_key:
             raise ValueError("OpenAI API key not found")
-        self.client = openai.OpenAI(api_key=self.api_key)
+        # Share the process-wide pooled client unless a different key is used
+        gateway = get_gateway()
+        self.gateway = gateway if gateway.api_key == self.api_key else LLMGateway(api_key=self.api_key)
+        self.client = self.gateway.client
         self.session = None
+        # Max tool calls from one model turn executed at the same time
+        self.max_concurrency = max_concurrency or int(os.getenv('TOOL_CALL_CONCURRENCY', '4'))
     
     async def connect_to_server(self, server_command):
         """Connect to MCP server using proper session"""
@@ -50,6 +56,24 @@ class LLMClient:
         
         return await self.session.call_tool(name, arguments)
     
+    async def call_tools(self, tool_calls):
+        """Execute OpenAI tool calls concurrently, returning results in call order"""
+        results = [None] * len(tool_calls)
+        limiter = anyio.CapacityLimiter(self.max_concurrency)
+        
+        async def run(index, tool_call):
+            async with limiter:
+                results[index] = await self.call_tool(
+                    tool_call.function.name,
+                    json.loads(tool_call.function.arguments)
+                )
+        
+        async with anyio.create_task_group() as tg:
+            for index, tool_call in enumerate(tool_calls):
+                tg.start_soon(run, index, tool_call)
+        
+        return results
+    
     async def query(self, user_input, server_command="python", server_args=["../../server/mcp_server.py"]):
         """Query GPT-4o-mini with MCP tools"""
         await self.connect_to_server(server_command)
@@ -70,7 +94,7 @@ class LLMClient:
             
             # Initial GPT call
             messages = [{"role": "user", "content": user_input}]
-            response = self.client.chat.completions.create(
+            response = self.gateway.complete(
                 model="gpt-4o-mini",
                 messages=messages,
                 tools=openai_tools
@@ -82,13 +106,11 @@ class LLMClient:
             if message.tool_calls:
                 messages.append(message)
                 
-                for tool_call in message.tool_calls:
-                    # Execute tool via MCP
-                    tool_result = await self.call_tool(
-                        tool_call.function.name,
-                        json.loads(tool_call.function.arguments)
-                    )
-                    
+                # Execute independent tool calls concurrently, at most
+                # max_concurrency at a time; results keep tool_call order
+                tool_results = await self.call_tools(message.tool_calls)
+                
+                for tool_call, tool_result in zip(message.tool_calls, tool_results):
                     # Add tool result to conversation
                     messages.append({
                         "role": "tool",
@@ -97,7 +119,7 @@ class LLMClient:
                     })
                 
                 # Get final response
-                final_response = self.client.chat.completions.create(
+                final_response = self.gateway.complete(
                     model="gpt-4o-mini",
                     messages=messages
                 )
@@ -0,0 +1,402 @@
+"""
+Shared gateway for OpenAI chat completions.
+
+One process-wide pair of OpenAI/AsyncOpenAI clients backed by tuned httpx
+connection pools, so every caller (the Flask and ASGI hosts, LLMClient)
+reuses warm keep-alive connections instead of building its own client.
+
+Every call gets a deadline that bounds the whole call, retries and hedges
+included. For stream=True the deadline also covers reading the stream: the
+returned iterator raises APITimeoutError once it runs out. Without hedging,
+a sync call runs inline on the caller's thread and the deadline is applied
+as the SDK timeout; with hedging, attempts run on a small thread pool so
+the caller can race them. Optionally, a call that has not returned within
+the recent p95 latency of calls like it is hedged: a second identical
+request is fired and whichever answers first wins. Latency is what the race
+waits for: time-to-headers for stream=True, the whole completion otherwise,
+so the two are sampled separately. The loser is cancelled (async) or closed and
+discarded when it returns (sync). Hedging trades a few percent of extra
+requests for a shorter tail; it is off by default.
+
+The OpenAI SDK takes most of a host's import time, so it is only imported
+when a client is first built, or ahead of time on a background thread by
+preload().
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+if TYPE_CHECKING:
+    import httpx
+    import openai
+
+logger = logging.getLogger(__name__)
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+class LLMGateway:
+    """Pooled OpenAI clients with per-call deadlines and optional hedging"""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        max_connections: Optional[int] = None,
+        max_keepalive: Optional[int] = None,
+        keepalive_expiry: Optional[float] = None,
+        connect_timeout: Optional[float] = None,
+        deadline: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        hedge: Optional[bool] = None,
+        hedge_delay: Optional[float] = None,
+        hedge_min_samples: Optional[int] = None,
+    ):
+        """
+        Args:
+            api_key: OpenAI key (OPENAI_API_KEY)
+            base_url: API endpoint (OPENAI_BASE_URL, default api.openai.com)
+            max_connections: Pool size per client (LLM_MAX_CONNECTIONS, default 100)
+            max_keepalive: Idle connections kept open (LLM_MAX_KEEPALIVE, default 20)
+            keepalive_expiry: Seconds an idle connection is kept (LLM_KEEPALIVE_EXPIRY, default 30)
+            connect_timeout: TCP/TLS connect timeout (LLM_CONNECT_TIMEOUT, default 5)
+            deadline: Default seconds a whole call may take (LLM_DEADLINE, default 60)
+            max_retries: SDK retries within the deadline (LLM_MAX_RETRIES, default 2)
+            hedge: Enable hedged requests (LLM_HEDGE, default off)
+            hedge_delay: Hedge delay used until enough latencies are observed
+                (LLM_HEDGE_DELAY, default 2.0)
+            hedge_min_samples: Observations needed before hedging at the
+                measured p95 (LLM_HEDGE_MIN_SAMPLES, default 20)
+        """
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.base_url = base_url or os.getenv("OPENAI_BASE_URL") or None
+        self.max_connections = max_connections or int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+        self.max_keepalive = max_keepalive or int(os.getenv("LLM_MAX_KEEPALIVE", "20"))
+        self.keepalive_expiry = keepalive_expiry or _env_float("LLM_KEEPALIVE_EXPIRY", 30)
+        self.connect_timeout = connect_timeout or _env_float("LLM_CONNECT_TIMEOUT", 5)
+        self.deadline = deadline or _env_float("LLM_DEADLINE", 60)
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("LLM_MAX_RETRIES", "2"))
+        self.hedge = hedge if hedge is not None else os.getenv("LLM_HEDGE", "False").lower() == "true"
+        self.initial_hedge_delay = hedge_delay or _env_float("LLM_HEDGE_DELAY", 2.0)
+        self.hedge_min_samples = hedge_min_samples or int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+
+        # Recent latencies of successful calls, for the p95 hedge delay, keyed
+        # by stream: a stream returns at its headers, other calls when done
+        self._latencies = {False: deque(maxlen=500), True: deque(maxlen=500)}
+        self._counts = {"requests": 0, "hedged": 0, "hedge_wins": 0, "errors": 0}
+        self._lock = threading.Lock()
+        self._client = None
+        self._async_client = None
+        self._executor = None
+
+    def preload(self) -> None:
+        """Import the SDK in the background so startup doesn't wait for it (LLM_PRELOAD, default on)"""
+        if os.getenv("LLM_PRELOAD", "True").lower() != "true":
+            return
+        threading.Thread(target=lambda: __import__("openai"), name="llm-preload", daemon=True).start()
+
+    def _limits(self) -> "httpx.Limits":
+        import httpx
+
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    def _timeout(self) -> "httpx.Timeout":
+        import httpx
+
+        return httpx.Timeout(self.deadline, connect=self.connect_timeout)
+
+    @property
+    def client(self) -> "openai.OpenAI":
+        """Shared synchronous client"""
+        if self._client is None:
+            import openai
+
+            with self._lock:
+                if self._client is None:
+                    self._client = openai.OpenAI(
+                        api_key=self.api_key,
+                        base_url=self.base_url,
+                        max_retries=self.max_retries,
+                        http_client=openai.DefaultHttpxClient(limits=self._limits(), timeout=self._timeout()),
+                    )
+        return self._client
+
+    @property
+    def async_client(self) -> "openai.AsyncOpenAI":
+        """Shared asyncio client"""
+        if self._async_client is None:
+            import openai
+
+            with self._lock:
+                if self._async_client is None:
+                    self._async_client = openai.AsyncOpenAI(
+                        api_key=self.api_key,
+                        base_url=self.base_url,
+                        max_retries=self.max_retries,
+                        http_client=openai.DefaultAsyncHttpxClient(limits=self._limits(), timeout=self._timeout()),
+                    )
+        return self._async_client
+
+    def hedge_delay(self, stream: bool = False) -> float:
+        """Seconds to wait before hedging: the observed p95 for stream or non-stream calls, once there are enough samples"""
+        samples = list(self._latencies[stream])
+        if len(samples) < self.hedge_min_samples:
+            return self.initial_hedge_delay
+        samples.sort()
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._counts[key] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+        return {
+            **counts,
+            "hedge_enabled": self.hedge,
+            "hedge_delay": round(self.hedge_delay(), 4),
+            "stream_hedge_delay": round(self.hedge_delay(stream=True), 4),
+            "latency_samples": len(self._latencies[False]) + len(self._latencies[True]),
+            "max_connections": self.max_connections,
+        }
+
+    # -- sync ---------------------------------------------------------------
+
+    def _attempt(self, kwargs: Dict[str, Any], timeout: float):
+        started = time.monotonic()
+        result = self.client.chat.completions.create(**kwargs, timeout=timeout)
+        # For stream=True, create() returns as soon as the headers arrive;
+        # otherwise once the whole completion has been read
+        self._latencies[bool(kwargs.get("stream"))].append(time.monotonic() - started)
+        return result
+
+    def complete(self, deadline: Optional[float] = None, **kwargs):
+        """
+        chat.completions.create() through the shared pool.
+
+        Args:
+            deadline: Seconds the whole call may take, including reading the
+                stream for stream=True (default: LLM_DEADLINE)
+            **kwargs: Passed to chat.completions.create (stream=True is supported)
+        """
+        deadline = deadline or self.deadline
+        ends_at = time.monotonic() + deadline
+        self._count("requests")
+        try:
+            if self.hedge:
+                result = self._race(kwargs, deadline)
+            else:
+                # Nothing to race: skip the thread pool hand-off
+                result = self._attempt(kwargs, deadline)
+        except Exception:
+            self._count("errors")
+            raise
+        if kwargs.get("stream"):
+            return _DeadlineStream(result, ends_at, self._timeout_error)
+        return result
+
+    def _timeout_error(self) -> "openai.APITimeoutError":
+        import httpx
+        import openai
+
+        # Whichever client made the call; don't build the other one for this
+        client = self._client or self._async_client
+        return openai.APITimeoutError(request=httpx.Request("POST", str(client.base_url)))
+
+    def _race(self, kwargs: Dict[str, Any], deadline: float):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_connections, thread_name_prefix="llm-call"
+                    )
+
+        ends_at = time.monotonic() + deadline
+        futures = [self._executor.submit(self._attempt, kwargs, deadline)]
+        winner = None
+        error = None
+        try:
+            done, _ = wait(futures, timeout=min(self.hedge_delay(bool(kwargs.get("stream"))), deadline))
+            if not done:
+                self._count("hedged")
+                remaining = max(ends_at - time.monotonic(), 0.001)
+                futures.append(self._executor.submit(self._attempt, kwargs, remaining))
+
+            pending = set(futures)
+            while pending and winner is None:
+                done, pending = wait(
+                    pending, timeout=max(ends_at - time.monotonic(), 0), return_when=FIRST_COMPLETED
+                )
+                if not done:
+                    break
+                for future in done:
+                    if future.exception() is None:
+                        winner = future
+                        break
+                    error = future.exception()
+
+            if winner is None:
+                raise error or self._timeout_error()
+            if winner is not futures[0]:
+                self._count("hedge_wins")
+            return winner.result()
+        finally:
+            # Threads can't be interrupted; losers are closed when they return
+            for future in futures:
+                if future is not winner:
+                    future.add_done_callback(_close_result)
+
+    # -- async --------------------------------------------------------------
+
+    async def _aattempt(self, kwargs: Dict[str, Any], timeout: float):
+        started = time.monotonic()
+        result = await self.async_client.chat.completions.create(**kwargs, timeout=timeout)
+        self._latencies[bool(kwargs.get("stream"))].append(time.monotonic() - started)
+        return result
+
+    async def acomplete(self, deadline: Optional[float] = None, **kwargs):
+        """Async complete(); losing hedges are cancelled"""
+        deadline = deadline or self.deadline
+        ends_at = time.monotonic() + deadline
+        self._count("requests")
+        try:
+            result = await asyncio.wait_for(self._arace(kwargs, deadline), deadline)
+        except asyncio.TimeoutError:
+            self._count("errors")
+            raise self._timeout_error()
+        except Exception:
+            self._count("errors")
+            raise
+        if kwargs.get("stream"):
+            return _AsyncDeadlineStream(result, ends_at, self._timeout_error)
+        return result
+
+    async def _arace(self, kwargs: Dict[str, Any], deadline: float):
+        if not self.hedge:
+            return await self._aattempt(kwargs, deadline)
+
+        tasks = [asyncio.ensure_future(self._aattempt(kwargs, deadline))]
+        winner = None
+        error = None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay(bool(kwargs.get("stream"))))
+            if not done:
+                self._count("hedged")
+                tasks.append(asyncio.ensure_future(self._aattempt(kwargs, deadline)))
+
+            pending = set(tasks)
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = task
+                        break
+                    error = task.exception()
+
+            if winner is None:
+                raise error
+            if winner is not tasks[0]:
+                self._count("hedge_wins")
+            return winner.result()
+        finally:
+            for task in tasks:
+                if task is not winner:
+                    task.cancel()
+                    task.add_done_callback(_close_task_result)
+
+
+class _DeadlineStream:
+    """A completion stream that gives up once the call's deadline has passed"""
+
+    def __init__(self, stream, ends_at: float, timeout_error):
+        self._stream = stream
+        self._ends_at = ends_at
+        self._timeout_error = timeout_error
+
+    def __iter__(self):
+        for chunk in self._stream:
+            # A stalled read is still bounded by the client's read timeout
+            if time.monotonic() > self._ends_at:
+                self._stream.close()
+                raise self._timeout_error()
+            yield chunk
+
+    def close(self) -> None:
+        self._stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class _AsyncDeadlineStream:
+    """Async _DeadlineStream"""
+
+    def __init__(self, stream, ends_at: float, timeout_error):
+        self._stream = stream
+        self._ends_at = ends_at
+        self._timeout_error = timeout_error
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            if time.monotonic() > self._ends_at:
+                await self._stream.close()
+                raise self._timeout_error()
+            yield chunk
+
+    async def close(self) -> None:
+        await self._stream.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+
+def _close_result(future) -> None:
+    """Release a losing hedge's connection (matters for streams)"""
+    if future.exception() is None and hasattr(future.result(), "close"):
+        try:
+            future.result().close()
+        except Exception as e:
+            logger.debug(f"Closing losing hedge failed: {e}")
+
+
+def _close_task_result(task) -> None:
+    if task.cancelled() or task.exception() is not None:
+        return
+    result = task.result()
+    if hasattr(result, "close"):
+        close = result.close()
+        if asyncio.iscoroutine(close):
+            asyncio.ensure_future(close)
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> LLMGateway:
+    """The process-wide gateway, configured from the environment"""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway()
+    return _gateway
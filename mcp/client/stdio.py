@@ -20,6 +20,7 @@ from mcp.os.win32.utilities import (
     get_windows_executable_command,
     terminate_windows_process_tree,
 )
+from mcp.shared.json_codec import codec
 from mcp.shared.message import SessionMessage
 
 logger = logging.getLogger(__name__)
@@ -152,7 +153,7 @@ async def stdio_client(server: StdioServerParameters, errlog: TextIO = sys.stder
 
                     for line in lines:
                         try:
-                            message = types.JSONRPCMessage.model_validate_json(line)
+                            message = codec.decode_message(types.JSONRPCMessage, line)
                         except Exception as exc:
                             logger.exception("Failed to parse JSONRPC message from server")
                             await read_stream_writer.send(exc)
@@ -169,13 +170,13 @@ async def stdio_client(server: StdioServerParameters, errlog: TextIO = sys.stder
         try:
             async with write_stream_reader:
                 async for session_message in write_stream_reader:
-                    json = session_message.message.model_dump_json(by_alias=True, exclude_none=True)
-                    await process.stdin.send(
-                        (json + "\n").encode(
+                    data = codec.encode_message(session_message.message) + b"\n"
+                    if server.encoding.lower().replace("-", "") != "utf8":
+                        data = data.decode().encode(
                             encoding=server.encoding,
                             errors=server.encoding_error_handler,
                         )
-                    )
+                    await process.stdin.send(data)
         except anyio.ClosedResourceError:
             await anyio.lowlevel.checkpoint()
 
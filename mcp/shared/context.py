@@ -3,7 +3,7 @@ from typing import Any, Generic
 
 from typing_extensions import TypeVar
 
-from shared.session import BaseSession
+from mcp.shared.session import BaseSession
 from mcp.types import RequestId, RequestParams
 
 SessionT = TypeVar("SessionT", bound=BaseSession[Any, Any, Any, Any, Any])
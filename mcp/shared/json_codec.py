@@ -0,0 +1,100 @@
+"""
+JSON codec for the MCP stdio transport.
+
+Every JSON-RPC message the MCP server reads or writes, and every message
+the host's stdio clients (host/mcp_pool.py and mcp/client/stdio.py)
+exchange with it, goes through the codec selected here at startup with
+JSON_CODEC:
+
+- "auto" (default): orjson when it is installed, else the standard library
+- "orjson": require orjson
+- "json": the standard library (and pydantic's own JSON for SDK messages)
+
+Both produce the same JSON values; orjson writes compact UTF-8 rather than
+ASCII escapes, which any JSON reader accepts. bench/json_codec.py compares
+their per-message cost.
+
+It lives with the transport in the mcp package, which both the server and
+the host import it from; it depends on nothing else in mcp, so the server
+doesn't pay for the SDK's pydantic models.
+"""
+
+import json
+import os
+from typing import Any
+
+
+class StdlibCodec:
+    """The json module; SDK messages use pydantic's built-in JSON support"""
+
+    name = "json"
+
+    def loads(self, data: bytes | str) -> Any:
+        return json.loads(data)
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj).encode()
+
+    def decode_message(self, model: Any, data: bytes | str) -> Any:
+        """Parse and validate one message as the pydantic model class `model`"""
+        return model.model_validate_json(data)
+
+    def encode_message(self, message: Any) -> bytes:
+        """Serialize one pydantic message the way the MCP SDK does"""
+        return message.model_dump_json(by_alias=True, exclude_none=True).encode()
+
+
+class OrjsonCodec(StdlibCodec):
+    """orjson: several times faster, most of all on MB-sized tool results"""
+
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+
+        self._orjson = orjson
+        # json.dumps turns int keys into strings; keep that behaviour
+        self._options = orjson.OPT_NON_STR_KEYS
+
+    def loads(self, data: bytes | str) -> Any:
+        return self._orjson.loads(data)
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._orjson.dumps(obj, option=self._options)
+
+    def decode_message(self, model: Any, data: bytes | str) -> Any:
+        return model.model_validate(self._orjson.loads(data))
+
+    def encode_message(self, message: Any) -> bytes:
+        # Python-mode dumps skip pydantic's JSON pass; URLs and other
+        # non-JSON field types are written as their string form
+        return self._orjson.dumps(
+            message.model_dump(by_alias=True, exclude_none=True), default=str, option=self._options
+        )
+
+
+def select(name: str | None = None) -> StdlibCodec:
+    """
+    Pick the codec by name
+
+    Args:
+        name: "auto", "orjson" or "json" (default: JSON_CODEC, else "auto")
+
+    Raises:
+        ImportError: If orjson was asked for explicitly but isn't installed
+        ValueError: If the name is unknown
+    """
+    name = (name or os.getenv("JSON_CODEC", "auto")).lower()
+    if name == "json":
+        return StdlibCodec()
+    if name == "orjson":
+        return OrjsonCodec()
+    if name == "auto":
+        try:
+            return OrjsonCodec()
+        except ImportError:
+            return StdlibCodec()
+    raise ValueError(f"Unknown JSON_CODEC: {name}")
+
+
+codec = select()
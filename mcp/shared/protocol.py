@@ -0,0 +1,9 @@
+"""
+MCP protocol constants with no imports of their own.
+
+mcp.types re-exports these, but importing it builds every pydantic model in
+the schema; the MCP server and the host's process pool only need the
+strings, so they import them from here.
+"""
+
+LATEST_PROTOCOL_VERSION = "2025-06-18"
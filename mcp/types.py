@@ -23,7 +23,7 @@ for reference.
   not separate types in the schema.
 """
 
-LATEST_PROTOCOL_VERSION = "2025-06-18"
+from mcp.shared.protocol import LATEST_PROTOCOL_VERSION
 
 """
 The default negotiated version of the Model Context Protocol when no version is specified.
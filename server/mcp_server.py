@@ -4,15 +4,30 @@ MCP Server - Implements Model Context Protocol from scratch
 Handles JSON-RPC 2.0 requests over stdio
 """
 
-from dotenv import load_dotenv
+# With STARTUP_PROFILE=True, the imports below and the init steps are timed
+import startup_profile
+startup_profile.install()
+
 import os
-import json
+import functools
 import sys
+
+# The repo root, for the mcp package shared with the host (after this
+# directory, so sibling modules still win)
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
 import logging
-from typing import Dict, Any, Callable
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, List, Optional
 from tools.gmail_tools import GmailTools
+from tools.registry import InvalidParams, ToolRegistry
+import tracing
+# Not mcp.types: building its pydantic models took most of every spawn's startup
+from mcp.shared import json_codec
+from mcp.shared.protocol import LATEST_PROTOCOL_VERSION as PROTOCOL_VERSION
 #from tools.drive_tools import DriveTools
-from mcp.types import LATEST_PROTOCOL_VERSION, DEFAULT_NEGOTIATED_VERSION
 
 # Set up logging to stderr (stdout is used for JSON-RPC communication)
 logging.basicConfig(
@@ -22,79 +37,51 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Spans from this process are told apart from the host's by service name
+tracing.service_name = "mailmind-mcp-server"
+
+
+def _error_response(request_id: Any, code: int, message: str) -> Dict[str, Any]:
+    """A JSON-RPC error response"""
+    return {
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "error": {
+            "code": code,
+            "message": message
+        }
+    }
+
 
 class MCPServer:
     """MCP Server implementing JSON-RPC 2.0 protocol"""
 
     def __init__(self):
         """Initialize MCP server with available tools"""
-        # Initialize tool modules and put path for your Gmail API JSON
-        self.gmail_tools = GmailTools(credentials_path="./credentials.json")
+        # Initialize tool modules and put path for your Gmail API JSON.
+        # Credentials and the Gmail service are loaded on first use (or by
+        # warm_up()), so initialize and tools/list never wait on Google.
+        with startup_profile.phase("gmail tools"):
+            if os.getenv("GMAIL_BACKEND", "google").lower() == "fake":
+                # Offline benchmarks: in-memory Gmail with injected latency
+                from tools.fake_gmail import FakeGmailService
+                self.gmail_tools = GmailTools(service=FakeGmailService())
+                logger.info("Using the fake Gmail backend")
+            else:
+                self.gmail_tools = GmailTools(credentials_path="./credentials.json")
         # self.drive_tools = DriveTools()
 
-        try:
-            email = self.gmail_tools.get_authenticated_email()
-            logger.info(f"✅ MCP Server Gmail account: {email}")
-        except Exception as e:
-            logger.warning(f"Could not retrieve Gmail account: {e}")
-
-        # Register available tools
-        self.tools = {
-            "send_email": {
-                "function": self.gmail_tools.send_email,
-                "schema": {
-                    "name": "send_email",
-                    "description": "Send an email via Gmail to specified recipients",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "to": {
-                                "type": "string",
-                                "description": "Recipient email address"
-                            },
-                            "subject": {
-                                "type": "string",
-                                "description": "Email subject line"
-                            },
-                            "body": {
-                                "type": "string",
-                                "description": "Email body content (plain text or HTML)"
-                            },
-                            "cc": {
-                                "type": "array",
-                                "items": {"type": "string"},
-                                "description": "CC recipients (optional)"
-                            }
-                        },
-                        "required": ["to", "subject", "body"]
-                    }
-                }
-            }#,
-            # "search_drive_files": {
-            #     "function": self.drive_tools.search_files,
-            #     "schema": {
-            #         "name": "search_drive_files",
-            #         "description": "Search for files in Google Drive by name or query",
-            #         "parameters": {
-            #             "type": "object",
-            #             "properties": {
-            #                 "query": {
-            #                     "type": "string",
-            #                     "description": "Search query (file name or keywords)"
-            #                 },
-            #                 "max_results": {
-            #                     "type": "integer",
-            #                     "description": "Maximum number of results to return (default: 10)"
-            #                 }
-            #             },
-            #             "required": ["query"]
-            #         }
-            #     }
-            # }
-        }
+        # Register available tools: the @tool methods of each tool module
+        self.tools = ToolRegistry()
+        self.tools.register_methods(self.gmail_tools)
+        # self.tools.register_methods(self.drive_tools)
 
         logger.info(f"MCP Server initialized with {len(self.tools)} tools")
 
+    def warm_up(self):
+        """Authenticate with Gmail and look up the account on a background thread"""
+        threading.Thread(target=self.gmail_tools.warm_up, name="gmail-warm-up", daemon=True).start()
+
     def handle_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
         """
         Handle incoming JSON-RPC 2.0 request
@@ -106,43 +93,57 @@ class MCPServer:
             Result dictionary to be sent back to client
         """
         method = request.get("method")
-        params = request.get("params", {})
+        # "params": null is the same as leaving it out; MCP params are always objects
+        params = request.get("params") or {}
+        if not isinstance(params, dict):
+            raise InvalidParams("params must be an object")
 
         logger.info(f"Handling request: {method}")
 
         if method == "tools/list":
             # Return list of available tools
-            return {
-                "tools": [tool["schema"] for tool in self.tools.values()]
-            }
+            return {"tools": self.tools.schemas()}
 
         elif method == "tools/call":
             # Execute a specific tool
             tool_name = params.get("name")
-            arguments = params.get("arguments", {})
+            arguments = params.get("arguments") or {}
 
-            if tool_name not in self.tools:
-                raise ValueError(f"Unknown tool: {tool_name}")
+            # Unknown tools and bad arguments fail here, before any Gmail I/O
+            function = self.tools.resolve(tool_name, arguments)
 
-            logger.info(f"Calling tool: {tool_name} with args: {arguments}")
+            # The host sends its trace context in params._meta so these spans
+            # join the chat request's trace
+            traceparent = (params.get("_meta") or {}).get("traceparent")
+            with tracing.span("mcp.tools/call", traceparent=traceparent, tool=tool_name) as server_span:
+                logger.info(f"Calling tool: {tool_name} with args: {arguments} (trace {server_span.trace_id})")
 
-            # Execute the tool function
-            result = self.tools[tool_name]["function"](**arguments)
+                # Execute the tool function
+                started = time.perf_counter()
+                with tracing.span(f"gmail.{tool_name}"):
+                    result = function(**arguments)
+                duration_ms = (time.perf_counter() - started) * 1000
 
-            # Return in MCP format
-            return {
+            # Return in MCP format; _meta lets the host separate backend
+            # (Gmail API) time from transport overhead
+            response = {
                 "content": [
                     {
                         "type": "text",
                         "text": str(result)
                     }
-                ]
+                ],
+                "_meta": {"toolDurationMs": round(duration_ms, 3), "traceId": server_span.trace_id}
             }
+            # Gmail API responses are objects; hosts can use them without parsing the text
+            if isinstance(result, dict):
+                response["structuredContent"] = result
+            return response
 
         elif method == "initialize":
             # Handle initialization request
             return {
-                "protocolVersion": LATEST_PROTOCOL_VERSION,
+                "protocolVersion": PROTOCOL_VERSION,
                 "serverInfo": {
                     "name": "google-workspace-mcp-server",
                     "version": "0.1.0"
@@ -152,6 +153,10 @@ class MCPServer:
                 }
             }
         
+        elif method == "ping":
+            # Liveness check used by the host's process pool
+            return {}
+
         elif method == "notifications/initialized":
         # Client confirms initialization complete
             logger.info("Client initialized successfully")
@@ -160,69 +165,179 @@ class MCPServer:
         else:
             raise ValueError(f"Unknown method: {method}")
 
-    def run(self):
+    def respond(self, request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Handle one parsed JSON-RPC message and build its response
+
+        Args:
+            request: JSON-RPC request or notification object
+
+        Returns:
+            The response to write, or None for a notification
+        """
+        request_id = request.get("id")
+        logger.debug(f"Received request id: {request_id}")
+        try:
+            # Process request
+            result = self.handle_request(request)
+        except InvalidParams as e:
+            logger.warning(f"Rejected request: {e}")
+            if request_id is None:
+                return None
+            return _error_response(request_id, e.code, str(e))
+        except Exception as e:
+            logger.error(f"Error handling request: {e}", exc_info=True)
+            if request_id is None:
+                return None
+            # Build JSON-RPC error response
+            return _error_response(request_id, -32603, str(e))
+
+        if request_id is None:
+            # It's a notification (no response expected)
+            logger.debug(f"Ignoring notification method: {request.get('method')}")
+            return None
+
+        # Ensure result is a dict
+        if result is None:
+            result = {}
+        elif not isinstance(result, dict):
+            result = {"content": result}
+
+        return {
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "result": result
+        }
+
+    def _write(self, message: Any) -> None:
+        """Write one response (or batch response) line; the lock keeps concurrent responses from interleaving"""
+        if message is None:
+            return
+        data = json_codec.codec.dumps(message) + b"\n"
+        with self._write_lock:
+            sys.stdout.buffer.write(data)
+            sys.stdout.buffer.flush()
+
+    def _dispatch(self, request: Dict[str, Any], reply: Callable[[Optional[Dict[str, Any]]], None]) -> None:
+        """Worker thread body: answer one request, then free its in-flight slot"""
+        try:
+            reply(self.respond(request))
+        except Exception as e:
+            logger.error(f"Error writing response: {e}", exc_info=True)
+        finally:
+            self._in_flight.release()
+
+    def _submit(self, request: Dict[str, Any], reply: Callable[[Optional[Dict[str, Any]]], None], executor) -> None:
+        """Run tool calls on the worker pool and everything else inline, passing the response to reply"""
+        if executor is not None and request.get("method") == "tools/call":
+            # Blocks while max_in_flight calls are running
+            self._in_flight.acquire()
+            executor.submit(self._dispatch, request, reply)
+        else:
+            reply(self.respond(request))
+
+    def _run_batch(self, batch: List[Any], executor) -> None:
+        """
+        Answer a JSON-RPC batch: its tool calls run concurrently like single
+        requests, and one response array (in request order, without entries
+        for notifications) is written when the last member finishes
+
+        Args:
+            batch: The parsed request array
+            executor: Worker pool for tool calls, or None to run inline
+        """
+        if not batch:
+            self._write(_error_response(None, -32600, "Invalid Request: empty batch"))
+            return
+
+        responses: List[Optional[Dict[str, Any]]] = [None] * len(batch)
+        remaining = len(batch)
+        lock = threading.Lock()
+
+        def reply(index, response):
+            nonlocal remaining
+            responses[index] = response
+            with lock:
+                remaining -= 1
+                if remaining:
+                    return
+            # A batch of only notifications gets no reply at all
+            answered = [response for response in responses if response is not None]
+            if answered:
+                self._write(answered)
+
+        for index, request in enumerate(batch):
+            if isinstance(request, dict):
+                self._submit(request, functools.partial(reply, index), executor)
+            else:
+                reply(index, _error_response(None, -32600, "Invalid Request: batch members must be objects"))
+
+    def run(self, max_in_flight: Optional[int] = None):
         """
         Main server loop - reads JSON-RPC requests from stdin,
         processes them, and writes responses to stdout
+
+        Tool calls run on a pool of max_in_flight worker threads
+        (MCP_SERVER_MAX_IN_FLIGHT, default 8), so a slow send_email doesn't
+        hold up the requests behind it; responses go out as they finish and
+        the client matches them by id. Once that many calls are running the
+        loop stops reading until one completes. Everything else is answered
+        inline, in order. With max_in_flight=1 every request is handled
+        inline, one at a time.
+
+        A line may also hold a JSON-RPC batch (an array of requests); see
+        _run_batch().
+
+        Args:
+            max_in_flight: Tool calls allowed to run at once
         """
-        logger.info("MCP Server starting...")
+        if max_in_flight is None:
+            max_in_flight = int(os.getenv("MCP_SERVER_MAX_IN_FLIGHT", "8"))
+        max_in_flight = max(1, max_in_flight)
+        logger.info(
+            f"MCP Server starting (max {max_in_flight} tool calls in flight, {json_codec.codec.name} codec)..."
+        )
+
+        self._write_lock = threading.Lock()
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+        executor = None
+        if max_in_flight > 1:
+            executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="mcp-tool")
 
         try:
-            for line in sys.stdin:
+            # Bytes in and out: the codec works on UTF-8 directly
+            for line in sys.stdin.buffer:
                 line = line.strip()
                 if not line:
                     continue
 
+                # Parse JSON-RPC request; without an id there is no one to answer
                 try:
-                    # Parse JSON-RPC request
-                    request = json.loads(line)
-                    request_id = request.get("id")
-                    logger.debug(f"Received request id: {request_id}")
-
-                    # Process request
-                    result = self.handle_request(request)
-
-                    # Build JSON-RPC response
-                    if request_id is not None:
-                        # Ensure result is a dict
-                        if result is None:
-                            result = {}
-                        elif not isinstance(result, dict):
-                            result = {"content": result}
-
-                        response = {
-                            "jsonrpc": "2.0",
-                            "id": request_id,
-                            "result": result
-                        }
-
-                        # Only send responses for requests (not notifications)
-                        print(json.dumps(response), flush=True)
-                    else:
-                        # It's a notification (no response expected)
-                        logger.debug(f"Ignoring notification method: {request.get('method')}")
-
-                except Exception as e:
-                    logger.error(f"Error handling request: {e}", exc_info=True)
-                    # Build JSON-RPC error response
-                    if 'request' in locals() and request.get("id") is not None:
-                        error_response = {
-                            "jsonrpc": "2.0",
-                            "id": request.get("id"),
-                            "error": {
-                                "code": -32603,
-                                "message": str(e)
-                            }
-                        }
-                        print(json.dumps(error_response), flush=True)
+                    request = json_codec.codec.loads(line)
+                except ValueError as e:
+                    logger.error(f"Error parsing request: {e}")
+                    continue
+                if isinstance(request, list):
+                    self._run_batch(request, executor)
+                elif isinstance(request, dict):
+                    self._submit(request, self._write, executor)
+                else:
+                    logger.error(f"Ignoring non-object request: {line[:200]!r}")
 
         except KeyboardInterrupt:
             logger.info("Server shutting down...")
         except Exception as e:
             logger.error(f"Fatal error: {e}", exc_info=True)
             sys.exit(1)
-
+        finally:
+            # stdin closed: let the calls already running write their responses
+            if executor is not None:
+                executor.shutdown(wait=True)
 
 if __name__ == "__main__":
     server = MCPServer()
+    # Off: Gmail is first touched by the first tool call
+    if os.getenv("GMAIL_WARM_UP", "True").lower() == "true":
+        server.warm_up()
+    startup_profile.report()
     server.run()
@@ -0,0 +1,97 @@
+"""
+Cold start profiling for the host and the MCP server.
+
+With STARTUP_PROFILE=True, install() times every import statement and
+phase() times named init steps. report() then logs one breakdown line
+per process:
+
+    Startup profile (app.py): 1580 ms since process start | imports:
+    flask 398 ms, mcp 44 ms, ... | init: mcp pool 916 ms
+
+Import times are cumulative per top-level package, counted where the
+package is first imported. A package imported by a background thread
+(e.g. the LLM preload) is tagged "(bg)". With the setting off, install()
+does nothing and phase() is a plain timer with negligible cost.
+
+Shared by both processes like tracing: the server imports it as
+`startup_profile`, the host as `server.startup_profile`.
+"""
+
+import builtins
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("STARTUP_PROFILE", "False").lower() == "true"
+
+_imports = {}
+_phases = []
+_local = threading.local()
+_original_import = builtins.__import__
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    # Relative and already-loaded imports are cheap; skip the bookkeeping
+    if level or (name in sys.modules and not fromlist):
+        return _original_import(name, globals, locals, fromlist, level)
+
+    depth = getattr(_local, "depth", 0)
+    _local.depth = depth + 1
+    started = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        _local.depth = depth
+        if depth == 0:
+            package = name.partition(".")[0]
+            if threading.current_thread() is not threading.main_thread():
+                package += " (bg)"
+            _imports[package] = _imports.get(package, 0.0) + time.perf_counter() - started
+
+
+def install() -> None:
+    """Start timing imports (only with STARTUP_PROFILE=True); call before the heavy imports"""
+    if ENABLED and builtins.__import__ is _original_import:
+        builtins.__import__ = _timed_import
+
+
+@contextmanager
+def phase(name: str):
+    """Time one init step"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if ENABLED:
+            _phases.append((name, time.perf_counter() - started))
+
+
+def _process_age():
+    """Seconds since this process started (Linux), or None"""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def report(top: int = 8) -> None:
+    """Log the import and init breakdown, then stop timing imports"""
+    if not ENABLED:
+        return
+    builtins.__import__ = _original_import
+
+    age = _process_age()
+    parts = [f"{age * 1000:.0f} ms since process start" if age is not None else "process age unknown"]
+    heaviest = sorted(_imports.items(), key=lambda item: item[1], reverse=True)[:top]
+    parts.append("imports: " + ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in heaviest))
+    parts.append("init: " + ", ".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in _phases))
+    logger.info(f"Startup profile ({os.path.basename(sys.argv[0]) or 'python'}): " + " | ".join(parts))
@@ -0,0 +1,104 @@
+"""
+In-memory stand-in for the Gmail API service, for offline benchmarks.
+
+Mimics the parts of the googleapiclient resource chain GmailTools uses
+(users().messages().send/list/get(...).execute() and users().getProfile()),
+sleeping for a configurable latency instead of calling Google. Enable it
+with GMAIL_BACKEND=fake; FAKE_GMAIL_LATENCY sets the per-call delay.
+"""
+
+import base64
+import itertools
+import os
+import threading
+import time
+from email import message_from_bytes
+
+
+class _Request:
+    """What .execute() runs: the latency, then the canned result"""
+
+    def __init__(self, latency, produce):
+        self._latency = latency
+        self._produce = produce
+
+    def execute(self):
+        if self._latency > 0:
+            time.sleep(self._latency)
+        return self._produce()
+
+
+class _Messages:
+    def __init__(self, backend):
+        self._backend = backend
+
+    def send(self, userId, body):
+        return _Request(self._backend.latency, lambda: self._backend.store(body))
+
+    def list(self, userId, q="", maxResults=10):
+        return _Request(self._backend.latency, lambda: {
+            "messages": [{"id": m["id"], "threadId": m["threadId"]}
+                         for m in self._backend.messages(maxResults)]
+        })
+
+    def get(self, userId, id):
+        return _Request(self._backend.latency, lambda: self._backend.message(id))
+
+
+class _Users:
+    def __init__(self, backend):
+        self._backend = backend
+
+    def messages(self):
+        return _Messages(self._backend)
+
+    def getProfile(self, userId):
+        return _Request(self._backend.latency, lambda: {"emailAddress": self._backend.email_address})
+
+
+class FakeGmailService:
+    """Drop-in for build("gmail", "v1", ...) that keeps sent mail in memory"""
+
+    def __init__(self, latency=None, email_address="bench@example.com", max_kept=1000):
+        """
+        Args:
+            latency: Seconds each API call takes (FAKE_GMAIL_LATENCY, default 0.2)
+            email_address: Address reported by getProfile
+            max_kept: Sent messages kept for list/get
+        """
+        self.latency = latency if latency is not None else float(os.getenv("FAKE_GMAIL_LATENCY", "0.2"))
+        self.email_address = email_address
+        self.max_kept = max_kept
+        self._sent = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def users(self):
+        return _Users(self)
+
+    def store(self, body):
+        raw = base64.urlsafe_b64decode(body["raw"])
+        headers = message_from_bytes(raw)
+        with self._lock:
+            message_id = f"fake-{next(self._ids):08d}"
+            message = {
+                "id": message_id,
+                "threadId": message_id,
+                "labelIds": ["SENT"],
+                "payload": {"headers": [{"name": k, "value": v} for k, v in headers.items()]},
+                "sizeEstimate": len(raw),
+            }
+            self._sent.append(message)
+            del self._sent[:-self.max_kept]
+        return {"id": message_id, "threadId": message_id, "labelIds": ["SENT"]}
+
+    def messages(self, limit):
+        with self._lock:
+            return list(reversed(self._sent[-limit:]))
+
+    def message(self, message_id):
+        with self._lock:
+            for message in self._sent:
+                if message["id"] == message_id:
+                    return message
+        raise KeyError(f"Unknown message id: {message_id}")
@@ -1,29 +1,62 @@
-from googleapiclient.discovery import build
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
 import base64
 from email.mime.text import MIMEText
 import os
 import logging
-from google_auth_oauthlib.flow import InstalledAppFlow
+import threading
+from typing import List, Optional
+
+from .registry import tool
 
 SCOPES = ["https://www.googleapis.com/auth/gmail.send",
           "https://www.googleapis.com/auth/gmail.readonly"]
 logger = logging.getLogger(__name__)
 
 class GmailTools:
-    def __init__(self, credentials_path=None):
-        creds_path = credentials_path or os.path.join(os.path.dirname(__file__), "../../credentials/credentials.json")
-        token_path = os.path.join(os.path.dirname(__file__), "../../token.json")
-        self.service = self._build_service(creds_path, token_path)
+    def __init__(self, credentials_path=None, service=None):
+        # Set by _build_service; None means `service` handles its own connections
+        self._credentials = None
+        self._local = threading.local()
+        # `service` replaces the real Gmail API client (e.g. FakeGmailService in benchmarks)
+        self._service = service
+        self._creds_path = credentials_path or os.path.join(os.path.dirname(__file__), "../../credentials/credentials.json")
+        self._token_path = os.path.join(os.path.dirname(__file__), "../../token.json")
+        self._email = None
+        # Credentials and discovery are loaded on first use, once, by whichever
+        # thread (a tool call or warm_up) gets there first
+        self._init_lock = threading.Lock()
+
+    @property
+    def service(self):
+        """The Gmail API service, authenticated and built on first use"""
+        if self._service is None:
+            with self._init_lock:
+                if self._service is None:
+                    self._service = self._build_service(self._creds_path, self._token_path)
+        return self._service
 
     def get_authenticated_email(self):
-        """Return the Gmail account used by this MCP server"""
-        profile = self.service.users().getProfile(userId="me").execute()
-        return profile.get("emailAddress")
+        """Return the Gmail account used by this MCP server (looked up once)"""
+        if self._email is None:
+            profile = self._execute(self.service.users().getProfile(userId="me"))
+            self._email = profile.get("emailAddress")
+        return self._email
+
+    def warm_up(self):
+        """Load credentials, build the service and look up the account ahead of the first tool call"""
+        try:
+            email = self.get_authenticated_email()
+            logger.info(f"✅ MCP Server Gmail account: {email}")
+        except Exception as e:
+            logger.warning(f"Could not retrieve Gmail account: {e}")
 
     def _build_service(self, creds_path: str, token_path: str):
         """Authenticate with Gmail and return a Gmail API service."""
+        # Google client libraries are only needed for the real backend
+        from googleapiclient.discovery import build
+        from google.auth.transport.requests import Request
+        from google.oauth2.credentials import Credentials
+        from google_auth_oauthlib.flow import InstalledAppFlow
+
         creds = None
 
         # Load previously saved access/refresh tokens
@@ -42,9 +75,29 @@ class GmailTools:
                 token.write(creds.to_json())
 
         logger.info("✅ Gmail credentials loaded successfully")
+        self._credentials = creds
         return build("gmail", "v1", credentials=creds)
+
+    def _execute(self, request):
+        """Run an API request on this thread's own connection (httplib2 isn't thread-safe)"""
+        if self._credentials is None:
+            return request.execute()
+        http = getattr(self._local, "http", None)
+        if http is None:
+            import google_auth_httplib2
+            import httplib2
+            http = self._local.http = google_auth_httplib2.AuthorizedHttp(self._credentials, http=httplib2.Http())
+        return request.execute(http=http)
     
-    def send_email(self, to, subject, body, cc=None):
+    @tool(description="Send an email via Gmail to specified recipients")
+    def send_email(self, to: str, subject: str, body: str, cc: Optional[List[str]] = None):
+        """
+        Args:
+            to: Recipient email address
+            subject: Email subject line
+            body: Email body content (plain text or HTML)
+            cc: CC recipients (optional)
+        """
         message = MIMEText(body)
         message['to'] = to
         message['subject'] = subject
@@ -52,18 +105,18 @@ class GmailTools:
             message['cc'] = ', '.join(cc)
         
         raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
-        return self.service.users().messages().send(
+        return self._execute(self.service.users().messages().send(
             userId='me', body={'raw': raw_message}
-        ).execute()
+        ))
     
     def list_messages(self, query="", max_results=10):
-        results = self.service.users().messages().list(
+        results = self._execute(self.service.users().messages().list(
             userId='me', q=query, maxResults=max_results
-        ).execute()
+        ))
         return results.get('messages', [])
     
     def get_message(self, message_id):
-        return self.service.users().messages().get(
+        return self._execute(self.service.users().messages().get(
             userId='me', id=message_id
-        ).execute()
+        ))
 
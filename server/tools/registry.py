@@ -0,0 +1,235 @@
+"""
+Declarative tool registry for the MCP server.
+
+Tools are plain methods marked with @tool. The decorator reads the
+method's signature once, at class definition:
+
+- the JSON schema comes from the type hints (str, int, float, bool, list[X],
+  dict, Optional[X], Literal[...]); parameters without a default are
+  required, and descriptions come from the docstring's Args section;
+- a validator is compiled from the same hints, one check per parameter.
+
+MCPServer registers the tools of an object with register_methods() and
+calls resolve() before running a tool, so a malformed call is rejected with
+INVALID_PARAMS without touching Gmail:
+
+    class GmailTools:
+        @tool(description="Send an email via Gmail to specified recipients")
+        def send_email(self, to: str, subject: str, body: str, cc: Optional[List[str]] = None):
+            ...
+"""
+
+import inspect
+import re
+import types
+import typing
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# JSON-RPC error code for a call whose arguments don't fit the tool
+INVALID_PARAMS = -32602
+
+
+class InvalidParams(ValueError):
+    """A tools/call the server refuses before running it"""
+
+    code = INVALID_PARAMS
+
+
+_PRIMITIVES = {
+    str: ("string", lambda value: isinstance(value, str)),
+    # JSON has no separate bool type to exclude, Python does
+    int: ("integer", lambda value: isinstance(value, int) and not isinstance(value, bool)),
+    float: ("number", lambda value: isinstance(value, (int, float)) and not isinstance(value, bool)),
+    bool: ("boolean", lambda value: isinstance(value, bool)),
+}
+
+
+def _compile(hint: Any) -> Tuple[Dict[str, Any], Callable[[Any], bool]]:
+    """JSON schema and check function for one type hint"""
+    if hint in _PRIMITIVES:
+        json_type, check = _PRIMITIVES[hint]
+        return {"type": json_type}, check
+
+    origin = typing.get_origin(hint)
+    args = typing.get_args(hint)
+
+    if origin in (typing.Union, types.UnionType):
+        options = [arg for arg in args if arg is not type(None)]
+        if len(options) != 1:
+            raise TypeError(f"Unsupported union for a tool parameter: {hint}")
+        # Optional[X]: null is accepted, the schema is X's
+        schema, check = _compile(options[0])
+        return schema, lambda value: value is None or check(value)
+
+    if hint is list or origin is list:
+        if not args:
+            return {"type": "array"}, lambda value: isinstance(value, list)
+        items, check_item = _compile(args[0])
+        return (
+            {"type": "array", "items": items},
+            lambda value: isinstance(value, list) and all(check_item(item) for item in value),
+        )
+
+    if hint is dict or origin is dict:
+        return {"type": "object"}, lambda value: isinstance(value, dict)
+
+    if origin is typing.Literal:
+        allowed = frozenset(args)
+        return {"enum": list(args)}, lambda value: not isinstance(value, (list, dict)) and value in allowed
+
+    raise TypeError(f"Unsupported type for a tool parameter: {hint}")
+
+
+def _docstring_parts(function: Callable) -> Tuple[str, Dict[str, str]]:
+    """Summary paragraph and Args descriptions of a Google-style docstring"""
+    doc = inspect.getdoc(function) or ""
+    summary = "" if doc.startswith("Args:") else doc.split("\n\n", 1)[0]
+    descriptions = {}
+    match = re.search(r"^Args:\n((?:[ \t]+.*\n?|\n)*)", doc, re.MULTILINE)
+    if match:
+        name = None
+        for line in match.group(1).splitlines():
+            entry = re.match(r"^\s{2,4}(\w+)(?:\s*\([^)]*\))?:\s*(.*)$", line)
+            if entry:
+                name = entry.group(1)
+                descriptions[name] = entry.group(2).strip()
+            elif name and line.strip():
+                descriptions[name] += " " + line.strip()
+    return " ".join(summary.split()), descriptions
+
+
+class ToolSpec:
+    """A tool's schema and compiled argument validator"""
+
+    __slots__ = ("name", "description", "parameters", "_checks", "_required", "_allowed")
+
+    def __init__(self, function: Callable, name: Optional[str] = None, description: Optional[str] = None):
+        """
+        Args:
+            function: The tool method (self is skipped)
+            name: Tool name (default: the function's name)
+            description: Tool description (default: the docstring's summary)
+        """
+        summary, descriptions = _docstring_parts(function)
+        hints = typing.get_type_hints(function)
+        self.name = name or function.__name__
+        self.description = description or summary
+
+        properties = {}
+        required = []
+        self._checks = []
+        for parameter in inspect.signature(function).parameters.values():
+            if parameter.name == "self" or parameter.kind in (parameter.VAR_POSITIONAL, parameter.VAR_KEYWORD):
+                continue
+            if parameter.name not in hints:
+                raise TypeError(f"Tool {self.name}: parameter {parameter.name} needs a type hint")
+            schema, check = _compile(hints[parameter.name])
+            if parameter.name in descriptions:
+                schema["description"] = descriptions[parameter.name]
+            properties[parameter.name] = schema
+            self._checks.append((parameter.name, schema, check))
+            if parameter.default is inspect.Parameter.empty:
+                required.append(parameter.name)
+
+        self.parameters = {"type": "object", "properties": properties, "required": required}
+        self._required = tuple(required)
+        self._allowed = frozenset(properties)
+
+    def schema(self) -> Dict[str, Any]:
+        """The tools/list entry"""
+        # "parameters" is what the host converts for OpenAI; "inputSchema"
+        # is the MCP spec field ClientSession validates against
+        return {
+            "name": self.name,
+            "description": self.description,
+            "parameters": self.parameters,
+            "inputSchema": self.parameters,
+        }
+
+    def validate(self, arguments: Any) -> None:
+        """
+        Check a call's arguments against the tool's signature
+
+        Raises:
+            InvalidParams: Listing every problem found
+        """
+        if not isinstance(arguments, dict):
+            raise InvalidParams(f"Arguments for {self.name} must be an object")
+        problems = [f"missing required argument '{name}'" for name in self._required if name not in arguments]
+        problems += [f"unexpected argument '{name}'" for name in arguments if name not in self._allowed]
+        for name, schema, check in self._checks:
+            if name in arguments and not check(arguments[name]):
+                expected = schema.get("type") or f"one of {schema.get('enum')}"
+                if schema.get("items"):
+                    expected += f" of {schema['items'].get('type')}"
+                problems.append(f"'{name}' must be {expected}")
+        if problems:
+            raise InvalidParams(f"Invalid arguments for {self.name}: " + "; ".join(problems))
+
+
+def tool(name: Optional[str] = None, description: Optional[str] = None):
+    """
+    Mark a method as an MCP tool; its schema and validator are built now, once
+
+    Works bare (@tool) or with arguments (@tool(description=...)).
+
+    Args:
+        name: Tool name (default: the method's name)
+        description: Tool description (default: the docstring's summary)
+    """
+    if callable(name):
+        # Bare @tool: the decorated function came in as `name`
+        function = name
+        function.__mcp_tool__ = ToolSpec(function, None, description)
+        return function
+    if name is not None and not isinstance(name, str):
+        raise TypeError(f"Tool name must be a string, not {type(name).__name__}")
+
+    def decorate(function):
+        function.__mcp_tool__ = ToolSpec(function, name, description)
+        return function
+    return decorate
+
+
+class ToolRegistry:
+    """The tools one MCP server exposes, by name"""
+
+    def __init__(self):
+        self._tools: Dict[str, Tuple[ToolSpec, Callable]] = {}
+
+    def register(self, function: Callable, spec: Optional[ToolSpec] = None) -> None:
+        """Expose a callable (its @tool spec is used unless one is given)"""
+        spec = spec or getattr(function, "__mcp_tool__", None) or ToolSpec(function)
+        if spec.name in self._tools:
+            raise ValueError(f"Tool {spec.name} is already registered")
+        self._tools[spec.name] = (spec, function)
+
+    def register_methods(self, obj: Any) -> None:
+        """Expose every @tool method of obj, bound to it"""
+        for attribute in dir(type(obj)):
+            spec = getattr(getattr(type(obj), attribute), "__mcp_tool__", None)
+            if spec is not None:
+                self.register(getattr(obj, attribute), spec)
+
+    def schemas(self) -> List[Dict[str, Any]]:
+        """The tools/list entries"""
+        return [spec.schema() for spec, _ in self._tools.values()]
+
+    def resolve(self, name: Any, arguments: Any) -> Callable:
+        """
+        The function to run for a tools/call, after validating its arguments
+
+        Raises:
+            InvalidParams: For an unknown tool or arguments that don't fit it
+        """
+        if not isinstance(name, str) or name not in self._tools:
+            raise InvalidParams(f"Unknown tool: {name}")
+        spec, function = self._tools[name]
+        spec.validate(arguments)
+        return function
+
+    def __len__(self) -> int:
+        return len(self._tools)
+
+    def __contains__(self, name: Any) -> bool:
+        return name in self._tools
@@ -0,0 +1,266 @@
+"""
+Minimal span tracing shared by the host and the MCP server.
+
+A trace ID is created per chat request (or continued from an incoming W3C
+`traceparent`) and carried to the MCP server in the JSON-RPC
+`params._meta.traceparent` of each tools/call. Both processes record spans
+with the same trace ID, so one request's critical path (LLM calls, MCP
+round trips, the Gmail request itself) can be reconstructed from the
+exported spans.
+
+Exporters (TRACE_EXPORTER):
+    none  - IDs are still generated and propagated (default)
+    file  - one JSON span per line appended to TRACE_FILE (traces.jsonl)
+    otlp  - OTLP/HTTP JSON batches POSTed to TRACE_OTLP_ENDPOINT
+            (default http://localhost:4318/v1/traces)
+
+The module has no dependencies, so the server can use it as `tracing` and
+the host as `server.tracing`.
+"""
+
+import atexit
+import contextvars
+import functools
+import json
+import logging
+import os
+import queue
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+
+class Span:
+    """One timed operation within a trace"""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None, **attributes):
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes
+        self.error = None
+
+    @property
+    def traceparent(self) -> str:
+        """W3C trace context header value naming this span as the parent"""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "service": service_name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class FileExporter:
+    """Appends finished spans as JSON lines"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self._lock, open(self.path, "a") as f:
+            f.write(line)
+
+
+class OTLPExporter:
+    """Batches spans and POSTs them as OTLP/HTTP JSON from a background thread"""
+
+    def __init__(self, endpoint: str, batch_size: int = 256, interval: float = 1.0):
+        self.endpoint = endpoint
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue = queue.Queue(maxsize=10000)
+        self._thread = threading.Thread(target=self._run, name="otlp-exporter", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def export(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            pass  # Never block a request on telemetry
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+    def flush(self) -> None:
+        while not self._queue.empty():
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if batch:
+                self._post(batch)
+
+    def _post(self, spans) -> None:
+        import urllib.request  # only the OTLP exporter needs it; kept off the startup path
+
+        body = json.dumps({
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", service_name)]},
+                "scopeSpans": [{"scope": {"name": "mailmind"}, "spans": [_otlp_span(span) for span in spans]}],
+            }]
+        }).encode()
+        request = urllib.request.Request(
+            self.endpoint, data=body, headers={"Content-Type": "application/json"}, method="POST"
+        )
+        try:
+            urllib.request.urlopen(request, timeout=5).close()
+        except Exception as e:
+            logger.warning(f"Dropped {len(spans)} spans, OTLP export failed: {e}")
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def _otlp_span(span: Span) -> Dict[str, Any]:
+    data = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": 1,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": [_otlp_attribute(key, value) for key, value in span.attributes.items()],
+        # STATUS_CODE_ERROR = 2, STATUS_CODE_UNSET = 0
+        "status": {"code": 2, "message": span.error} if span.error else {"code": 0},
+    }
+    if span.parent_id:
+        data["parentSpanId"] = span.parent_id
+    return data
+
+
+def _create_exporter():
+    kind = os.getenv("TRACE_EXPORTER", "none").lower()
+    if kind == "file":
+        return FileExporter(os.getenv("TRACE_FILE", "traces.jsonl"))
+    if kind == "otlp":
+        return OTLPExporter(os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces"))
+    return None
+
+
+# Reported with every span; the MCP server overrides it at startup
+service_name = os.getenv("TRACE_SERVICE_NAME", "mailmind-host")
+exporter = _create_exporter()
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current.get()
+    return span.trace_id if span else None
+
+
+def new_trace_id() -> str:
+    return secrets.token_hex(16)
+
+
+def parse_traceparent(value: Optional[str]):
+    """(trace_id, parent_span_id) from a W3C traceparent, or (None, None)"""
+    match = TRACEPARENT_RE.match((value or "").strip().lower())
+    if not match:
+        return None, None
+    return match.group(1), match.group(2)
+
+
+@contextmanager
+def span(name: str, traceparent: Optional[str] = None, trace_id: Optional[str] = None, **attributes):
+    """
+    Time `name` as a child of the current span.
+
+    With a valid `traceparent` (from _meta or an HTTP header) the span
+    continues that trace instead. With neither, it starts a new trace, under
+    `trace_id` if given.
+    """
+    parent = _current.get()
+    remote_trace_id, parent_id = parse_traceparent(traceparent)
+    if remote_trace_id is not None:
+        trace_id = remote_trace_id
+    elif parent is not None:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    else:
+        trace_id = trace_id or new_trace_id()
+
+    current = Span(name, trace_id, parent_id, **attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except GeneratorExit:
+        raise
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        try:
+            _current.reset(token)
+        except ValueError:
+            # Closed from another context (e.g. a generator finalized elsewhere)
+            pass
+        current.end_ns = time.time_ns()
+        if exporter is not None:
+            try:
+                exporter.export(current)
+            except Exception as e:
+                logger.debug(f"Span export failed: {e}")
+
+
+def propagate(fn: Callable) -> Callable:
+    """Bind fn to the current span so it parents spans when run on another thread"""
+    parent = _current.get()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = _current.set(parent)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+
+    return wrapper
+
+
+def trace_meta() -> Dict[str, str]:
+    """JSON-RPC params._meta entries carrying the current trace, if any"""
+    span = _current.get()
+    return {"traceparent": span.traceparent} if span else {}
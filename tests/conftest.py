@@ -0,0 +1,74 @@
+"""
+Shared fixtures.
+
+Host modules import each other as siblings (as host/app.py does when run as
+a script), so host/ goes on sys.path along with the repo root. The MCP
+server always runs as its own process, against the in-memory Gmail backend.
+"""
+
+import os
+import queue
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from mcp.shared.json_codec import codec
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_SCRIPT = os.path.join(REPO_ROOT, 'server', 'mcp_server.py')
+
+sys.path.insert(0, os.path.join(REPO_ROOT, 'host'))
+
+
+@pytest.fixture
+def server_env(monkeypatch):
+    """Environment for MCP server children: fake Gmail with a fixed per-call latency"""
+    monkeypatch.setenv('GMAIL_BACKEND', 'fake')
+    monkeypatch.setenv('FAKE_GMAIL_LATENCY', '0.3')
+    monkeypatch.setenv('GMAIL_WARM_UP', 'False')
+    return os.environ
+
+
+@pytest.fixture
+def server_command():
+    return [sys.executable, SERVER_SCRIPT]
+
+
+class RawServer:
+    """An MCP server child spoken to line by line, without the host's client"""
+
+    def __init__(self, command):
+        self.proc = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                     stderr=subprocess.DEVNULL)
+        self._lines = queue.Queue()
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        for line in self.proc.stdout:
+            if line.strip():
+                self._lines.put(codec.loads(line))
+
+    def send(self, message):
+        self.proc.stdin.write(codec.dumps(message) + b'\n')
+        self.proc.stdin.flush()
+
+    def receive(self, timeout=10):
+        return self._lines.get(timeout=timeout)
+
+    def close(self):
+        self.proc.stdin.close()
+        try:
+            self.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+
+@pytest.fixture
+def raw_server(server_env, server_command):
+    server = RawServer(server_command)
+    server.send({"jsonrpc": "2.0", "id": 0, "method": "initialize", "params": {}})
+    assert server.receive()["id"] == 0
+    yield server
+    server.close()
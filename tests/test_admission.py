@@ -0,0 +1,77 @@
+"""Admission control: per-session rate, global cap, bounded wait queue"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from admission import QUEUE_FULL, RATE, TIMEOUT, Admission, AdmissionRejected, AsyncAdmission
+
+
+def test_session_rate_sheds_beyond_burst():
+    admission = Admission(max_concurrent=0, rate=1, burst=2)
+    admission.acquire('s').release()
+    admission.acquire('s').release()
+    with pytest.raises(AdmissionRejected) as shed:
+        admission.acquire('s')
+    assert shed.value.reason == RATE
+    assert shed.value.retry_after >= 1
+    # Other sessions have their own bucket
+    admission.acquire('other').release()
+
+
+def test_full_queue_is_shed_immediately():
+    admission = Admission(max_concurrent=1, queue_size=0, rate=0)
+    ticket = admission.acquire('a')
+    with pytest.raises(AdmissionRejected) as shed:
+        admission.acquire('b')
+    assert shed.value.reason == QUEUE_FULL
+    ticket.release()
+    admission.acquire('b').release()
+    assert admission.stats()['shed'][QUEUE_FULL] == 1
+
+
+def test_queued_turn_gets_the_released_slot():
+    admission = Admission(max_concurrent=1, queue_size=1, timeout=5, rate=0)
+    ticket = admission.acquire('a')
+    threading.Timer(0.1, ticket.release).start()
+    started = time.monotonic()
+    with admission.acquire('b'):
+        assert admission.stats()['active'] == 1
+    assert 0.05 < time.monotonic() - started < 2
+
+
+def test_queued_turn_times_out():
+    admission = Admission(max_concurrent=1, queue_size=1, timeout=0.1, rate=0)
+    ticket = admission.acquire('a')
+    with pytest.raises(AdmissionRejected) as shed:
+        admission.acquire('b')
+    assert shed.value.reason == TIMEOUT
+    assert admission.stats()['waiting'] == 0
+    ticket.release()
+
+
+def test_release_is_idempotent():
+    admission = Admission(max_concurrent=2, rate=0)
+    ticket = admission.acquire('a')
+    ticket.release()
+    ticket.release()
+    assert admission.stats()['active'] == 0
+
+
+def test_async_admission_queues_and_times_out():
+    async def scenario():
+        admission = AsyncAdmission(max_concurrent=1, queue_size=1, timeout=0.1, rate=0)
+        ticket = await admission.acquire('a')
+        with pytest.raises(AdmissionRejected) as shed:
+            await admission.acquire('b')
+        assert shed.value.reason == TIMEOUT
+
+        asyncio.get_running_loop().call_later(0.05, ticket.release)
+        admission.timeout = 5
+        with await admission.acquire('b'):
+            assert admission.stats()['active'] == 1
+        assert admission.stats()['active'] == 0
+
+    asyncio.run(scenario())
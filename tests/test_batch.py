@@ -0,0 +1,98 @@
+"""Batch chat: parsing, isolation of failing items and shed retries"""
+
+import asyncio
+import time
+
+import pytest
+
+from admission import AdmissionRejected
+from batch import arun_batch, parse_items, retry_shed, run_batch
+
+BATCH = '\n'.join([
+    '{"id": 1, "session": "a", "message": "first"}',
+    '{"id": 2, "session": "a", "message": "boom"}',
+    'not json',
+    '{"id": 4, "message": ""}',
+    '{"id": 5, "session": "a", "message": "after the failure"}',
+    '{"id": 6, "session": "b", "message": "other session"}',
+    '[1, 2]',
+])
+
+
+def handle(item):
+    if item.message == 'boom':
+        raise RuntimeError('model unavailable')
+    return f're: {item.message}'
+
+
+def by_id(results):
+    return {result['id'] if result['id'] is not None else f"line {result['index']}": result for result in results}
+
+
+def check(results):
+    results = by_id(results)
+    assert len(results) == 7
+    assert results[1]['response'] == 're: first'
+    assert results[2] == {**results[2], 'success': False, 'error': 'model unavailable'}
+    # The failure doesn't stop later turns of its session or other sessions
+    assert results[5]['response'] == 're: after the failure'
+    assert results[6]['response'] == 're: other session'
+    assert results['line 2']['error'].startswith('Invalid JSON')
+    assert results[4]['error'] == "Item needs a non-empty 'message'"
+    assert results['line 6']['error'] == 'Item must be a JSON object'
+
+
+def test_failing_items_do_not_affect_the_others():
+    check(list(run_batch(parse_items(BATCH), handle, concurrency=2)))
+
+
+def test_async_failing_items_do_not_affect_the_others():
+    async def ahandle(item):
+        return handle(item)
+
+    async def collect():
+        return [result async for result in arun_batch(parse_items(BATCH), ahandle, concurrency=2)]
+
+    check(asyncio.run(collect()))
+
+
+def test_turns_of_one_session_run_in_file_order():
+    seen = []
+
+    def record(item):
+        time.sleep(0.05 if item.message == '1' else 0)
+        seen.append(item.message)
+        return item.message
+
+    text = '\n'.join(f'{{"session": "s", "message": "{n}"}}' for n in range(1, 4))
+    list(run_batch(parse_items(text), record, concurrency=4))
+    assert seen == ['1', '2', '3']
+
+
+def test_batch_size_limits():
+    with pytest.raises(ValueError, match='empty'):
+        parse_items('\n  \n')
+    with pytest.raises(ValueError, match='limit is 2'):
+        parse_items('{"message": "a"}\n{"message": "b"}\n{"message": "c"}', max_items=2)
+
+
+def test_shed_turns_are_retried_until_the_wait_runs_out():
+    attempts = []
+
+    def shed_once():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise AdmissionRejected('queue_full', 1)
+        return 'ok'
+
+    assert retry_shed(shed_once, max_wait=5) == 'ok'
+    assert attempts[1] - attempts[0] >= 1
+
+    def always_shed():
+        raise AdmissionRejected('queue_full', 1)
+
+    # A Retry-After past the remaining wait gives up at once
+    started = time.monotonic()
+    with pytest.raises(AdmissionRejected):
+        retry_shed(always_shed, max_wait=0.5)
+    assert time.monotonic() - started < 0.5
@@ -0,0 +1,86 @@
+"""Eviction and reads in the in-memory and SQLite conversation stores"""
+
+import time
+
+import pytest
+
+from conversation_store import ConversationStore, message_size
+from sqlite_store import SQLiteConversationStore
+
+
+def turn(text):
+    return {"role": "user", "content": text}, {"role": "assistant", "content": f"re: {text}"}
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_store(request, tmp_path):
+    def make(**limits):
+        if request.param == 'memory':
+            return ConversationStore(**limits)
+        # Every read refreshes last_access, as in the in-memory store
+        return SQLiteConversationStore(path=str(tmp_path / 'conversations.db'), sweep_interval=0.001,
+                                       touch_interval=0, **limits)
+    return make
+
+
+def test_least_recently_used_session_is_evicted(make_store):
+    store = make_store(max_sessions=2)
+    store.append('a', *turn('1'))
+    store.append('b', *turn('2'))
+    time.sleep(0.01)
+    store.get('a')
+    time.sleep(0.01)
+    store.append('c', *turn('3'))
+
+    assert 'a' in store and 'c' in store
+    assert 'b' not in store
+    assert store.stats()['evictions']['lru'] == 1
+
+
+def test_idle_sessions_expire(make_store):
+    store = make_store(idle_ttl=0.05)
+    store.append('a', *turn('1'))
+    time.sleep(0.1)
+    assert store.get('a') == []
+    assert store.stats()['evictions']['ttl'] == 1
+
+
+def test_byte_budget_evicts_oldest_but_never_the_newest(make_store):
+    size = sum(message_size(message) for message in turn('x' * 100))
+    store = make_store(max_bytes=int(size * 2.5))
+    for session in ('a', 'b', 'c'):
+        store.append(session, *turn('x' * 100))
+        time.sleep(0.01)
+
+    assert 'a' not in store
+    assert 'b' in store and 'c' in store
+    assert store.stats()['evictions']['bytes'] == 1
+
+
+def test_token_budget_keeps_recent_history_from_a_user_message(make_store):
+    store = make_store()
+    for text in ('one', 'two', 'three'):
+        store.append('a', *turn(text))
+    assert len(store.get('a')) == 6
+
+    recent = store.get('a', max_tokens=25)
+    assert recent and recent[0]['role'] == 'user'
+    assert recent[-1] == {"role": "assistant", "content": "re: three"}
+    assert len(recent) < 6
+
+
+def test_sqlite_reads_refresh_last_access_only_past_the_interval(tmp_path):
+    store = SQLiteConversationStore(path=str(tmp_path / 'conversations.db'), touch_interval=60)
+    store.append('a', *turn('1'))
+
+    def last_access():
+        return store._connection().execute("SELECT last_access FROM sessions WHERE id = 'a'").fetchone()[0]
+
+    before = last_access()
+    store.get('a')
+    assert last_access() == before
+
+    store.touch_interval = 0
+    time.sleep(0.01)
+    store.get('a')
+    assert last_access() > before
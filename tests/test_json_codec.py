@@ -0,0 +1,66 @@
+"""The orjson and stdlib JSON codecs agree on every MCP message"""
+
+import pytest
+
+from mcp.shared.json_codec import OrjsonCodec, StdlibCodec, select
+from mcp.types import JSONRPCMessage
+
+pytest.importorskip("orjson")
+
+MESSAGES = [
+    {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}},
+    {"jsonrpc": "2.0", "method": "notifications/tools/list_changed"},
+    {
+        "jsonrpc": "2.0",
+        "id": "req-7",
+        "method": "tools/call",
+        "params": {
+            "name": "send_email",
+            "arguments": {"to": "zoë@example.com", "subject": "Grüße ✉", "body": "line 1\nline \"2\"\t\u0000"},
+            "_meta": {"traceparent": "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"},
+        },
+    },
+    {
+        "jsonrpc": "2.0",
+        "id": 2,
+        "result": {
+            "content": [{"type": "text", "text": "x" * 100_000}],
+            "structuredContent": {"id": "18c2", "labelIds": ["SENT"], "size": 12.5, "ok": True, "thread": None},
+            "isError": False,
+        },
+    },
+    {"jsonrpc": "2.0", "id": 3, "error": {"code": -32602, "message": "Unknown tool: nope"}},
+    [{"jsonrpc": "2.0", "id": 4, "method": "ping"}, {"jsonrpc": "2.0", "id": 5, "result": {}}],
+]
+
+CODECS = [StdlibCodec(), OrjsonCodec()]
+
+
+@pytest.mark.parametrize("message", MESSAGES)
+def test_codecs_round_trip_the_same_values(message):
+    for writer in CODECS:
+        data = writer.dumps(message)
+        assert isinstance(data, bytes) and b"\n" not in data
+        for reader in CODECS:
+            assert reader.loads(data) == message
+            assert reader.loads(data.decode()) == message
+
+
+def test_int_keys_become_strings_in_both():
+    assert [codec.loads(codec.dumps({1: "a"})) for codec in CODECS] == [{"1": "a"}, {"1": "a"}]
+
+
+@pytest.mark.parametrize("message", [message for message in MESSAGES if isinstance(message, dict)])
+def test_sdk_messages_encode_and_decode_alike(message):
+    decoded = [codec.decode_message(JSONRPCMessage, codec.dumps(message)) for codec in CODECS]
+    assert decoded[0] == decoded[1]
+    encoded = [codec.loads(codec.encode_message(decoded[0])) for codec in CODECS]
+    assert encoded[0] == encoded[1]
+
+
+def test_select():
+    assert select("json").name == "json"
+    assert select("ORJSON").name == "orjson"
+    assert select("auto").name == "orjson"
+    with pytest.raises(ValueError):
+        select("yaml")
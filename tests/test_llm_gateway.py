@@ -0,0 +1,88 @@
+"""Hedged requests in the OpenAI gateway"""
+
+import asyncio
+import threading
+
+from mcp.client.llm_gateway import LLMGateway
+
+
+class Result:
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def gateway():
+    return LLMGateway(api_key="sk-test", hedge=True, hedge_delay=0.05, hedge_min_samples=1000)
+
+
+def test_async_hedge_fires_after_the_delay_and_cancels_the_slow_attempt():
+    llm = gateway()
+    attempts = []
+    cancelled = []
+
+    async def attempt(kwargs, timeout):
+        attempts.append(asyncio.get_running_loop().time())
+        if len(attempts) == 1:
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+            return Result("slow")
+        return Result("hedge")
+
+    llm._aattempt = attempt
+    result = asyncio.run(llm.acomplete(deadline=10, model="m", messages=[]))
+    assert result.name == "hedge"
+    assert attempts[1] - attempts[0] >= 0.04
+    assert cancelled == [True]
+    stats = llm.stats()
+    assert (stats["requests"], stats["hedged"], stats["hedge_wins"]) == (1, 1, 1)
+
+
+def test_sync_hedge_wins_and_the_slow_attempt_is_closed_when_it_returns():
+    llm = gateway()
+    release = threading.Event()
+    slow = Result("slow")
+    calls = []
+
+    def attempt(kwargs, timeout):
+        calls.append(kwargs)
+        if len(calls) == 1:
+            release.wait(5)
+            return slow
+        return Result("hedge")
+
+    llm._attempt = attempt
+    assert llm.complete(deadline=10, model="m", messages=[]).name == "hedge"
+    assert len(calls) == 2 and not slow.closed
+    release.set()
+    llm._executor.shutdown(wait=True)
+    assert slow.closed
+    assert llm.stats()["hedge_wins"] == 1
+
+
+def test_fast_call_is_not_hedged():
+    llm = gateway()
+
+    async def attempt(kwargs, timeout):
+        return Result("only")
+
+    llm._aattempt = attempt
+    assert asyncio.run(llm.acomplete(deadline=10, model="m", messages=[])).name == "only"
+    assert llm.stats()["hedged"] == 0
+
+
+def test_hedge_delay_tracks_stream_and_non_stream_latency_separately():
+    llm = LLMGateway(api_key="sk-test", hedge=True, hedge_delay=2.0, hedge_min_samples=20)
+    llm._latencies[False].extend([1.0] * 19 + [3.0])
+    assert llm.hedge_delay() == 3.0
+    # Too few stream samples yet: the configured delay applies
+    llm._latencies[True].extend([0.2] * 5)
+    assert llm.hedge_delay(stream=True) == 2.0
+    llm._latencies[True].extend([0.2] * 15)
+    assert llm.hedge_delay(stream=True) == 0.2
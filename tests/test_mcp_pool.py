@@ -0,0 +1,77 @@
+"""MCPProcessPool recovery when a child process dies"""
+
+import threading
+
+import pytest
+
+from mcp_pool import LazyPool, MCPProcessPool
+
+
+@pytest.fixture
+def pool(server_env, server_command):
+    pool = MCPProcessPool(size=1, command=server_command, timeout=10).start()
+    yield pool
+    pool.close()
+
+
+def only_worker(pool):
+    (worker,) = pool._workers
+    return worker
+
+
+def test_dead_idle_child_is_replaced(pool):
+    dead = only_worker(pool)
+    dead.proc.kill()
+    dead.proc.wait()
+
+    assert pool.request('ping') == {}
+    replacement = only_worker(pool)
+    assert replacement.pid != dead.pid
+    assert pool.stats()['processes'] == 1
+
+
+def test_child_dying_mid_request_fails_that_request_only(pool):
+    worker = only_worker(pool)
+    errors = []
+
+    def call():
+        try:
+            pool.request('tools/call', {"name": "send_email",
+                                        "arguments": {"to": "a@example.com", "subject": "s", "body": "b"}})
+        except Exception as e:
+            errors.append(e)
+
+    caller = threading.Thread(target=call)
+    caller.start()
+    # The fake Gmail call takes FAKE_GMAIL_LATENCY; kill the child during it
+    caller.join(0.15)
+    worker.proc.kill()
+    caller.join(10)
+
+    assert len(errors) == 1 and isinstance(errors[0], ConnectionError)
+    result = pool.request('tools/call', {"name": "send_email",
+                                         "arguments": {"to": "a@example.com", "subject": "s", "body": "b"}})
+    assert result['structuredContent']['labelIds'] == ['SENT']
+    assert only_worker(pool).pid != worker.pid
+
+
+def test_request_batch_returns_results_and_errors_in_call_order(pool):
+    results = pool.request_batch([
+        ('tools/call', {"name": "send_email", "arguments": {"to": "a@example.com", "subject": "s", "body": "b"}}),
+        ('tools/call', {"name": "no_such_tool", "arguments": {}}),
+        ('ping', None),
+    ])
+    assert results[0]['structuredContent']['labelIds'] == ['SENT']
+    assert results[1].code == -32602
+    assert results[2] == {}
+
+
+def test_lazy_pool_spawns_nothing_until_used(server_env, server_command):
+    lazy = LazyPool(size=1, command=server_command, timeout=10)
+    assert not lazy.started
+    assert lazy.stats()['processes'] == 0
+    try:
+        assert lazy.request('ping') == {}
+        assert lazy.started and lazy.stats()['processes'] == 1
+    finally:
+        lazy.get().close()
@@ -0,0 +1,83 @@
+"""Concurrent and batch dispatch in server/mcp_server.py, against the fake Gmail backend"""
+
+import time
+
+LATENCY = 0.3
+
+
+def send_email_call(request_id, to="bob@example.com"):
+    return {
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "method": "tools/call",
+        "params": {"name": "send_email", "arguments": {"to": to, "subject": "Hi", "body": "Hello"}},
+    }
+
+
+def test_tools_list_describes_send_email(raw_server):
+    raw_server.send({"jsonrpc": "2.0", "id": 1, "method": "tools/list"})
+    tools = raw_server.receive()["result"]["tools"]
+    send_email = next(tool for tool in tools if tool["name"] == "send_email")
+    assert send_email["inputSchema"]["required"] == ["to", "subject", "body"]
+
+
+def test_tool_calls_run_concurrently(raw_server):
+    started = time.monotonic()
+    for request_id in range(1, 5):
+        raw_server.send(send_email_call(request_id))
+    responses = [raw_server.receive() for _ in range(4)]
+    elapsed = time.monotonic() - started
+
+    assert sorted(response["id"] for response in responses) == [1, 2, 3, 4]
+    assert all(response["result"]["structuredContent"]["labelIds"] == ["SENT"] for response in responses)
+    # Serially this would take 4 x LATENCY
+    assert elapsed < 2.5 * LATENCY
+
+
+def test_fast_request_overtakes_slow_tool_call(raw_server):
+    raw_server.send(send_email_call(1))
+    raw_server.send({"jsonrpc": "2.0", "id": 2, "method": "ping"})
+    assert raw_server.receive()["id"] == 2
+    assert raw_server.receive()["id"] == 1
+
+
+def test_batch_is_answered_in_one_line(raw_server):
+    started = time.monotonic()
+    raw_server.send([
+        send_email_call(1, "a@example.com"),
+        send_email_call(2, "b@example.com"),
+        {"jsonrpc": "2.0", "id": 3, "method": "tools/call",
+         "params": {"name": "send_email", "arguments": {"to": "c@example.com"}}},
+        {"jsonrpc": "2.0", "method": "notifications/initialized"},
+    ])
+    responses = raw_server.receive()
+    elapsed = time.monotonic() - started
+
+    assert isinstance(responses, list)
+    by_id = {response["id"]: response for response in responses}
+    # Notifications get no entry
+    assert sorted(by_id) == [1, 2, 3]
+    assert "result" in by_id[1] and "result" in by_id[2]
+    assert by_id[3]["error"]["code"] == -32602
+    assert elapsed < 2 * LATENCY
+
+
+def test_invalid_batches(raw_server):
+    raw_server.send([])
+    assert raw_server.receive()["error"]["code"] == -32600
+
+    raw_server.send([1])
+    (response,) = raw_server.receive()
+    assert response["error"]["code"] == -32600
+
+
+def test_null_params_are_treated_as_absent(raw_server):
+    raw_server.send({"jsonrpc": "2.0", "id": 1, "method": "tools/list", "params": None})
+    assert "tools" in raw_server.receive()["result"]
+
+
+def test_non_object_params_are_invalid(raw_server):
+    raw_server.send({"jsonrpc": "2.0", "id": 1, "method": "tools/call", "params": ["send_email", {}]})
+    response = raw_server.receive()
+    assert response["id"] == 1
+    assert response["error"]["code"] == -32602
@@ -0,0 +1,75 @@
+"""Metrics registry and its Prometheus text output"""
+
+import json
+
+import pytest
+
+from metrics import STAGE_ERRORS, STAGE_SECONDS, Registry, track
+
+
+def test_counters_gauges_and_labels_render():
+    registry = Registry()
+    calls = registry.counter('calls_total', 'Calls', ['tool', 'outcome'])
+    active = registry.gauge('active', 'Active turns')
+    calls.inc(tool='send_email', outcome='ok')
+    calls.inc(2, tool='send_email', outcome='ok')
+    calls.inc(tool='say "hi"', outcome='error')
+    active.inc()
+    active.inc()
+    active.dec()
+
+    lines = registry.render().splitlines()
+    assert lines[:2] == ['# HELP calls_total Calls', '# TYPE calls_total counter']
+    assert 'calls_total{tool="send_email",outcome="ok"} 3' in lines
+    assert 'calls_total{tool="say \\"hi\\"",outcome="error"} 1' in lines
+    assert '# TYPE active gauge' in lines
+    assert 'active 1' in lines
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = registry.histogram('latency_seconds', 'Latency', ['stage'], buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value, stage='llm')
+
+    lines = registry.render().splitlines()
+    assert '# TYPE latency_seconds histogram' in lines
+    # A value equal to a bound falls in that bucket
+    assert 'latency_seconds_bucket{stage="llm",le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{stage="llm",le="1"} 3' in lines
+    assert 'latency_seconds_bucket{stage="llm",le="+Inf"} 4' in lines
+    assert 'latency_seconds_sum{stage="llm"} 3.65' in lines
+    assert 'latency_seconds_count{stage="llm"} 4' in lines
+
+
+def test_snapshots_of_other_workers_are_summed(tmp_path):
+    registry = Registry(directory=str(tmp_path))
+    calls = registry.counter('calls_total', 'Calls')
+    active = registry.gauge('active', 'Active turns')
+    calls.inc()
+    active.inc()
+
+    # An exited worker: its counters still count, its gauges don't
+    dead_pid = 2 ** 22 + 1
+    with open(tmp_path / f'metrics-{dead_pid}.json', 'w') as f:
+        json.dump({'pid': dead_pid, 'metrics': {'calls_total': [[[], 4.0]], 'active': [[[], 7.0]]}}, f)
+
+    lines = registry.render().splitlines()
+    assert 'calls_total 5' in lines
+    assert 'active 1' in lines
+
+
+def test_track_times_the_stage_and_counts_errors():
+    def count(metric, stage):
+        value = metric._values.get((stage,))
+        return 0 if value is None else (value[-1] if isinstance(value, list) else value)
+
+    timed_before = count(STAGE_SECONDS, 'test_stage')
+    errors_before = count(STAGE_ERRORS, 'test_stage')
+    with track('test_stage'):
+        pass
+    with pytest.raises(ValueError):
+        with track('test_stage'):
+            raise ValueError('boom')
+    assert count(STAGE_SECONDS, 'test_stage') == timed_before + 2
+    assert count(STAGE_ERRORS, 'test_stage') == errors_before + 1
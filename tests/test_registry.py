@@ -0,0 +1,70 @@
+"""@tool schemas and argument validation (server/tools/registry.py)"""
+
+from typing import List, Literal, Optional
+
+import pytest
+
+from server.tools.registry import INVALID_PARAMS, InvalidParams, ToolRegistry, tool
+
+
+class Tools:
+    @tool
+    def archive(self, message_id: str):
+        """Archive a message"""
+        return {"archived": message_id}
+
+    @tool(name="search", description="Search the mailbox")
+    def find(self, query: str, limit: int = 10, labels: Optional[List[str]] = None,
+             order: Literal["newest", "oldest"] = "newest"):
+        """
+        Args:
+            query: Gmail search syntax
+            limit: Max results
+        """
+        return []
+
+
+@pytest.fixture
+def registry():
+    registry = ToolRegistry()
+    registry.register_methods(Tools())
+    return registry
+
+
+def test_bare_and_called_decorators_both_register(registry):
+    assert len(registry) == 2
+    assert "archive" in registry and "search" in registry
+
+
+def test_schema_comes_from_hints_and_docstring(registry):
+    schemas = {schema["name"]: schema for schema in registry.schemas()}
+    assert schemas["archive"]["description"] == "Archive a message"
+    search = schemas["search"]["inputSchema"]
+    assert search["required"] == ["query"]
+    assert search["properties"]["query"] == {"type": "string", "description": "Gmail search syntax"}
+    assert search["properties"]["labels"] == {"type": "array", "items": {"type": "string"}}
+    assert search["properties"]["order"] == {"enum": ["newest", "oldest"]}
+
+
+def test_resolve_returns_the_bound_method(registry):
+    assert registry.resolve("archive", {"message_id": "m1"})(message_id="m1") == {"archived": "m1"}
+
+
+@pytest.mark.parametrize("name, arguments, problem", [
+    ("nope", {}, "Unknown tool"),
+    ("archive", [], "must be an object"),
+    ("archive", {}, "missing required argument 'message_id'"),
+    ("archive", {"message_id": "m1", "extra": 1}, "unexpected argument 'extra'"),
+    ("search", {"query": "x", "limit": True}, "'limit' must be integer"),
+    ("search", {"query": "x", "labels": ["a", 1]}, "'labels' must be array of string"),
+    ("search", {"query": "x", "order": "random"}, "'order' must be one of"),
+])
+def test_bad_calls_are_rejected_with_invalid_params(registry, name, arguments, problem):
+    with pytest.raises(InvalidParams, match=problem) as rejected:
+        registry.resolve(name, arguments)
+    assert rejected.value.code == INVALID_PARAMS
+
+
+def test_non_string_name_is_a_type_error():
+    with pytest.raises(TypeError):
+        tool(42)
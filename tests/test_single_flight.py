@@ -0,0 +1,94 @@
+"""Coalescing of duplicate chat requests"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from single_flight import AsyncSingleFlight, SingleFlight, request_key
+
+
+def test_request_key_prefers_the_request_id():
+    assert request_key('s', 'hi', 'r1') == ('s:id:r1', True)
+    key, keep = request_key('s', 'hi')
+    assert key.startswith('s:') and not keep
+    # Unusable IDs fall back to the message
+    assert request_key('s', 'hi', '') == (key, False)
+    assert request_key('s', 'hi', 'x' * 200) == (key, False)
+
+
+def test_concurrent_duplicates_share_one_execution():
+    flights = SingleFlight()
+    runs = []
+    release = threading.Event()
+
+    def slow():
+        runs.append(1)
+        release.wait(5)
+        return 'reply'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flights.do('k', slow))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(runs) == 1
+    assert sorted(results) == [('reply', False), ('reply', True), ('reply', True)]
+
+
+def test_repeat_after_finish_runs_again_without_request_id():
+    flights = SingleFlight()
+    assert flights.do('k', lambda: 1) == (1, False)
+    assert flights.do('k', lambda: 2) == (2, False)
+
+
+def test_kept_result_answers_a_retry_within_the_window():
+    flights = SingleFlight(window=10)
+    assert flights.do('k', lambda: 1, keep=True) == (1, False)
+    assert flights.do('k', lambda: 2, keep=True) == (1, True)
+
+
+def test_errors_reach_waiters_and_are_not_kept():
+    flights = SingleFlight()
+    call, leader = flights.begin('k')
+    assert leader
+    duplicate, leader = flights.begin('k')
+    assert not leader and duplicate is call
+
+    flights.finish('k', call, error=ValueError('boom'), keep=True)
+    with pytest.raises(ValueError):
+        flights.wait(duplicate)
+    assert flights.begin('k')[1]
+
+
+def test_wait_is_bounded_and_finish_is_idempotent():
+    flights = SingleFlight(wait_timeout=0.05)
+    call, _ = flights.begin('k')
+    with pytest.raises(TimeoutError):
+        flights.wait(call)
+
+    flights.finish('k', call, result='first')
+    flights.finish('k', call, error=RuntimeError('cleanup'))
+    assert flights.wait(call) == 'first'
+
+
+def test_async_duplicates_share_one_execution():
+    async def scenario():
+        flights = AsyncSingleFlight()
+        runs = []
+
+        async def slow():
+            runs.append(1)
+            await asyncio.sleep(0.05)
+            return 'reply'
+
+        results = await asyncio.gather(*(flights.do('k', slow) for _ in range(3)))
+        assert len(runs) == 1
+        assert sorted(results) == [('reply', False), ('reply', True), ('reply', True)]
+
+    asyncio.run(scenario())
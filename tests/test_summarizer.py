@@ -0,0 +1,115 @@
+"""Rolling summarization of long conversations"""
+
+import asyncio
+
+import pytest
+
+from conversation_store import ConversationStore
+from sqlite_store import SQLiteConversationStore
+from summarizer import ConversationSummarizer
+
+
+def turn(text):
+    return {"role": "user", "content": text}, {"role": "assistant", "content": f"re: {text}"}
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return ConversationStore()
+    return SQLiteConversationStore(path=str(tmp_path / 'conversations.db'))
+
+
+def fill(store, session_id, turns):
+    for index in range(turns):
+        store.append(session_id, *turn(f"message number {index} with a few more words"))
+
+
+def test_runner_is_only_called_past_the_trigger_and_once_per_session(store):
+    scheduled = []
+    summarizer = ConversationSummarizer(store, enabled=True, trigger_tokens=60, keep_tokens=30)
+    summarizer.runner = scheduled.append
+    fill(store, 's', 1)
+    summarizer.maybe_schedule('s')
+    assert scheduled == []
+
+    fill(store, 's', 5)
+    summarizer.maybe_schedule('s')
+    summarizer.maybe_schedule('s')
+    assert scheduled == ['s']
+
+    # Once compaction is done the session can be scheduled again
+    summarizer.compact('s', lambda messages: None)
+    summarizer.maybe_schedule('s')
+    assert scheduled == ['s', 's']
+
+
+def test_disabled_summarizer_schedules_nothing(store):
+    scheduled = []
+    summarizer = ConversationSummarizer(store, enabled=False, trigger_tokens=1, keep_tokens=1)
+    summarizer.runner = scheduled.append
+    fill(store, 's', 5)
+    summarizer.maybe_schedule('s')
+    assert scheduled == []
+
+
+def test_compact_folds_older_turns_into_a_summary(store):
+    summarizer = ConversationSummarizer(store, enabled=True, trigger_tokens=60, keep_tokens=30)
+    fill(store, 's', 6)
+    before = store.history_tokens('s')
+    requests = []
+
+    def complete(messages):
+        requests.append(messages)
+        return "the user sent six messages"
+
+    summarizer.compact('s', complete)
+    history = store.get('s')
+    assert history[0] == {"role": "system",
+                          "content": "Summary of the earlier conversation:\nthe user sent six messages"}
+    # Recent turns are kept verbatim and start at a user message
+    assert history[1]['role'] == 'user'
+    assert history[-1] == {"role": "assistant", "content": "re: message number 5 with a few more words"}
+    assert store.history_tokens('s') < before
+    assert "message number 0" in requests[0][1]['content']
+
+    # The next fold builds on the previous summary
+    fill(store, 's', 6)
+    summarizer.compact('s', complete)
+    transcript = requests[1][1]['content']
+    assert transcript.startswith("Earlier summary:") and "the user sent six messages" in transcript
+
+
+def test_history_changed_during_summarization_is_kept(store):
+    summarizer = ConversationSummarizer(store, enabled=True, trigger_tokens=60, keep_tokens=30)
+    fill(store, 's', 6)
+
+    def complete(messages):
+        store.delete('s')
+        store.append('s', *turn('new start'))
+        return "stale summary"
+
+    summarizer.compact('s', complete)
+    assert store.get('s') == list(turn('new start'))
+
+
+def test_async_compact_and_failures_release_the_session(store):
+    scheduled = []
+    summarizer = ConversationSummarizer(store, enabled=True, trigger_tokens=60, keep_tokens=30)
+    summarizer.runner = scheduled.append
+    fill(store, 's', 6)
+    summarizer.maybe_schedule('s')
+
+    async def failing(messages):
+        raise RuntimeError("model unavailable")
+
+    asyncio.run(summarizer.acompact('s', failing))
+    assert store.get('s')[0]['role'] == 'user'
+    summarizer.maybe_schedule('s')
+    assert scheduled == ['s', 's']
+
+    async def complete(messages):
+        return "async summary"
+
+    asyncio.run(summarizer.acompact('s', complete))
+    assert store.get('s')[0]['content'].endswith("async summary")
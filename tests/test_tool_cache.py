@@ -0,0 +1,60 @@
+"""Host-side tool list cache and its invalidation"""
+
+import json
+
+from tool_cache import LIST_CHANGED, ToolCache
+
+
+class CountingLoader:
+    def __init__(self):
+        self.loads = 0
+
+    def __call__(self):
+        self.loads += 1
+        return [{"type": "function", "function": {"name": f"tool_{self.loads}"}}]
+
+
+def test_tool_list_is_loaded_once_while_fresh():
+    loader = CountingLoader()
+    cache = ToolCache(loader, ttl=60)
+    assert cache.get() is cache.get()
+    assert json.loads(cache.get_json()) == cache.get()
+    assert loader.loads == 1
+
+
+def test_list_changed_notification_forces_a_reload():
+    loader = CountingLoader()
+    cache = ToolCache(loader, ttl=60)
+    cache.get()
+    # Other notifications leave the cache alone
+    cache.handle_notification({"jsonrpc": "2.0", "method": "notifications/progress"})
+    assert loader.loads == 1
+    cache.handle_notification({"jsonrpc": "2.0", "method": LIST_CHANGED})
+    assert cache.get()[0]["function"]["name"] == "tool_2"
+    assert loader.loads == 2
+
+
+def test_expired_ttl_forces_a_reload():
+    loader = CountingLoader()
+    cache = ToolCache(loader, ttl=0)
+    cache.get()
+    cache.get()
+    assert loader.loads == 2
+
+
+def test_list_changed_during_a_load_is_not_lost():
+    cache = None
+
+    def loader():
+        # The notification arrives while this load is in flight
+        loader.loads += 1
+        if loader.loads == 1:
+            cache.handle_notification({"method": LIST_CHANGED})
+        return [{"type": "function", "function": {"name": f"tool_{loader.loads}"}}]
+
+    loader.loads = 0
+    cache = ToolCache(loader, ttl=60)
+    # The racing result is served once but not kept
+    assert cache.get()[0]["function"]["name"] == "tool_1"
+    assert cache.get()[0]["function"]["name"] == "tool_2"
+    assert cache.get()[0]["function"]["name"] == "tool_2"
@@ -0,0 +1,108 @@
+"""Background tool job lifecycle and long-polling"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from chat_core import conversations
+from tool_jobs import (
+    DONE, FAILED, PENDING, RUNNING, MAX_POLL_WAIT, AsyncJobStore, JobStore, PendingReply, poll_args
+)
+
+
+def test_job_runs_through_to_done():
+    store = JobStore()
+    job_id = store.create('jobs-a', ['send_email', 'search'])
+    job = store.get(job_id, 'jobs-a')
+    assert job['status'] == PENDING and job['finished'] is None
+
+    with store.run(job_id, 'jobs-a') as run:
+        assert store.get(job_id, 'jobs-a')['status'] == RUNNING
+        run.tool_done(0, {'content': []})
+        run.tool_done(1, 'Error: quota exceeded')
+        run.finish('Sent.')
+
+    job = store.get(job_id, 'jobs-a')
+    assert job['status'] == DONE and job['reply'] == 'Sent.' and job['finished'] is not None
+    assert [tool['status'] for tool in job['tools']] == [DONE, FAILED]
+    assert conversations.get('jobs-a')[-1] == {'role': 'assistant', 'content': 'Sent.'}
+    assert store.final_reply(PendingReply('Sending…', job_id), 'jobs-a') == 'Sent.'
+
+
+def test_exception_in_a_job_marks_it_failed():
+    store = JobStore()
+    job_id = store.create('jobs-b', ['send_email'])
+    with store.run(job_id, 'jobs-b'):
+        raise ConnectionError('MCP server went away')
+
+    job = store.get(job_id, 'jobs-b')
+    assert job['status'] == FAILED and job['error'] == 'MCP server went away'
+    with pytest.raises(RuntimeError, match='went away'):
+        store.final_reply(PendingReply('Sending…', job_id), 'jobs-b')
+
+
+def test_jobs_are_only_visible_to_their_session():
+    store = JobStore()
+    job_id = store.create('jobs-c', ['send_email'])
+    assert store.get(job_id, 'someone-else') is None
+    assert store.poll(job_id, 'someone-else', wait=1) is None
+    assert store.get('no-such-job', 'jobs-c') is None
+
+
+def test_long_poll_times_out_with_the_unchanged_job():
+    store = JobStore()
+    job_id = store.create('jobs-d', ['send_email'])
+    version = store.get(job_id, 'jobs-d')['version']
+    started = time.monotonic()
+    job = store.poll(job_id, 'jobs-d', wait=0.2, version=version)
+    assert time.monotonic() - started >= 0.2
+    assert job['version'] == version and job['status'] == PENDING
+
+
+def test_long_poll_returns_as_soon_as_the_job_changes():
+    store = JobStore()
+    job_id = store.create('jobs-e', ['send_email'])
+    version = store.get(job_id, 'jobs-e')['version']
+    threading.Timer(0.1, store.update, (job_id,), {'status': RUNNING}).start()
+    started = time.monotonic()
+    job = store.poll(job_id, 'jobs-e', wait=5, version=version)
+    assert time.monotonic() - started < 2
+    assert job['status'] == RUNNING and job['version'] > version
+
+
+def test_poll_args_are_validated_and_capped():
+    assert poll_args(None, None) == (0, -1)
+    assert poll_args('2.5', '3') == (2.5, 3)
+    assert poll_args('9999', '') == (MAX_POLL_WAIT, -1)
+    assert poll_args('-1', None) == (0, -1)
+    for wait, version in (('abc', None), ('nan', None), ('inf', None), ('1', 'x')):
+        with pytest.raises(ValueError):
+            poll_args(wait, version)
+
+
+def test_async_long_poll_and_event_stream():
+    async def scenario():
+        store = AsyncJobStore()
+        job_id = store.create('jobs-f', ['send_email'])
+        version = store.get(job_id, 'jobs-f')['version']
+
+        started = time.monotonic()
+        job = await store.poll(job_id, 'jobs-f', wait=0.2, version=version)
+        assert time.monotonic() - started >= 0.2 and job['version'] == version
+
+        async def finish():
+            await asyncio.sleep(0.05)
+            store.update(job_id, status=RUNNING)
+            await asyncio.sleep(0.05)
+            store.update(job_id, status=DONE, reply='Sent.')
+
+        task = asyncio.ensure_future(finish())
+        chunks = [chunk async for chunk in store.events(job_id, 'jobs-f')]
+        await task
+        assert [chunk.split('\n')[0] for chunk in chunks] == ['event: status'] * 3
+        assert '"status": "done"' in chunks[-1]
+        assert await store.final_reply(PendingReply('Sending…', job_id), 'jobs-f') == 'Sent.'
+
+    asyncio.run(scenario())
@@ -0,0 +1,71 @@
+"""Trace context propagation from the host to the MCP server"""
+
+import json
+import threading
+
+from conftest import RawServer
+from server import tracing
+
+
+def test_traceparent_parsing():
+    trace_id, span_id = "4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7"
+    assert tracing.parse_traceparent(f"00-{trace_id}-{span_id}-01") == (trace_id, span_id)
+    assert tracing.parse_traceparent(f" 00-{trace_id.upper()}-{span_id}-01 ") == (trace_id, span_id)
+    for value in (None, "", "garbage", f"00-{trace_id}-{span_id}", f"00-{trace_id[:-1]}-{span_id}-01"):
+        assert tracing.parse_traceparent(value) == (None, None)
+
+
+def test_child_spans_and_threads_share_the_trace():
+    with tracing.span("chat") as root:
+        assert tracing.trace_meta() == {"traceparent": root.traceparent}
+        with tracing.span("llm") as child:
+            assert (child.trace_id, child.parent_id) == (root.trace_id, root.span_id)
+
+        seen = []
+
+        def worker():
+            with tracing.span("mcp_tool_call") as span:
+                seen.append(span)
+
+        thread = threading.Thread(target=tracing.propagate(worker))
+        thread.start()
+        thread.join()
+        assert (seen[0].trace_id, seen[0].parent_id) == (root.trace_id, root.span_id)
+    assert tracing.current_span() is None and tracing.trace_meta() == {}
+
+
+def test_incoming_traceparent_is_continued():
+    with tracing.span("chat", traceparent="00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01") as span:
+        assert span.trace_id == "4bf92f3577b34da6a3ce929d0e0e4736"
+        assert span.parent_id == "00f067aa0ba902b7"
+
+
+def test_mcp_server_spans_join_the_host_trace(server_env, server_command, tmp_path, monkeypatch):
+    trace_file = tmp_path / "server-traces.jsonl"
+    monkeypatch.setenv("TRACE_EXPORTER", "file")
+    monkeypatch.setenv("TRACE_FILE", str(trace_file))
+    server = RawServer(server_command)
+    try:
+        server.send({"jsonrpc": "2.0", "id": 0, "method": "initialize", "params": {}})
+        server.receive()
+        with tracing.span("mcp_tool_call") as host_span:
+            server.send({
+                "jsonrpc": "2.0",
+                "id": 1,
+                "method": "tools/call",
+                "params": {
+                    "name": "send_email",
+                    "arguments": {"to": "bob@example.com", "subject": "Hi", "body": "Hello"},
+                    "_meta": tracing.trace_meta(),
+                },
+            })
+            assert server.receive()["id"] == 1
+    finally:
+        server.close()
+
+    spans = {span["name"]: span for span in map(json.loads, trace_file.read_text().splitlines())}
+    call, gmail = spans["mcp.tools/call"], spans["gmail.send_email"]
+    assert call["service"] == "mailmind-mcp-server"
+    assert call["trace_id"] == gmail["trace_id"] == host_span.trace_id
+    assert call["parent_id"] == host_span.span_id
+    assert gmail["parent_id"] == call["span_id"]